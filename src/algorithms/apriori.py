@@ -1,5 +1,6 @@
 import pandas as pd
 import sys
+import time
 from pathlib import Path
 
 # Add project root to Python path
@@ -8,9 +9,13 @@ sys.path.insert(0, str(project_root))
 
 from src.preprocessing.preprocessing_utils import load_transactions
 from .association_rules import generate_rules
+from .instrumentation import elapsed_ms
 
 transaction_path = project_root / "data" / "cleaned_transactions.csv"
 
+# Transactions counted between two cancellation checks in generate_Lk
+CANCEL_CHECK_INTERVAL = 256
+
 # Extract the lists of items from the transactions dictionary 
 def get_items_list(transactions):
     items_list = []
@@ -53,13 +58,17 @@ def generate_Ck(L_prev, k):
 
     return candidates
 
-# Generate frequent k-itemsets from candidates
-def generate_Lk(candidates, transactions, min_support=0.2):
+# Generate frequent k-itemsets from candidates.
+# Returns None if cancel trips before the level is fully counted.
+def generate_Lk(candidates, transactions, min_support=0.2, cancel=None):
 
     item_set_count = {cand: 0 for cand in candidates}
     Lk = {}
 
-    for transaction in transactions:
+    for i, transaction in enumerate(transactions):
+        if cancel is not None and i % CANCEL_CHECK_INTERVAL == 0 and cancel.cancelled:
+            return None
+
         transaction_set = set(transaction)
 
         for candidate in candidates:
@@ -74,24 +83,70 @@ def generate_Lk(candidates, transactions, min_support=0.2):
 
     return Lk
 
-# Apriori algorithm 
-def apriori(transactions, min_support=0.2):
+# Apriori algorithm. Pass a MiningStats as stats to record per-level counters, a
+# progress callback to receive each level of frequent itemsets as it completes, and a
+# CancellationToken as cancel to stop early with the levels completed so far.
+def apriori(transactions, min_support=0.2, stats=None, progress=None, cancel=None):
     L = []
 
+    if stats is not None:
+        start = time.perf_counter()
+
     L1 = generate_L1(transactions, min_support)
     L.append(L1)
 
+    if stats is not None:
+        counting_time_ms = elapsed_ms(start)
+        num_items = len({item for transaction in transactions for item in transaction})
+        stats.add(1,
+                  candidates_generated=num_items,
+                  candidates_pruned=num_items - len(L1),
+                  frequent_itemsets=len(L1),
+                  transactions_scanned=len(transactions),
+                  counting_time_ms=counting_time_ms)
+
+    if progress is not None and L1:
+        progress({'engine': 'Apriori', 'level': 1, 'itemsets': L1})
+
     k = 2
     while True:
+        if cancel is not None and cancel.cancelled:
+            break
+
         L_prev = L[k-2]
 
+        if stats is not None:
+            start = time.perf_counter()
+
         Ck = generate_Ck(L_prev, k)
-        Lk = generate_Lk(Ck, transactions)
+
+        if stats is not None:
+            generation_time_ms = elapsed_ms(start)
+            start = time.perf_counter()
+
+        Lk = generate_Lk(Ck, transactions, min_support, cancel)
+
+        # Cancelled mid-level: the partial counts are not usable
+        if Lk is None:
+            break
+
+        if stats is not None:
+            stats.add(k,
+                      candidates_generated=len(Ck),
+                      candidates_pruned=len(Ck) - len(Lk),
+                      frequent_itemsets=len(Lk),
+                      transactions_scanned=len(transactions) if Ck else 0,
+                      generation_time_ms=generation_time_ms,
+                      counting_time_ms=elapsed_ms(start))
 
         if not Lk:
             break
 
         L.append(Lk)
+
+        if progress is not None:
+            progress({'engine': 'Apriori', 'level': k, 'itemsets': Lk})
+
         k += 1
 
     return L
@@ -1,3 +1,6 @@
+import json
+import os
+import tempfile
 from itertools import combinations
 
 # Generate subsets from itemset
@@ -36,16 +39,24 @@ def compute_lift(A, B, support_lookup):
     
     return support_union / (support_A * support_B)
 
-# Generate association rules
-def generate_rules(frequent_itemsets, min_confidence=0.5):
+# Itemsets expanded into rules between two cancellation checks in generate_rules
+CANCEL_CHECK_INTERVAL = 256
+
+# Generate association rules. A progress callback receives one event per level
+# of itemsets, and a CancellationToken as cancel stops with the rules found so far.
+def generate_rules(frequent_itemsets, min_confidence=0.5, progress=None, cancel=None):
     support_lookup = {}
     for Lk in frequent_itemsets:
         support_lookup.update(Lk)
 
     rules = []
 
-    for Lk in frequent_itemsets:
-        for itemset in Lk:
+    for level, Lk in enumerate(frequent_itemsets, 1):
+        for i, itemset in enumerate(Lk):
+            # Checked within a level too: one level can hold most of the rules
+            if cancel is not None and i % CANCEL_CHECK_INTERVAL == 0 and cancel.cancelled:
+                return rules
+
             if len(itemset) < 2:
                 continue
 
@@ -67,5 +78,160 @@ def generate_rules(frequent_itemsets, min_confidence=0.5):
                         'confidence': confidence,
                         'lift': lift
                     })
+
+        if progress is not None:
+            progress({
+                'engine': 'Rules',
+                'level': level,
+                'levels_total': len(frequent_itemsets),
+                'num_rules': len(rules)
+            })
     
-    return rules
\ No newline at end of file
+    return rules
+
+# How generated rules can be pruned (see prune_redundant_rules)
+RULE_PRUNING = ['none', 'redundant', 'productive']
+
+class AntecedentTrieNode:
+    __slots__ = ('confidence', 'best', 'children')
+
+    def __init__(self):
+        # Confidence of the rule whose antecedent ends here (-1 for none), and
+        # the best confidence anywhere under this node
+        self.confidence = -1.0
+        self.best = -1.0
+        self.children = {}
+
+
+# Antecedents of the rules of one consequent, as a trie over their sorted items
+class AntecedentTrie:
+
+    def __init__(self):
+        self.root = AntecedentTrieNode()
+
+    def insert(self, items, confidence):
+        node = self.root
+        for item in items:
+            child = node.children.get(item)
+            if child is None:
+                child = node.children[item] = AntecedentTrieNode()
+            child.best = max(child.best, confidence)
+            node = child
+        node.confidence = confidence
+
+    # Whether an antecedent stored in the trie is a subset of items (sorted)
+    # and has at least this confidence. Only branches made of items of items
+    # that hold such a confidence are walked, so the cost follows the trie,
+    # not the 2^n subsets.
+    def has_subset_with_confidence(self, items, confidence):
+        stack = [(self.root, 0)]
+
+        while stack:
+            node, start = stack.pop()
+            for i in range(start, len(items)):
+                child = node.children.get(items[i])
+                if child is None or child.best < confidence:
+                    continue
+                if child.confidence >= confidence:
+                    return True
+                if child.children:
+                    stack.append((child, i + 1))
+
+        return False
+
+# Drop redundant rules: A -> B when some rule A' -> B with A' a proper subset
+# of A has at least its confidence, so A adds nothing to what A' predicts.
+# Rules are grouped by consequent and, within a group, checked from the
+# shortest antecedent up against a trie of the antecedents kept so far.
+#
+# With productive=True only productive rules are kept: those whose confidence
+# beats every generalization A' -> B, the empty antecedent included (their
+# improvement is above zero). For rules as generate_rules returns them this is
+# the non-redundant rules with a lift above 1: a generalization missing from
+# the rules is below min_confidence, so below every rule, and one pruned as
+# redundant is dominated by a kept rule the trie already checked.
+# Rules keep their order.
+def prune_redundant_rules(rules, productive=False):
+    by_consequent = {}
+    for position, rule in enumerate(rules):
+        by_consequent.setdefault(rule['consequent'], []).append(position)
+
+    kept = []
+    for positions in by_consequent.values():
+        trie = AntecedentTrie()
+        positions.sort(key=lambda position: len(rules[position]['antecedent']))
+
+        for position in positions:
+            rule = rules[position]
+            items = sorted(rule['antecedent'])
+            if trie.has_subset_with_confidence(items, rule['confidence']):
+                continue
+            trie.insert(items, rule['confidence'])
+            if not productive or rule['lift'] > 1:
+                kept.append(position)
+
+    return [rules[position] for position in sorted(kept)]
+
+# Rules pruned as RULE_PRUNING names it
+def prune_rules(rules, pruning='none'):
+    if pruning == 'none':
+        return rules
+    if pruning not in RULE_PRUNING:
+        raise ValueError(f"Unknown rule pruning {pruning!r} (choose from {', '.join(RULE_PRUNING)})")
+
+    return prune_redundant_rules(rules, productive=pruning == 'productive')
+
+# The process umask (it can only be read by setting it)
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# Persist rules as JSON ({'metadata': {...}, 'rules': [...]}, itemsets as
+# sorted lists). The file is written beside path and renamed over it, so a
+# reader (e.g. the recommendation service) sees either the old rule set or the
+# new one, never half of one.
+def save_rules(rules, path, metadata=None):
+    payload = {
+        'metadata': metadata or {},
+        'rules': [
+            {
+                'antecedent': sorted(rule['antecedent']),
+                'consequent': sorted(rule['consequent']),
+                'support': rule['support'],
+                'confidence': rule['confidence'],
+                'lift': rule['lift']
+            }
+            for rule in rules
+        ]
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".rules-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(payload, f)
+        # mkstemp creates the file 0600; give it the mode open() would have
+        os.chmod(temp_path, 0o666 & ~_umask())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+# (rules, metadata) from a file written by save_rules, itemsets as frozensets
+def load_rules(path):
+    with open(path) as f:
+        payload = json.load(f)
+
+    rules = [
+        {
+            'antecedent': frozenset(rule['antecedent']),
+            'consequent': frozenset(rule['consequent']),
+            'support': rule['support'],
+            'confidence': rule['confidence'],
+            'lift': rule['lift']
+        }
+        for rule in payload['rules']
+    ]
+
+    return rules, payload.get('metadata', {})
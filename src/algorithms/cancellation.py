@@ -0,0 +1,67 @@
+import threading
+import time
+
+# Cooperative cancellation for apriori(), eclat() and generate_rules().
+# The engines poll token.cancelled between levels / equivalence classes and
+# return what they have completed so far. A token trips either when cancel()
+# is called (from any thread, e.g. a Cancel button) or when its deadline passes.
+# A token with a parent also trips when the parent does, so each engine can
+# have its own time budget under one Cancel button.
+class CancellationToken:
+
+    def __init__(self, deadline=None, parent=None):
+        # Deadline as a time.monotonic() value, None for no time budget
+        self.deadline = deadline
+        self.parent = parent
+        # Reason of the first check of cancelled that stopped a run, None
+        # while every check let it continue (see stop_reason)
+        self._stopped = None
+        self._event = threading.Event()
+
+    # Token that expires budget_s seconds from now, or when parent trips
+    @classmethod
+    def with_budget(cls, budget_s, parent=None):
+        if budget_s is None:
+            return cls(parent=parent)
+
+        return cls(time.monotonic() + budget_s, parent)
+
+    def cancel(self):
+        self._event.set()
+
+    # What the engines poll. A True answer is recorded as the run stopping early.
+    @property
+    def cancelled(self):
+        reason = self.reason
+        if reason is not None and self._stopped is None:
+            self._stopped = reason
+
+        return reason is not None
+
+    # 'cancelled', 'timeout' or None while the run may continue
+    @property
+    def reason(self):
+        if self._event.is_set():
+            return 'cancelled'
+        if self.parent is not None and self.parent.reason is not None:
+            return self.parent.reason
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return 'timeout'
+
+        return None
+
+    # 'cancelled' or 'timeout' if a run polling this token stopped early, None
+    # if it finished. Unlike reason, a deadline that passes after the last
+    # check does not make a completed run look stopped.
+    @property
+    def stop_reason(self):
+        return self._stopped
+
+    # Seconds left before the deadline (or the parent's, if sooner), None without one
+    def remaining(self):
+        remaining = None if self.parent is None else self.parent.remaining()
+        if self.deadline is None:
+            return remaining
+
+        own = max(0.0, self.deadline - time.monotonic())
+        return own if remaining is None else min(own, remaining)
@@ -1,5 +1,6 @@
 import pandas as pd
 import sys
+import time
 from pathlib import Path
 
 # Add project root to Python path
@@ -8,6 +9,7 @@ sys.path.insert(0, str(project_root))
 
 from src.preprocessing.preprocessing_utils import load_transactions
 from .association_rules import generate_rules
+from .instrumentation import elapsed_ms
 
 transaction_path = project_root / "data" / "cleaned_transactions.csv"
 
@@ -25,32 +27,91 @@ def build_vertical_format(transactions):
 
     return vertical
 
-def eclat_recursive(prefix, items, total_transactions, results, min_support=0.2):
+# Eclat has no separate candidate generation step: the tidset intersections that
+# build the next level are recorded as support counting for that level.
+def eclat_recursive(prefix, items, total_transactions, results, min_support=0.2, stats=None, cancel=None):
     while items:
-        item, tidset = items.pop()
-        new_itemset = prefix.union({item})
-        support = len(tidset) / total_transactions
-
-        if support >= min_support:
-            results[new_itemset] = support
-
-            new_items = []
-            for other_item, other_tidset in items:
-                intersection = tidset.intersection(other_tidset)
-                if intersection:
-                    new_items.append((other_item, intersection))
+        if cancel is not None and cancel.cancelled:
+            return
 
-            eclat_recursive(new_itemset, new_items, total_transactions, results, min_support)
+        item, tidset = items.pop()
+        eclat_class(prefix, item, tidset, items, total_transactions, results, min_support, stats, cancel)
+
+# Mine the equivalence class of prefix + item against its remaining siblings
+def eclat_class(prefix, item, tidset, siblings, total_transactions, results, min_support=0.2, stats=None, cancel=None):
+    new_itemset = prefix.union({item})
+    support = len(tidset) / total_transactions
+
+    if support >= min_support:
+        results[new_itemset] = support
+
+        if stats is not None:
+            stats.add(len(new_itemset), frequent_itemsets=1)
+            start = time.perf_counter()
+
+        new_items = []
+        for other_item, other_tidset in siblings:
+            intersection = tidset.intersection(other_tidset)
+            if intersection:
+                new_items.append((other_item, intersection))
+
+        if stats is not None and siblings:
+            counting_time_ms = elapsed_ms(start)
+            k = len(new_itemset) + 1
+            stats.add(k,
+                      candidates_generated=len(siblings),
+                      candidates_pruned=len(siblings) - len(new_items),
+                      transactions_scanned=sum(min(len(tidset), len(other)) for _, other in siblings),
+                      counting_time_ms=counting_time_ms)
+            stats.add_tidsets(k, (intersection for _, intersection in new_items))
+
+        eclat_recursive(new_itemset, new_items, total_transactions, results, min_support, stats, cancel)
+
+    elif stats is not None:
+        stats.add(len(new_itemset), candidates_pruned=1)
+
+# Eclat algorithm. Pass a MiningStats as stats to record per-depth counters, a
+# progress callback to receive each top-level equivalence class as it completes, and
+# a CancellationToken as cancel to stop early with the itemsets found so far.
+def eclat(transactions, min_support=0.2, stats=None, progress=None, cancel=None): 
+    if stats is not None:
+        start = time.perf_counter()
 
-def eclat(transactions, min_support=0.2): 
     vertical = build_vertical_format(transactions)
     total_transactions = len(transactions)
 
+    if stats is not None:
+        stats.add(1,
+                  candidates_generated=len(vertical),
+                  transactions_scanned=total_transactions,
+                  counting_time_ms=elapsed_ms(start))
+        stats.add_tidsets(1, vertical.values())
+
     items = [(item, vertical[item]) for item in vertical]
 
     results = {}
 
-    eclat_recursive(frozenset(), items, total_transactions, results, min_support)
+    if progress is None:
+        eclat_recursive(frozenset(), items, total_transactions, results, min_support, stats, cancel)
+    else:
+        classes_total = len(items)
+
+        while items:
+            if cancel is not None and cancel.cancelled:
+                break
+
+            item, tidset = items.pop()
+            class_results = {}
+            eclat_class(frozenset(), item, tidset, items, total_transactions, class_results, min_support, stats, cancel)
+            results.update(class_results)
+
+            progress({
+                'engine': 'Eclat',
+                'class': item,
+                'classes_done': classes_total - len(items),
+                'classes_total': classes_total,
+                'itemsets': class_results
+            })
 
     levels = {}
     for itemset, support in results.items():
@@ -0,0 +1,63 @@
+# Compact integer encoding of transactions, frequent itemsets and rules.
+# Items are replaced by their index in a sorted vocabulary, itemsets become
+# sorted tuples of ids and rules become plain tuples, which is much cheaper to
+# pickle between processes than frozensets of strings and rule dicts.
+
+# Sorted list of every item in the transactions
+def build_vocabulary(transactions):
+    items = set()
+
+    for transaction in transactions:
+        items.update(transaction['items'])
+
+    return sorted(items)
+
+# Replace item names with ids, keeping the {'transaction_id', 'items'} shape
+def encode_transactions(transactions, vocabulary):
+    item_ids = {item: i for i, item in enumerate(vocabulary)}
+
+    return [
+        {'transaction_id': transaction['transaction_id'],
+         'items': [item_ids[item] for item in transaction['items']]}
+        for transaction in transactions
+    ]
+
+# (vocabulary, encoded transactions) for a list of transactions, or straight
+# from the arrays of a TransactionStore, which is already encoded
+def encode_dataset(transactions):
+    if hasattr(transactions, 'encoded'):
+        return transactions.encoded()
+
+    vocabulary = build_vocabulary(transactions)
+
+    return vocabulary, encode_transactions(transactions, vocabulary)
+
+# [{frozenset: support}, ...] -> [[(ids, support), ...], ...]
+def encode_levels(frequent_itemsets):
+    return [[(tuple(sorted(itemset)), support) for itemset, support in Lk.items()] for Lk in frequent_itemsets]
+
+def decode_levels(encoded_levels, vocabulary):
+    return [
+        {frozenset(vocabulary[i] for i in ids): support for ids, support in level}
+        for level in encoded_levels
+    ]
+
+# Rule dicts -> (antecedent ids, consequent ids, support, confidence, lift)
+def encode_rules(rules):
+    return [
+        (tuple(sorted(rule['antecedent'])), tuple(sorted(rule['consequent'])),
+         rule['support'], rule['confidence'], rule['lift'])
+        for rule in rules
+    ]
+
+def decode_rules(encoded_rules, vocabulary):
+    return [
+        {
+            'antecedent': frozenset(vocabulary[i] for i in antecedent),
+            'consequent': frozenset(vocabulary[i] for i in consequent),
+            'support': support,
+            'confidence': confidence,
+            'lift': lift
+        }
+        for antecedent, consequent, support, confidence, lift in encoded_rules
+    ]
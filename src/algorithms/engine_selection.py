@@ -0,0 +1,299 @@
+import json
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.preprocessing.transaction_store import TransactionStore
+
+# Automatic engine selection. Instead of running Apriori and Eclat side by
+# side, the 'auto' engine profiles the encoded transactions, predicts how many
+# frequent itemsets a support will produce and how long each engine would take,
+# and runs only the cheaper one. Runs predicted to explode (e.g. support 0.01 on
+# dense baskets) are flagged before they start.
+#
+# Itemset estimate: every frequent itemset is a clique of the graph whose
+# nodes are the f frequent items and whose edges are the frequent pairs. Both
+# are counted exactly (one pass over the baskets). Treating the graph as random
+# with its edge density d, the expected number of cliques is
+#
+#     sum_k C(f, k) * d^(k (k - 1) / 2)
+#
+# which stays small while frequent pairs are sparse and explodes once most
+# pairs of frequent items are themselves frequent, the case that makes runs
+# blow up. Real pair graphs are clustered, so the estimate is off by a roughly
+# constant factor on a log scale, which the cost model calibrates.
+#
+# Cost model: per engine, log(runtime ms) is linear in log(itemset estimate),
+# log(transactions) and log(frequent items), and log(frequent itemsets) is
+# linear in log(itemset estimate). The coefficients are fitted by least squares
+# on a benchmark sweep (performance_comparison --sweep writes cost_model.json);
+# DEFAULT_COST_MODEL was fitted on the synthetic sweep of this repository.
+
+ENGINE_NAMES = ['Apriori', 'Eclat']
+
+# Fitted on run_sweep over synthetic data (1,000-20,000 baskets of 5-20 items
+# out of 100-1,000, supports 0.005-0.2); see fit_cost_model
+DEFAULT_COST_MODEL = {
+    'itemsets': [-0.1851, 1.1704],
+    'runtime_ms': {
+        'Apriori': [-5.9764, 1.1793, 0.972, -0.1774],
+        'Eclat': [-1.6493, 0.7614, 0.4309, 0.0581]
+    }
+}
+
+# Predictions above these warn, or refuse unless forced
+WARN_ITEMSETS = 1_000_000
+REFUSE_ITEMSETS = 50_000_000
+WARN_RUNTIME_S = 60
+REFUSE_RUNTIME_S = 3600
+
+# Memory per basket entry of a frequent item held by each representation:
+# Eclat's vertical tidsets (Python sets of ints, with the intersections of the
+# search path) and Apriori's horizontal item lists
+TIDSET_BYTES_PER_ENTRY = 120
+ITEM_LIST_BYTES_PER_ENTRY = 60
+
+# Pairs are counted among at most this many of the most frequent items, in
+# blocks of baskets of about PAIR_BLOCK_BYTES
+PAIR_ITEM_LIMIT = 4096
+PAIR_BLOCK_BYTES = 32 * 1024 * 1024
+
+
+# Statistics of an encoded dataset that the cost model reads
+class DatasetProfile:
+
+    def __init__(self, transactions):
+        if not hasattr(transactions, 'offsets'):
+            transactions = TransactionStore.from_transactions(transactions)
+
+        self.num_transactions = len(transactions)
+        lengths = np.diff(transactions.offsets)
+        rows = np.repeat(np.arange(self.num_transactions, dtype=np.int64), lengths)
+
+        # One entry per (basket, item), repeated items counted once
+        width = max(len(transactions.vocabulary), 1)
+        keys = np.unique(rows * width + transactions.items)
+        self._rows, self._items = keys // width, keys % width
+
+        # Baskets holding each item id, and the same counts highest first
+        self._id_counts = np.bincount(self._items, minlength=len(transactions.vocabulary))
+        self.item_counts = np.sort(self._id_counts[self._id_counts > 0])[::-1]
+        self.num_items = len(self.item_counts)
+        self.avg_basket_length = len(keys) / self.num_transactions if self.num_transactions else 0.0
+        self.max_basket_length = int(np.bincount(self._rows).max()) if len(keys) else 0
+        # Share of the basket x item matrix that is filled
+        self.density = self.avg_basket_length / self.num_items if self.num_items else 0.0
+
+    # Items with at least min_support
+    def frequent_items(self, min_support):
+        return int(np.count_nonzero(self.item_counts >= min_support * self.num_transactions))
+
+    # Frequent items of every basket, and their total
+    def basket_frequent_lengths(self, min_support):
+        frequent = self._id_counts >= min_support * self.num_transactions
+        in_baskets = frequent[self._items]
+
+        return np.bincount(self._rows[in_baskets], minlength=self.num_transactions), int(in_baskets.sum())
+
+    # Pairs of frequent items that are frequent together
+    def frequent_pairs(self, min_support):
+        threshold = min_support * self.num_transactions
+        frequent = np.flatnonzero(self._id_counts >= threshold)
+        if len(frequent) > PAIR_ITEM_LIMIT:
+            frequent = frequent[np.argsort(self._id_counts[frequent], kind='stable')[::-1][:PAIR_ITEM_LIMIT]]
+        if len(frequent) < 2:
+            return 0
+
+        columns = np.full(len(self._id_counts), -1, dtype=np.int64)
+        columns[frequent] = np.arange(len(frequent))
+        in_pairs = columns[self._items] >= 0
+        rows, columns = self._rows[in_pairs], columns[self._items[in_pairs]]
+
+        # Co-occurrence counts as (baskets x items)^T (baskets x items), a block of baskets at a time
+        counts = np.zeros((len(frequent), len(frequent)), dtype=np.float32)
+        block = max(1, PAIR_BLOCK_BYTES // (4 * len(frequent)))
+        bounds = np.searchsorted(rows, np.arange(0, self.num_transactions + block, block))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if start == end:
+                continue
+            first = rows[start]
+            matrix = np.zeros((rows[end - 1] - first + 1, len(frequent)), dtype=np.float32)
+            matrix[rows[start:end] - first, columns[start:end]] = 1
+            counts += matrix.T @ matrix
+
+        return int(np.count_nonzero(np.triu(counts, 1) >= threshold))
+
+    # Expected cliques of the frequent pair graph (see the top of the module)
+    def itemset_estimate(self, min_support):
+        frequent_items = self.frequent_items(min_support)
+        if frequent_items < 2:
+            return float(frequent_items)
+
+        frequent_pairs = self.frequent_pairs(min_support)
+        if frequent_pairs == 0:
+            return float(frequent_items)
+
+        counted_items = min(frequent_items, PAIR_ITEM_LIMIT)
+        log_density = math.log(frequent_pairs / math.comb(counted_items, 2))
+        estimate = float(frequent_items + frequent_pairs)
+        for k in range(3, frequent_items + 1):
+            log_cliques = (math.lgamma(frequent_items + 1) - math.lgamma(k + 1) - math.lgamma(frequent_items - k + 1)
+                           + k * (k - 1) / 2 * log_density)
+            estimate += math.exp(min(log_cliques, 700.0))
+
+        return min(estimate, 2.0 ** min(frequent_items, 1023) - 1)
+
+    # Item support quantiles, for display
+    def support_distribution(self):
+        if self.num_items == 0:
+            return {'max': 0.0, 'p90': 0.0, 'p50': 0.0}
+
+        supports = self.item_counts / self.num_transactions
+
+        return {
+            'max': float(supports[0]),
+            'p90': float(np.quantile(supports, 0.9)),
+            'p50': float(np.median(supports))
+        }
+
+    def summary(self):
+        return {
+            'num_transactions': self.num_transactions,
+            'num_items': self.num_items,
+            'avg_basket_length': round(self.avg_basket_length, 2),
+            'max_basket_length': self.max_basket_length,
+            'density': round(self.density, 4),
+            'item_support': self.support_distribution()
+        }
+
+
+def _log(value):
+    return math.log1p(max(value, 0.0))
+
+# Cost model features of a run: [1, log itemset estimate, log transactions, log frequent items]
+def _features(itemset_estimate, num_transactions, frequent_items):
+    return [1.0, _log(itemset_estimate), _log(num_transactions), _log(frequent_items)]
+
+
+class CostModel:
+
+    def __init__(self, coefficients=None):
+        self.coefficients = coefficients or DEFAULT_COST_MODEL
+
+    # Predicted frequent itemsets, runtime per engine and peak memory of each
+    # representation for mining profile at min_support
+    def predict(self, profile, min_support):
+        estimate = profile.itemset_estimate(min_support)
+        frequent_items = profile.frequent_items(min_support)
+        features = _features(estimate, profile.num_transactions, frequent_items)
+
+        intercept, slope = self.coefficients['itemsets']
+        itemsets = max(math.expm1(min(intercept + slope * features[1], 700.0)), 0.0) if estimate else 0.0
+
+        runtime_ms = {}
+        for engine, weights in self.coefficients['runtime_ms'].items():
+            exponent = sum(w * x for w, x in zip(weights, features))
+            runtime_ms[engine] = math.expm1(min(exponent, 700.0))
+
+        _, entries = profile.basket_frequent_lengths(min_support)
+
+        return {
+            'itemset_estimate': estimate,
+            'frequent_items': frequent_items,
+            'itemsets': itemsets,
+            'runtime_ms': runtime_ms,
+            'memory_mb': {
+                'Eclat': entries * TIDSET_BYTES_PER_ENTRY / (1024 * 1024),
+                'Apriori': entries * ITEM_LIST_BYTES_PER_ENTRY / (1024 * 1024)
+            }
+        }
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.coefficients, f, indent=2)
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+
+# Cost model fitted on a run_sweep table whose rows carry the dataset columns
+# added by the sweep ('itemset_estimate', 'frequent_items'). Only completed runs
+# are used; engines with fewer runs than features keep the default weights.
+def fit_cost_model(sweep_df):
+    df = sweep_df[sweep_df['status'] == 'ok']
+    coefficients = json.loads(json.dumps(DEFAULT_COST_MODEL))
+
+    def design(rows):
+        return np.array([_features(row.itemset_estimate, row.num_transactions, row.frequent_items)
+                         for row in rows.itertuples()])
+
+    counted = df.drop_duplicates(['num_transactions', 'min_support', 'itemset_estimate'])
+    if len(counted) >= 2:
+        x = design(counted)[:, :2]
+        y = np.log1p(counted['num_frequent_itemsets'].to_numpy(dtype=float))
+        coefficients['itemsets'] = np.linalg.lstsq(x, y, rcond=None)[0].tolist()
+
+    for engine, rows in df.groupby('algorithm'):
+        if len(rows) >= 4:
+            y = np.log1p(rows['execution_time_ms'].to_numpy(dtype=float))
+            coefficients['runtime_ms'][engine] = np.linalg.lstsq(design(rows), y, rcond=None)[0].tolist()
+
+    return CostModel(coefficients)
+
+
+# What the auto engine would do for transactions (or a DatasetProfile) at
+# min_support: {'engine', 'representation', 'verdict' ('ok', 'warn' or
+# 'refuse'), 'reasons', 'prediction', 'profile'}. The engine is the one
+# predicted to finish first among those whose representation fits in
+# memory_limit_mb; with none fitting, Apriori's horizontal lists are the
+# smaller one, and out_of_core=True (a file that can be streamed) picks the
+# out-of-core engine instead.
+def select_engine(transactions, min_support, model=None, memory_limit_mb=None, out_of_core=False):
+    profile = transactions if isinstance(transactions, DatasetProfile) else DatasetProfile(transactions)
+    prediction = (model or CostModel()).predict(profile, min_support)
+
+    runtime_ms = prediction['runtime_ms']
+    fitting = [engine for engine in ENGINE_NAMES
+               if memory_limit_mb is None or prediction['memory_mb'][engine] <= memory_limit_mb]
+    representation = 'in-memory'
+    if fitting:
+        engine = min(fitting, key=lambda name: runtime_ms[name])
+    elif out_of_core:
+        engine, representation = 'Apriori', 'out-of-core'
+    else:
+        engine = 'Apriori'
+
+    reasons = []
+    verdict = 'ok'
+    itemsets = prediction['itemsets']
+    runtime_s = runtime_ms[engine] / 1000
+
+    if itemsets >= REFUSE_ITEMSETS or runtime_s >= REFUSE_RUNTIME_S:
+        verdict = 'refuse'
+    elif itemsets >= WARN_ITEMSETS or runtime_s >= WARN_RUNTIME_S:
+        verdict = 'warn'
+    if verdict != 'ok':
+        reasons.append(f"about {itemsets:,.0f} frequent itemsets and {runtime_s:,.0f}s predicted at support "
+                       f"{min_support:g} ({prediction['frequent_items']} frequent items, "
+                       f"{profile.avg_basket_length:.1f} items per basket)")
+    if not fitting and memory_limit_mb is not None:
+        reasons.append(f"no in-memory representation fits in {memory_limit_mb} MB")
+        if not out_of_core and verdict == 'ok':
+            verdict = 'warn'
+
+    return {
+        'engine': engine,
+        'representation': representation,
+        'verdict': verdict,
+        'reasons': reasons,
+        'prediction': prediction,
+        'profile': profile.summary()
+    }
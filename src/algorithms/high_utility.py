@@ -0,0 +1,199 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+# High-utility itemset mining: itemsets whose revenue (quantity x unit price,
+# summed over the baskets holding the whole itemset) reaches min_utility,
+# rather than itemsets that are merely frequent. A cheap pair bought often can
+# be frequent and earn little, while beef + wine earns a lot in few baskets.
+#
+# Utility is not anti-monotone (adding an item can raise it), so the support
+# pruning of Apriori and Eclat does not apply. This is HUI-Miner with FHM's
+# co-occurrence pruning:
+#   - Items are ordered by transaction-weighted utility (TWU: the revenue of
+#     the baskets holding the item); an item whose TWU is below min_utility
+#     cannot be in a high-utility itemset and is dropped up front.
+#   - Every itemset has a utility list: per basket holding it, its utility and
+#     the remaining utility of the items after it in that order. An itemset
+#     whose utility plus remaining utility is below min_utility has no
+#     high-utility extension, so its subtree is skipped.
+#   - Pairs whose TWU is below min_utility are never joined (FHM's EUCS).
+#   - The list of an extension is built from its parents' lists by a merge on
+#     basket ids, without rescanning the baskets.
+
+# Baskets with more item pairs than this skip the pair TWU table (its memory
+# grows with the pairs); utility lists alone still give the exact result
+COOCCURRENCE_PAIR_LIMIT = 20_000_000
+
+
+# Utility list of one itemset: basket rows holding it (ascending), its utility
+# in each of them and the remaining utility after it
+class UtilityList:
+
+    def __init__(self, rows, utilities, remaining):
+        self.rows = rows
+        self.utilities = utilities
+        self.remaining = remaining
+        self.utility = float(utilities.sum())
+        self.upper_bound = self.utility + float(remaining.sum())
+
+
+# (row, item name, quantity) columns of transactions: a list of dicts whose
+# items may come with 'quantities' (see preprocessing_utils.clean_chunk), or a
+# TransactionStore, where an item repeated in a basket counts once per repeat
+def _flatten(transactions):
+    if hasattr(transactions, 'offsets'):
+        lengths = np.diff(transactions.offsets)
+        names = np.array(transactions.vocabulary, dtype=object)[transactions.items]
+        quantities = np.ones(len(names))
+        return np.repeat(np.arange(len(transactions), dtype=np.int64), lengths), names, quantities, len(transactions)
+
+    rows, names, quantities = [], [], []
+    num_transactions = 0
+    for transaction in transactions:
+        items = transaction['items']
+        rows.extend([num_transactions] * len(items))
+        names.extend(items)
+        quantities.extend(transaction.get('quantities') or [1] * len(items))
+        num_transactions += 1
+
+    return (np.array(rows, dtype=np.int64), np.array(names, dtype=object), np.array(quantities, dtype=float),
+            num_transactions)
+
+# Pair TWUs of the ranked baskets, as {first rank * num_items + second rank: twu}
+def _pair_twus(rows, ranks, basket_utilities, num_items):
+    ends = np.searchsorted(rows, rows, side='right')
+    later = ends - np.arange(len(rows)) - 1
+    num_pairs = int(later.sum())
+    if num_pairs > COOCCURRENCE_PAIR_LIMIT:
+        return None
+    if num_pairs == 0:
+        return {}
+
+    first = np.repeat(np.arange(len(rows)), later)
+    step = np.arange(num_pairs) - np.repeat(np.cumsum(later) - later, later)
+    second = first + 1 + step
+    keys, inverse = np.unique(ranks[first] * num_items + ranks[second], return_inverse=True)
+    twus = np.bincount(inverse, weights=basket_utilities[rows[first]])
+
+    return dict(zip(keys.tolist(), twus.tolist()))
+
+# Utility list of prefix + x + y from those of prefix + x and prefix + y
+# (prefix_list is None for an empty prefix). None when the two share no
+# basket, or when the baskets they share cannot reach min_utility (HUI-Miner's
+# LA-prune: x's utility and remaining utility there bound every extension).
+def _join(prefix_list, x_list, y_list, min_utility):
+    y_at = np.searchsorted(y_list.rows, x_list.rows)
+    shared = y_list.rows[np.minimum(y_at, len(y_list.rows) - 1)] == x_list.rows
+    if not shared.any() or x_list.utilities[shared].sum() + x_list.remaining[shared].sum() < min_utility:
+        return None
+
+    rows, y_at = x_list.rows[shared], y_at[shared]
+    utilities = x_list.utilities[shared] + y_list.utilities[y_at]
+    if prefix_list is not None:
+        utilities -= prefix_list.utilities[np.searchsorted(prefix_list.rows, rows)]
+
+    return UtilityList(rows, utilities, y_list.remaining[y_at])
+
+# Depth-first search over the extensions (rank, UtilityList) of prefix, in rank order
+def _search(prefix, prefix_list, extensions, min_utility, pair_twus, num_items, results, counters, cancel=None):
+    for i, (rank, utility_list) in enumerate(extensions):
+        if cancel is not None and cancel.cancelled:
+            return
+
+        itemset = prefix + (rank,)
+        if utility_list.utility >= min_utility:
+            results[itemset] = utility_list.utility
+        if utility_list.upper_bound < min_utility:
+            counters['pruned_by_remaining'] += 1
+            continue
+
+        new_extensions = []
+        for other_rank, other_list in extensions[i + 1:]:
+            if pair_twus is not None and pair_twus.get(rank * num_items + other_rank, 0.0) < min_utility:
+                counters['pruned_by_cooccurrence'] += 1
+                continue
+
+            counters['joins'] += 1
+            joined = _join(prefix_list, utility_list, other_list, min_utility)
+            if joined is not None:
+                new_extensions.append((other_rank, joined))
+
+        _search(itemset, utility_list, new_extensions, min_utility, pair_twus, num_items, results, counters, cancel)
+
+# High-utility itemsets of transactions (a list of dicts, with or without
+# 'quantities', or a TransactionStore), priced by prices ({item: unit price},
+# see preprocessing_utils.load_product_prices). min_utility is a revenue.
+# Returns {'itemsets': levels of {itemset: utility} shaped like eclat()'s,
+# 'total_utility', 'unpriced_items', 'pruned_by_twu', 'pruned_by_remaining',
+# 'pruned_by_cooccurrence', 'joins'}. Items without a price are left out of
+# every basket. A CancellationToken as cancel stops with what was found so far.
+def mine_high_utility(transactions, prices, min_utility, cancel=None):
+    rows, names, quantities, num_transactions = _flatten(transactions)
+    results = {}
+    counters = {'pruned_by_twu': 0, 'pruned_by_remaining': 0, 'pruned_by_cooccurrence': 0, 'joins': 0}
+
+    vocabulary, item_ids = np.unique(names.astype(str), return_inverse=True)
+    vocabulary = vocabulary.tolist()
+    unit_prices = np.array([prices.get(item, np.nan) for item in vocabulary], dtype=float)
+    unpriced_items = int(np.isnan(unit_prices).sum())
+    priced = ~np.isnan(unit_prices[item_ids])
+
+    # One entry per (basket, item), quantities of repeated entries summed
+    num_ids = max(len(vocabulary), 1)
+    keys, inverse = np.unique(rows[priced] * num_ids + item_ids[priced], return_inverse=True)
+    rows, item_ids = keys // num_ids, keys % num_ids
+    utilities = np.bincount(inverse, weights=quantities[priced], minlength=len(keys)) * unit_prices[item_ids]
+
+    basket_utilities = np.bincount(rows, weights=utilities, minlength=num_transactions)
+    total_utility = float(basket_utilities.sum())
+
+    # Transaction-weighted utility of every item; items below min_utility go
+    twus = np.bincount(item_ids, weights=basket_utilities[rows], minlength=len(vocabulary))
+    present = np.bincount(item_ids, minlength=len(vocabulary)) > 0
+    promising = np.flatnonzero(present & (twus >= min_utility))
+    counters['pruned_by_twu'] = int((present & (twus < min_utility)).sum())
+
+    # Rank items by ascending TWU and sort each basket by rank
+    order = promising[np.argsort(twus[promising], kind='stable')]
+    rank_of = np.full(len(vocabulary), -1, dtype=np.int64)
+    rank_of[order] = np.arange(len(order))
+    ranks = rank_of[item_ids]
+    kept = ranks >= 0
+    rows, ranks, utilities = rows[kept], ranks[kept], utilities[kept]
+    by_basket = np.lexsort((ranks, rows))
+    rows, ranks, utilities = rows[by_basket], ranks[by_basket], utilities[by_basket]
+
+    # Remaining utility: what the items after this one earn in its basket
+    totals = np.cumsum(utilities)
+    basket_ends = np.searchsorted(rows, rows, side='right') - 1
+    remaining = totals[basket_ends] - totals
+
+    num_items = len(order)
+    basket_utilities = np.bincount(rows, weights=utilities, minlength=num_transactions)
+    pair_twus = _pair_twus(rows, ranks, basket_utilities, num_items)
+
+    by_rank = np.lexsort((rows, ranks))
+    starts = np.searchsorted(ranks[by_rank], np.arange(num_items + 1))
+    extensions = []
+    for rank in range(num_items):
+        entries = by_rank[starts[rank]:starts[rank + 1]]
+        extensions.append((rank, UtilityList(rows[entries], utilities[entries], remaining[entries])))
+
+    _search((), None, extensions, min_utility, pair_twus, num_items, results, counters, cancel)
+
+    levels = {}
+    for itemset, utility in results.items():
+        levels.setdefault(len(itemset), {})[frozenset(vocabulary[order[rank]] for rank in itemset)] = utility
+
+    return {
+        'itemsets': [levels[k] for k in sorted(levels)],
+        'total_utility': total_utility,
+        'unpriced_items': unpriced_items,
+        **counters
+    }
@@ -0,0 +1,78 @@
+import time
+
+# Per-level counters collected by apriori() and eclat() when a MiningStats is passed in.
+# A level is the itemset size: the Apriori pass k or the Eclat recursion depth k.
+# Engines only touch this object behind "if stats is not None", so runs without it
+# pay nothing.
+LEVEL_FIELDS = [
+    'candidates_generated',
+    'candidates_pruned',
+    'frequent_itemsets',
+    'transactions_scanned',
+    'generation_time_ms',
+    'counting_time_ms',
+    'tidsets',
+    'tidset_size_total',
+    'tidset_size_max'
+]
+
+
+class MiningStats:
+
+    def __init__(self):
+        self.levels = {}
+
+    # Get (or create) the counters for level k
+    def level(self, k):
+        if k not in self.levels:
+            self.levels[k] = {field: 0 for field in LEVEL_FIELDS}
+
+        return self.levels[k]
+
+    # Add to the counters of level k
+    def add(self, k, **counters):
+        level = self.level(k)
+
+        for field, value in counters.items():
+            level[field] += value
+
+    # Record the sizes of the tidsets produced at level k
+    def add_tidsets(self, k, tidsets):
+        level = self.level(k)
+
+        for tidset in tidsets:
+            size = len(tidset)
+            level['tidsets'] += 1
+            level['tidset_size_total'] += size
+            if size > level['tidset_size_max']:
+                level['tidset_size_max'] = size
+
+    @property
+    def total_candidates(self):
+        return sum(level['candidates_generated'] for level in self.levels.values())
+
+    # One plain dict per level, sorted by level, with times rounded to ms precision
+    def as_rows(self):
+        rows = []
+
+        for k in sorted(self.levels):
+            level = self.levels[k]
+            row = {'level': k}
+            row.update(level)
+            row['generation_time_ms'] = round(level['generation_time_ms'], 3)
+            row['counting_time_ms'] = round(level['counting_time_ms'], 3)
+
+            # Over the tidsets actually kept, not the candidates whose intersection came out empty
+            if level['tidsets'] > 0:
+                row['tidset_size_avg'] = round(level['tidset_size_total'] / level['tidsets'], 2)
+            else:
+                row['tidset_size_avg'] = 0
+
+            rows.append(row)
+
+        return rows
+
+
+# Milliseconds elapsed since a time.perf_counter() reading
+def elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,250 @@
+import sys
+import tracemalloc
+import pandas as pd
+
+from .apriori import get_items_list, generate_L1, generate_Ck, generate_Lk
+from .eclat import build_vertical_format, eclat_recursive
+from .association_rules import generate_rules
+
+# Phases of a mining run, in execution order. Not every engine has every phase:
+# Apriori has no vertical format, Eclat needs no item-list encoding.
+PHASES = ['encoding', 'vertical format', 'candidate sets', 'results', 'rules']
+
+MB = 1024 * 1024
+
+
+# Classify an object into the data structure it represents
+def structure_of(obj):
+    if isinstance(obj, frozenset):
+        return 'frozenset itemsets'
+    if isinstance(obj, set):
+        # Apriori keeps candidates in a set of frozensets, Eclat keeps tids in sets
+        if obj and isinstance(next(iter(obj)), frozenset):
+            return 'candidate sets'
+        return 'tidset sets'
+    if isinstance(obj, dict):
+        return 'rule dicts' if 'antecedent' in obj else 'support dicts'
+    if isinstance(obj, list):
+        return 'lists'
+    if isinstance(obj, tuple):
+        return 'tuples'
+    if isinstance(obj, str):
+        return 'strings'
+    if isinstance(obj, (int, float)):
+        return 'numbers'
+
+    return type(obj).__name__
+
+# Deep size of obj broken down by data structure. Objects already in seen
+# (e.g. item strings owned by an earlier phase) are not counted again. seen
+# maps id -> object so that measured objects stay alive: a freed object's id
+# can be reused by a new one, which would then be skipped.
+def measure_structures(obj, seen):
+    sizes = {}
+    stack = [obj]
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen[id(current)] = current
+
+        name = structure_of(current)
+        sizes[name] = sizes.get(name, 0) + sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+
+    return sizes
+
+
+# Accumulates tracemalloc snapshot diffs per phase. A phase may be entered
+# several times (Apriori alternates candidate sets and results per level).
+class PhaseProfiler:
+
+    def __init__(self):
+        self.phases = {}
+        self.seen = {}
+        self._current = None
+
+    def begin(self, phase):
+        before = self._snapshot()
+        tracemalloc.reset_peak()
+        self._current = (phase, before, tracemalloc.get_traced_memory()[0])
+
+    def end(self, outputs=None):
+        phase, before, start_bytes = self._current
+        _, peak = tracemalloc.get_traced_memory()
+        after = self._snapshot()
+
+        record = self._record(phase)
+        record['peak_bytes'] = max(record['peak_bytes'], peak - start_bytes)
+
+        for stat in after.compare_to(before, 'lineno'):
+            if stat.size_diff == 0:
+                continue
+            frame = stat.traceback[0]
+            key = f"{frame.filename}:{frame.lineno}"
+            size, count = record['sites'].get(key, (0, 0))
+            record['sites'][key] = (size + stat.size_diff, count + stat.count_diff)
+
+        if outputs is not None:
+            self.measure(phase, outputs)
+
+        self._current = None
+
+    # Add the deep size of obj to phase's data structures, minus whatever an
+    # earlier measurement already claimed
+    def measure(self, phase, obj):
+        structures = self._record(phase)['structures']
+        for name, size in measure_structures(obj, self.seen).items():
+            structures[name] = structures.get(name, 0) + size
+
+    def _record(self, phase):
+        return self.phases.setdefault(phase, {'sites': {}, 'structures': {}, 'peak_bytes': 0})
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+
+
+def _profile_apriori(profiler, transactions, min_support, min_confidence):
+    profiler.begin('encoding')
+    items_list = get_items_list(transactions)
+    profiler.end(items_list)
+
+    L = []
+
+    profiler.begin('results')
+    L1 = generate_L1(items_list, min_support)
+    L.append(L1)
+    profiler.end(L1)
+
+    k = 2
+    while True:
+        profiler.begin('candidate sets')
+        Ck = generate_Ck(L[k-2], k)
+        profiler.end()
+
+        profiler.begin('results')
+        Lk = generate_Lk(Ck, items_list, min_support)
+        profiler.end(Lk)
+
+        # The frequent candidates are Lk's keys and count as results; the
+        # candidate sets are the set itself and the candidates that were pruned
+        profiler.measure('candidate sets', Ck)
+
+        # Candidates are dropped level by level, exactly like apriori()
+        del Ck
+
+        if not Lk:
+            break
+
+        L.append(Lk)
+        k += 1
+
+    return L
+
+def _profile_eclat(profiler, transactions, min_support, min_confidence):
+    profiler.begin('vertical format')
+    vertical = build_vertical_format(transactions)
+    profiler.end(vertical)
+
+    # The intersected tidsets only live during the recursion, so this phase
+    # is described by its peak; what it retains is the results dict
+    profiler.begin('candidate sets')
+    items = [(item, vertical[item]) for item in vertical]
+    results = {}
+    eclat_recursive(frozenset(), items, len(transactions), results, min_support)
+    profiler.end()
+
+    profiler.begin('results')
+    levels = {}
+    for itemset, support in results.items():
+        levels.setdefault(len(itemset), {})[itemset] = support
+    sorted_levels = [levels[k] for k in sorted(levels)]
+    del results
+    profiler.end(sorted_levels)
+
+    return sorted_levels
+
+_PROFILED_ENGINES = {
+    'Apriori': _profile_apriori,
+    'Eclat': _profile_eclat,
+}
+
+
+# Run one engine phase by phase under tracemalloc and attribute memory to each
+# phase: net bytes retained, transient peak, the top_n allocation sites and
+# the deep size of the phase's output by data structure.
+def profile_memory(transactions, engine='Apriori', min_support=0.2, min_confidence=0.5, top_n=10):
+    profiler = PhaseProfiler()
+
+    tracemalloc.start()
+    try:
+        frequent_itemsets = _PROFILED_ENGINES[engine](profiler, transactions, min_support, min_confidence)
+
+        profiler.begin('rules')
+        rules = generate_rules(frequent_itemsets, min_confidence)
+        profiler.end(rules)
+    finally:
+        tracemalloc.stop()
+
+    report = {'algorithm': engine, 'phases': []}
+
+    for phase in PHASES:
+        if phase not in profiler.phases:
+            continue
+        record = profiler.phases[phase]
+
+        sites = sorted(record['sites'].items(), key=lambda site: site[1][0], reverse=True)
+
+        report['phases'].append({
+            'phase': phase,
+            'net_mb': round(sum(size for size, _ in record['sites'].values()) / MB, 3),
+            'peak_mb': round(record['peak_bytes'] / MB, 3),
+            'structures': {name: round(size / MB, 3) for name, size
+                           in sorted(record['structures'].items(), key=lambda s: s[1], reverse=True)},
+            'top_allocations': [
+                {'site': site, 'size_mb': round(size / MB, 3), 'blocks': count}
+                for site, (size, count) in sites[:top_n]
+            ]
+        })
+
+    return report
+
+# One row per (phase, data structure) for a profile_memory report
+def structures_dataframe(report):
+    rows = []
+
+    for phase in report['phases']:
+        for name, size_mb in phase['structures'].items():
+            rows.append({'phase': phase['phase'], 'structure': name, 'size_mb': size_mb})
+
+    return pd.DataFrame(rows, columns=['phase', 'structure', 'size_mb'])
+
+def print_memory_report(report):
+    print("\n" + "="*70)
+    print(f"MEMORY PROFILE: {report['algorithm']}")
+    print("="*70)
+
+    for phase in report['phases']:
+        print(f"\n[{phase['phase']}] retained {phase['net_mb']:.3f} MB, peak {phase['peak_mb']:.3f} MB")
+
+        if phase['structures']:
+            print("  By data structure:")
+            for name, size_mb in phase['structures'].items():
+                print(f"    {name:20s} {size_mb:10.3f} MB")
+
+        if phase['top_allocations']:
+            print("  Top allocation sites:")
+            for site in phase['top_allocations']:
+                print(f"    {site['size_mb']:10.3f} MB {site['blocks']:8d} blocks  {site['site']}")
+
+    print("="*70 + "\n")
@@ -0,0 +1,338 @@
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .cancellation import CancellationToken
+from .performance_comparison import run_engines_isolated, create_comparison_dataframe
+
+# Background mining jobs, scheduled on one process-wide MiningScheduler.
+# A job is split into one task per engine; every task runs its engine in a
+# worker process (run_engines_isolated) on a bounded pool, so the caller gets a
+# handle back immediately and polls it for progress and results. Identical
+# tasks submitted by different sessions share a single computation.
+
+ENGINE_NAMES = ['Apriori', 'Eclat']
+
+# Memory assumed for a task submitted without a memory ceiling
+DEFAULT_TASK_MEMORY_MB = 1024
+
+
+class SchedulerBusy(RuntimeError):
+    pass
+
+
+# Content hash of a transaction list (or TransactionStore), the dataset part of a task's dedupe key
+def dataset_fingerprint(transactions):
+    if hasattr(transactions, 'fingerprint'):
+        return transactions.fingerprint()
+
+    digest = hashlib.sha1()
+
+    for transaction in transactions:
+        digest.update("\x1f".join(map(str, transaction['items'])).encode())
+        digest.update(b"\x1e")
+
+    return digest.hexdigest()
+
+# Half of the machine's physical memory, or None where that is unknown
+def _default_memory_budget_mb():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (2 * 1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+# One engine run shared by every job that asked for it
+class MiningTask:
+
+    def __init__(self, key, engine, transactions, params):
+        self.key = key
+        self.engine = engine
+        self.transactions = transactions
+        self.params = params
+        self.memory_mb = params['memory_limit_mb'] or DEFAULT_TASK_MEMORY_MB
+        self.token = CancellationToken()
+        # Latest progress event, written from the task thread
+        self.progress = None
+        self.subscribers = 0
+        self.status = 'queued'
+        self.results = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def run(self):
+        self.started_at = time.time()
+        # The time budget only starts counting once the task leaves the queue
+        if self.params['timeout_s'] is not None:
+            self.token.deadline = time.monotonic() + self.params['timeout_s']
+
+        def on_progress(event):
+            self.progress = event
+
+        try:
+            self.results = run_engines_isolated(
+                [self.engine],
+                self.transactions,
+                self.params['min_support'],
+                self.params['min_confidence'],
+                memory_limit_mb=self.params['memory_limit_mb'],
+                collect_stats=True,
+                progress=on_progress,
+                cancel=self.token
+            )[self.engine]
+            return 'cancelled' if self.token.reason == 'cancelled' else 'done'
+        except Exception as e:
+            self.error = e
+            return 'failed'
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+
+        return (self.finished_at or time.time()) - self.started_at
+
+
+# Process-wide scheduler: a bounded pool of task threads, each driving one
+# engine worker process. A task is admitted when a CPU slot is free and its
+# memory ceiling fits in what is left of memory_budget_mb; otherwise it waits
+# in a FIFO queue of at most max_queue tasks, beyond which submit() raises
+# SchedulerBusy.
+class MiningScheduler:
+
+    def __init__(self, cpu_slots=None, memory_budget_mb=None, max_queue=32):
+        self.cpu_slots = cpu_slots or os.cpu_count() or 1
+        self.memory_budget_mb = memory_budget_mb if memory_budget_mb is not None else _default_memory_budget_mb()
+        self.max_queue = max_queue
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.cpu_slots, thread_name_prefix="mining-task")
+        self._queue = deque()
+        self._running = set()
+        # Active tasks by dedupe key
+        self._tasks = {}
+        self._memory_in_use_mb = 0
+        self._shared = 0
+        self._completed = 0
+
+    # Subscribe to the task for this (dataset, engine, parameters), creating
+    # and queueing it if none is active
+    def submit(self, engine, transactions, params, fingerprint=None):
+        if fingerprint is None:
+            fingerprint = dataset_fingerprint(transactions)
+        key = (fingerprint, engine, params['min_support'], params['min_confidence'],
+               params['timeout_s'], params['memory_limit_mb'])
+
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None:
+                task.subscribers += 1
+                self._shared += 1
+                return task
+
+            task = MiningTask(key, engine, transactions, params)
+            if self.memory_budget_mb is not None and task.memory_mb > self.memory_budget_mb:
+                raise SchedulerBusy(
+                    f"{engine} needs up to {task.memory_mb} MB, more than the "
+                    f"{self.memory_budget_mb} MB the mining server has in total")
+            if len(self._queue) >= self.max_queue:
+                raise SchedulerBusy(f"The mining queue is full ({self.max_queue} tasks waiting), try again later")
+
+            task.subscribers = 1
+            self._tasks[key] = task
+            self._queue.append(task)
+            self._dispatch()
+
+        return task
+
+    # Drop one subscriber; the last one to leave stops the task
+    def release(self, task):
+        with self._lock:
+            if not task.active:
+                return
+
+            task.subscribers -= 1
+            if task.subscribers > 0:
+                return
+
+            # A stopping task must not pick up new subscribers
+            task.token.cancel()
+            if self._tasks.get(task.key) is task:
+                del self._tasks[task.key]
+            if task.status == 'queued':
+                self._queue.remove(task)
+                self._finish(task, 'cancelled')
+
+    # Start queued tasks while a CPU slot and enough memory are free (lock held)
+    def _dispatch(self):
+        while self._queue and len(self._running) < self.cpu_slots:
+            task = self._queue[0]
+            if (self.memory_budget_mb is not None and self._running
+                    and self._memory_in_use_mb + task.memory_mb > self.memory_budget_mb):
+                break
+
+            self._queue.popleft()
+            self._running.add(task)
+            self._memory_in_use_mb += task.memory_mb
+            task.status = 'running'
+            self._executor.submit(self._run, task)
+
+    def _run(self, task):
+        status = 'failed'
+        try:
+            status = task.run()
+        finally:
+            with self._lock:
+                self._running.discard(task)
+                self._memory_in_use_mb -= task.memory_mb
+                self._finish(task, status)
+                self._dispatch()
+
+    # Retire a task from the dedupe index (lock held)
+    def _finish(self, task, status):
+        task.finished_at = time.time()
+        task.transactions = None
+        task.status = status
+        if self._tasks.get(task.key) is task:
+            del self._tasks[task.key]
+        self._completed += 1
+        task.done.set()
+
+    # Queue depth and utilization, for display
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': len(self._queue),
+                'running': len(self._running),
+                'cpu_slots': self.cpu_slots,
+                'utilization': len(self._running) / self.cpu_slots,
+                'memory_in_use_mb': self._memory_in_use_mb,
+                'memory_budget_mb': self.memory_budget_mb,
+                'shared_requests': self._shared,
+                'completed': self._completed
+            }
+
+
+# A session's handle on one mining run: one shared task per engine
+class MiningJob:
+
+    def __init__(self, scheduler, params, tasks):
+        self.scheduler = scheduler
+        # See job_params()
+        self.params = params
+        self.tasks = tasks
+        # Pipeline key of the mine stage the run was submitted for (see pipeline.Pipeline.put)
+        self.stage_key = None
+        # engine_selection.select_engine's verdict on the run, when assessed
+        self.assessment = None
+        self._released = False
+
+    # 'queued', 'running', 'done', 'cancelled' or 'failed'
+    @property
+    def status(self):
+        statuses = [task.status for task in self.tasks.values()]
+
+        if self._released:
+            return 'cancelled'
+        if 'running' in statuses:
+            return 'running'
+        if 'queued' in statuses:
+            return 'queued'
+        if 'failed' in statuses:
+            return 'failed'
+        if 'cancelled' in statuses:
+            return 'cancelled'
+
+        return 'done'
+
+    # After cancel() the job only waits for the engines it actually stopped,
+    # not for those other sessions are still waiting on
+    @property
+    def active(self):
+        return any(task.active and not (self._released and task.subscribers > 0)
+                   for task in self.tasks.values())
+
+    # True once both engines ran, i.e. there are (possibly partial) results to show
+    @property
+    def has_results(self):
+        return all(task.results is not None for task in self.tasks.values())
+
+    # Seconds the longest-running engine has been running (0 while queued)
+    @property
+    def elapsed(self):
+        return max(task.elapsed for task in self.tasks.values())
+
+    # Latest progress event per engine
+    @property
+    def progress(self):
+        return {engine: task.progress for engine, task in self.tasks.items() if task.progress is not None}
+
+    def error(self):
+        for task in self.tasks.values():
+            if task.error is not None:
+                return task.error
+
+        return None
+
+    # (apriori_results, eclat_results, comparison_df); raises what a task raised
+    def result(self):
+        error = self.error()
+        if error is not None:
+            raise error
+
+        apriori_results = self.tasks['Apriori'].results
+        eclat_results = self.tasks['Eclat'].results
+
+        return apriori_results, eclat_results, create_comparison_dataframe(apriori_results, eclat_results)
+
+    # Leave the run: engines nobody else is waiting for stop with the levels they completed
+    def cancel(self):
+        if self._released:
+            return
+
+        self._released = True
+        for task in self.tasks.values():
+            self.scheduler.release(task)
+
+
+# Parameters of a run, with the transaction count for display; the scheduler
+# tells datasets apart by their content fingerprint
+def job_params(transactions, min_support=0.2, min_confidence=0.5, timeout_s=None, memory_limit_mb=None):
+    return {
+        'num_transactions': len(transactions),
+        'min_support': min_support,
+        'min_confidence': min_confidence,
+        'timeout_s': timeout_s,
+        'memory_limit_mb': memory_limit_mb
+    }
+
+# Submit a mining run on scheduler and return its MiningJob handle right away.
+# transactions (a list or a TransactionStore) is copied, so the caller may keep
+# adding transactions meanwhile.
+# Raises SchedulerBusy when the scheduler cannot admit the run.
+def submit_mining_job(scheduler, transactions, min_support=0.2, min_confidence=0.5, timeout_s=None,
+                      memory_limit_mb=None):
+    params = job_params(transactions, min_support, min_confidence, timeout_s, memory_limit_mb)
+    transactions = transactions.snapshot() if hasattr(transactions, 'snapshot') else list(transactions)
+    fingerprint = dataset_fingerprint(transactions)
+
+    tasks = {}
+    try:
+        for engine in ENGINE_NAMES:
+            tasks[engine] = scheduler.submit(engine, transactions, params, fingerprint)
+    except SchedulerBusy:
+        for task in tasks.values():
+            scheduler.release(task)
+        raise
+
+    return MiningJob(scheduler, params, tasks)
@@ -0,0 +1,155 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.preprocessing.transaction_store import TransactionStore
+from .eclat import eclat_recursive
+
+# Multi-level mining over the product hierarchy of products.csv (item ->
+# category), after Han & Fu's ML_T2. Baskets are encoded once, with item ids
+# and the category id of every item. Category-level itemsets are mined first;
+# they are few and dense, so this is quick. The item-level search then only
+# keeps items whose category is frequent (the filtered table T[2]) and only
+# extends an itemset when the categories it covers form a frequent
+# category itemset, so the tidset intersections under infrequent categories
+# are never computed.
+#
+# An itemset's categories are at least as frequent as the itemset itself, so
+# with category_min_support <= min_support the pruning loses nothing and the
+# item-level result equals eclat()'s. A higher category_min_support is ML_T2's
+# progressive deepening: item patterns are only searched under category
+# patterns that are frequent at the stricter category threshold.
+
+# Category of items missing from the catalog
+UNCATEGORIZED = 'uncategorized'
+
+
+# A basket table encoded once for both levels
+class HierarchyEncoding:
+
+    def __init__(self, transactions, item_categories):
+        store = transactions if hasattr(transactions, 'offsets') else TransactionStore.from_transactions(transactions)
+
+        self.num_transactions = len(store)
+        self.vocabulary = list(store.vocabulary)
+        self.category_names = sorted({item_categories.get(item, UNCATEGORIZED) for item in self.vocabulary})
+        category_ids = {category: i for i, category in enumerate(self.category_names)}
+        # Category id of every item id
+        self.item_category = np.array(
+            [category_ids[item_categories.get(item, UNCATEGORIZED)] for item in self.vocabulary], dtype=np.int32)
+
+        lengths = np.diff(store.offsets)
+        rows = np.repeat(np.arange(self.num_transactions, dtype=np.int64), lengths)
+
+        # Distinct (row, item) and (row, category) pairs, grouped by id
+        self._item_starts, self._item_rows = _group_rows(rows, store.items, len(self.vocabulary),
+                                                         self.num_transactions)
+        self._category_starts, self._category_rows = _group_rows(
+            rows, self.item_category[store.items], len(self.category_names), self.num_transactions)
+
+    # Transactions holding each item id / category id
+    def item_counts(self):
+        return np.diff(self._item_starts)
+
+    def item_tidset(self, item_id):
+        return set(self._item_rows[self._item_starts[item_id]:self._item_starts[item_id + 1]].tolist())
+
+    def category_tidset(self, category_id):
+        return set(self._category_rows[self._category_starts[category_id]:self._category_starts[category_id + 1]].tolist())
+
+
+# (starts, rows): the distinct rows of each id in ascending order, as CSR
+def _group_rows(rows, ids, num_ids, num_rows):
+    width = max(num_rows, 1)
+    pairs = np.unique(ids.astype(np.int64) * width + rows)
+    starts = np.searchsorted(pairs // width, np.arange(num_ids + 1))
+
+    return starts, pairs % width
+
+def _levels(results):
+    levels = {}
+    for itemset, support in results.items():
+        levels.setdefault(len(itemset), {})[itemset] = support
+
+    return [levels[k] for k in sorted(levels)]
+
+
+# Eclat over item tidsets that extends an itemset only when the categories
+# it covers are a frequent category itemset. Each entry of items is
+# (item, category, tidset); counters tallies pruned and counted candidates.
+def _mine_items(prefix, prefix_categories, items, total_transactions, min_support, frequent_categories, results,
+                counters, cancel=None):
+    while items:
+        if cancel is not None and cancel.cancelled:
+            return
+
+        item, category, tidset = items.pop()
+        itemset = prefix | {item}
+        categories = prefix_categories | {category}
+        results[itemset] = len(tidset) / total_transactions
+
+        new_items = []
+        for other, other_category, other_tidset in items:
+            if categories | {other_category} not in frequent_categories:
+                counters['pruned_by_category'] += 1
+                continue
+
+            counters['intersections'] += 1
+            intersection = tidset & other_tidset
+            if len(intersection) / total_transactions >= min_support:
+                new_items.append((other, other_category, intersection))
+
+        _mine_items(itemset, categories, new_items, total_transactions, min_support, frequent_categories, results,
+                    counters, cancel)
+
+# Category- and item-level frequent itemsets of transactions (a list or a
+# TransactionStore). item_categories maps item names to categories (see
+# preprocessing_utils.load_product_categories); category_min_support
+# defaults to min_support. Returns {'categories': levels, 'items': levels,
+# 'items_dropped', 'pruned_by_category', 'intersections'}, levels shaped like
+# eclat()'s; a CancellationToken as cancel stops with what was found so far.
+def mine_multilevel(transactions, item_categories, min_support=0.2, category_min_support=None, cancel=None):
+    if category_min_support is None:
+        category_min_support = min_support
+
+    encoding = transactions if isinstance(transactions, HierarchyEncoding) \
+        else HierarchyEncoding(transactions, item_categories)
+    total_transactions = encoding.num_transactions
+
+    # Level 1: categories
+    category_results = {}
+    if total_transactions:
+        categories = [(name, encoding.category_tidset(i)) for i, name in enumerate(encoding.category_names)]
+        eclat_recursive(frozenset(), categories, total_transactions, category_results, category_min_support,
+                        cancel=cancel)
+    frequent_categories = set(category_results)
+
+    # Level 2: items of frequent categories (T[2]) that are frequent themselves
+    counts = encoding.item_counts()
+    items = []
+    items_dropped = 0
+    for item_id, item in enumerate(encoding.vocabulary):
+        category = encoding.category_names[encoding.item_category[item_id]]
+        if counts[item_id] == 0 or counts[item_id] / total_transactions < min_support:
+            continue
+        if frozenset([category]) not in frequent_categories:
+            items_dropped += 1
+            continue
+        items.append((item, category, encoding.item_tidset(item_id)))
+
+    item_results = {}
+    counters = {'pruned_by_category': 0, 'intersections': 0}
+    _mine_items(frozenset(), frozenset(), items, total_transactions, min_support, frequent_categories, item_results,
+                counters, cancel)
+
+    return {
+        'categories': _levels(category_results),
+        'items': _levels(item_results),
+        'items_dropped': items_dropped,
+        **counters
+    }
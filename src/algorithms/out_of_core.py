@@ -0,0 +1,388 @@
+import heapq
+import math
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.preprocessing.transaction_formats import iter_transaction_chunks
+from .eclat import eclat_recursive
+
+# Out-of-core Apriori for transaction files larger than RAM. The file is
+# streamed twice as TransactionStore chunks and never held in memory:
+#
+# Pass 1 counts every item and every pair of distinct items per transaction.
+#   Pair counts are kept as sorted (pair code, count) arrays within half the
+#   memory budget (new batches are buffered and merged in together); beyond
+#   that they are spilled to disk as a sorted run, and the runs are merged
+#   range by range at the end. This gives L1 and L2.
+# Pass 2 writes each transaction, reduced to the items of frequent pairs, to
+#   disk partitions: items are split into groups, and the partition of a group
+#   gets the suffix of the transaction starting at its first item from that
+#   group. Every itemset whose smallest item is in the group is contained in
+#   those suffixes, once per transaction, so each partition is mined on its
+#   own (Eclat over the partition's tidsets) for the itemsets of 3+ items.
+#
+# The levels returned are the same as apriori() on the whole file, including
+# its L1 convention of counting every occurrence of an item.
+
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+# Rough memory of one tidset entry (a Python int in a set) while mining a partition
+TIDSET_ENTRY_BYTES = 64
+# Pairs generated at once when counting a chunk
+PAIR_BATCH = 4 * 1024 * 1024
+
+
+# Where the transactions come from: a path, or a callable returning a fresh
+# iterator of TransactionStore chunks (it is called once per pass)
+def _chunk_source(source, read_options):
+    if callable(source):
+        return source
+
+    return lambda: iter_transaction_chunks(source, **read_options)
+
+# Chunk items mapped to global ids, the chunk's vocabulary merged into vocabulary
+def _global_items(chunk, vocabulary, item_ids):
+    id_map = np.empty(len(chunk.vocabulary), dtype=np.int64)
+    for i, item in enumerate(chunk.vocabulary):
+        item_id = item_ids.get(item)
+        if item_id is None:
+            item_id = item_ids[item] = len(vocabulary)
+            vocabulary.append(item)
+        id_map[i] = item_id
+
+    return id_map[chunk.items]
+
+# Rows and items of a chunk sorted by (row, item), duplicates within a row removed
+def _distinct_rows(items, offsets, keep=None):
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    if keep is not None:
+        kept = keep[items]
+        rows, items = rows[kept], items[kept]
+
+    order = np.lexsort((items, rows))
+    rows, items = rows[order], items[order]
+    distinct = np.ones(len(items), dtype=bool)
+    distinct[1:] = (rows[1:] != rows[:-1]) | (items[1:] != items[:-1])
+
+    return rows[distinct], items[distinct]
+
+# Codes (a << 32 | b, a < b) of every pair of items within the same row
+def _pair_codes(rows, items):
+    # Items after each position in the same row
+    row_ends = np.searchsorted(rows, rows, side='right')
+    following = row_ends - np.arange(len(rows)) - 1
+    total = np.cumsum(following)
+
+    start = 0
+    while start < len(rows):
+        # Cut the positions into batches of at most PAIR_BATCH pairs
+        done = total[start - 1] if start else 0
+        end = max(start + 1, int(np.searchsorted(total, done + PAIR_BATCH, side='right')))
+        counts = following[start:end]
+        left = np.repeat(np.arange(start, end), counts)
+        right = left + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        yield (items[left] << 32) | items[right]
+        start = end
+
+# Add (codes, counts) into the sorted accumulator (acc_codes, acc_counts)
+def _merge_counts(acc_codes, acc_counts, codes, counts):
+    codes = np.concatenate((acc_codes, codes))
+    counts = np.concatenate((acc_counts, counts))
+    merged, inverse = np.unique(codes, return_inverse=True)
+
+    return merged, np.bincount(inverse, weights=counts, minlength=len(merged)).astype(np.int64)
+
+
+# Pair counts of pass 1. Counted batches are buffered and merged into the
+# sorted accumulator together once they fill the budget, so the accumulator is
+# re-sorted once per budget's worth of pairs rather than once per batch. It is
+# spilled once it takes more than half the budget, leaving the other half for
+# the buffer.
+class PairCounter:
+
+    def __init__(self, memory_budget_bytes, spill_dir):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.spill_dir = spill_dir
+        self.codes = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        # Counted batches not yet merged: (codes, counts), and their size
+        self.pending = []
+        self.pending_bytes = 0
+        # Sorted runs on disk: (codes path, counts path)
+        self.runs = []
+
+    def add(self, codes):
+        codes, counts = np.unique(codes, return_counts=True)
+        self.pending.append((codes, counts))
+        self.pending_bytes += codes.nbytes + counts.nbytes
+
+        if self.codes.nbytes + self.counts.nbytes + self.pending_bytes > self.memory_budget_bytes:
+            self.merge()
+            if self.codes.nbytes + self.counts.nbytes > self.memory_budget_bytes // 2:
+                self.spill()
+
+    def merge(self):
+        if not self.pending:
+            return
+
+        self.codes, self.counts = _merge_counts(self.codes, self.counts,
+                                                np.concatenate([codes for codes, _ in self.pending]),
+                                                np.concatenate([counts for _, counts in self.pending]))
+        self.pending = []
+        self.pending_bytes = 0
+
+    def spill(self):
+        self.merge()
+        run = len(self.runs)
+        paths = (f"{self.spill_dir}/pairs-{run}-codes.npy", f"{self.spill_dir}/pairs-{run}-counts.npy")
+        np.save(paths[0], self.codes)
+        np.save(paths[1], self.counts)
+        self.runs.append(paths)
+
+        self.codes = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    # (codes, counts) of the pairs whose count reaches min_count, merging the
+    # spilled runs one range of first items at a time
+    def frequent(self, min_count):
+        self.merge()
+        if not self.runs:
+            keep = self.counts >= min_count
+            return self.codes[keep], self.counts[keep]
+
+        self.spill()
+        runs = [(np.load(codes, mmap_mode='r'), np.load(counts, mmap_mode='r')) for codes, counts in self.runs]
+        entries = sum(len(codes) for codes, _ in runs)
+        ranges = max(1, math.ceil(16 * entries / self.memory_budget_bytes))
+
+        # Split the code space at quantiles of the largest run
+        largest = max(runs, key=lambda run: len(run[0]))[0]
+        bounds = [largest[len(largest) * i // ranges] for i in range(1, ranges)] if len(largest) else []
+        bounds = [np.iinfo(np.int64).min] + sorted(set(int(bound) for bound in bounds)) + [np.iinfo(np.int64).max]
+
+        frequent_codes, frequent_counts = [], []
+        for low, high in zip(bounds[:-1], bounds[1:]):
+            parts = []
+            for codes, counts in runs:
+                start, end = np.searchsorted(codes, [low, high])
+                parts.append((codes[start:end], counts[start:end]))
+
+            codes, counts = _merge_counts(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                                          np.concatenate([codes for codes, _ in parts]),
+                                          np.concatenate([counts for _, counts in parts]))
+            keep = counts >= min_count
+            frequent_codes.append(codes[keep])
+            frequent_counts.append(counts[keep])
+
+        return np.concatenate(frequent_codes), np.concatenate(frequent_counts)
+
+
+# Smallest integer count whose support count / n passes min_support
+def _min_count(n, min_support):
+    count = max(0, math.floor(min_support * n) - 1)
+    while count / n < min_support:
+        count += 1
+
+    return count
+
+# Which of values are in sorted_ids
+def _contains(sorted_ids, values):
+    if not len(sorted_ids):
+        return np.zeros(len(values), dtype=bool)
+
+    positions = np.minimum(np.searchsorted(sorted_ids, values), len(sorted_ids) - 1)
+    return sorted_ids[positions] == values
+
+# Split items into groups of about equal total count
+def _item_groups(items, counts, num_groups):
+    group_of = {}
+    heap = [(0, group) for group in range(num_groups)]
+
+    for item in sorted(items, key=lambda item: -counts[item]):
+        load, group = heapq.heappop(heap)
+        group_of[item] = group
+        heapq.heappush(heap, (load + counts[item], group))
+
+    return group_of
+
+# Mine frequent itemsets larger than pairs out of core. source is a
+# transaction file path (any format iter_transaction_chunks reads, with
+# read_options passed through) or a callable returning a fresh chunk iterator.
+# memory_budget_mb bounds the pair counts held in memory and sizes the
+# partitions. Returns levels like apriori(); a progress callback receives each
+# level as it is known, and a tripped CancellationToken returns the levels
+# completed so far.
+def apriori_out_of_core(source, min_support=0.2, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, spill_dir=None,
+                        progress=None, cancel=None, **read_options):
+    chunks = _chunk_source(source, read_options)
+    memory_budget_bytes = memory_budget_mb * 1024 * 1024
+
+    with tempfile.TemporaryDirectory(prefix="out-of-core-", dir=spill_dir) as spill_dir:
+        vocabulary = []
+        item_ids = {}
+        item_counts = np.zeros(0, dtype=np.int64)
+        pairs = PairCounter(memory_budget_bytes // 2, spill_dir)
+        n = 0
+
+        # Pass 1: item occurrences and pairs of distinct items
+        for chunk in chunks():
+            if cancel is not None and cancel.cancelled:
+                return []
+
+            items = _global_items(chunk, vocabulary, item_ids)
+            item_counts = np.concatenate((item_counts, np.zeros(len(vocabulary) - len(item_counts), dtype=np.int64)))
+            item_counts += np.bincount(items, minlength=len(vocabulary))
+            n += len(chunk)
+
+            rows, distinct_items = _distinct_rows(items, chunk.offsets)
+            for codes in _pair_codes(rows, distinct_items):
+                pairs.add(codes)
+
+        if n == 0:
+            return [{}]
+
+        min_count = _min_count(n, min_support)
+        in_L1 = item_counts / n >= min_support
+        L1 = {frozenset({vocabulary[item]}): int(item_counts[item]) / n for item in np.flatnonzero(in_L1).tolist()}
+        levels = [L1]
+        if progress is not None and L1:
+            progress({'engine': 'Apriori', 'level': 1, 'itemsets': L1})
+
+        # L2: frequent pairs of L1 items (the candidates apriori() would count)
+        codes, counts = pairs.frequent(min_count)
+        first, second = codes >> 32, codes & 0xFFFFFFFF
+        keep = in_L1[first] & in_L1[second]
+        first, second, counts = first[keep], second[keep], counts[keep]
+
+        L2 = {frozenset({vocabulary[a], vocabulary[b]}): count / n
+              for a, b, count in zip(first.tolist(), second.tolist(), counts.tolist())}
+        if not L2:
+            return levels
+        levels.append(L2)
+        if progress is not None:
+            progress({'engine': 'Apriori', 'level': 2, 'itemsets': L2})
+
+        # Extensions of each item: the larger items it forms a frequent pair with
+        partners = {}
+        for a, b in zip(first.tolist(), second.tolist()):
+            partners.setdefault(a, []).append(b)
+
+        in_pairs = np.zeros(len(vocabulary), dtype=bool)
+        in_pairs[first] = True
+        in_pairs[second] = True
+
+        # Enough partitions for one partition's tidsets to fit in the budget
+        # (an estimate: a partition also holds items of other groups)
+        pair_occurrences = int(item_counts[in_pairs].sum())
+        num_groups = max(1, math.ceil(pair_occurrences * TIDSET_ENTRY_BYTES / memory_budget_bytes))
+        group_of = _item_groups(partners.keys(), item_counts, num_groups)
+        item_group = np.full(len(vocabulary), -1, dtype=np.int64)
+        # Items a group's itemsets can contain, as sorted ids: its items and
+        # their partners. Their total size is bounded by the pairs in L2.
+        allowed = [[] for _ in range(num_groups)]
+        for item, group in group_of.items():
+            item_group[item] = group
+            allowed[group].append(item)
+            allowed[group].extend(partners[item])
+        allowed = [np.unique(np.array(ids, dtype=np.int64)) for ids in allowed]
+
+        # Pass 2: spill transaction suffixes to the partitions
+        schema = pa.schema([('items', pa.list_(pa.int64()))])
+        writers = {}
+        try:
+            for chunk in chunks():
+                if cancel is not None and cancel.cancelled:
+                    return levels
+
+                items = _global_items(chunk, vocabulary, item_ids)
+                rows, items = _distinct_rows(items, chunk.offsets, in_pairs)
+                row_ends = np.searchsorted(rows, rows, side='right')
+
+                groups = item_group[items]
+                for group in np.unique(groups[groups >= 0]).tolist():
+                    # First item of the group in every row that has one
+                    positions = np.flatnonzero(groups == group)
+                    _, first_positions = np.unique(rows[positions], return_index=True)
+                    starts = positions[first_positions]
+                    ends = row_ends[starts]
+
+                    # Suffixes, without the items no itemset of this group can contain
+                    lengths = ends - starts
+                    offsets = np.concatenate(([0], np.cumsum(lengths)))
+                    values = items[np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])]
+                    records = np.repeat(np.arange(len(starts)), lengths)
+                    kept = _contains(allowed[group], values)
+                    values, records = values[kept], records[kept]
+                    lengths = np.bincount(records, minlength=len(starts))
+
+                    # Suffixes shorter than three items add no itemset of 3+
+                    long_enough = lengths >= 3
+                    values = values[long_enough[records]]
+                    lengths = lengths[long_enough]
+                    if not len(lengths):
+                        continue
+
+                    offsets = np.concatenate(([0], np.cumsum(lengths)))
+                    batch = pa.record_batch([pa.ListArray.from_arrays(pa.array(offsets.astype(np.int32)),
+                                                                      pa.array(values))], schema=schema)
+
+                    if group not in writers:
+                        writers[group] = pa.ipc.new_file(f"{spill_dir}/partition-{group}.arrow", schema)
+                    writers[group].write_batch(batch)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        # Mine each partition: itemsets of 3+ items whose smallest item is in its group
+        results = {}
+        for group in sorted(writers):
+            if cancel is not None and cancel.cancelled:
+                return levels
+
+            table = pa.ipc.open_file(pa.memory_map(f"{spill_dir}/partition-{group}.arrow")).read_all()
+            column = table.column('items').combine_chunks()
+            lengths = np.diff(column.offsets.to_numpy())
+            record_ids = np.repeat(np.arange(len(lengths)), lengths)
+
+            vertical = {}
+            values = column.values.to_numpy()
+            order = np.argsort(values, kind='stable')
+            bounds = np.flatnonzero(np.diff(values[order])) + 1
+            for positions in np.split(order, bounds):
+                if len(positions):
+                    vertical[int(values[positions[0]])] = set(record_ids[positions].tolist())
+
+            for a, group_a in group_of.items():
+                if group_a != group or a not in vertical:
+                    continue
+
+                tidset = vertical[a]
+                extensions = [(b, tidset.intersection(vertical[b])) for b in partners[a] if b in vertical]
+                class_results = {}
+                eclat_recursive(frozenset({a}), extensions, n, class_results, min_support, cancel=cancel)
+                for itemset, support in class_results.items():
+                    if len(itemset) >= 3:
+                        results[frozenset(vocabulary[item] for item in itemset)] = support
+
+        if cancel is not None and cancel.cancelled:
+            return levels
+
+        by_size = {}
+        for itemset, support in results.items():
+            by_size.setdefault(len(itemset), {})[itemset] = support
+
+        for k in sorted(by_size):
+            levels.append(by_size[k])
+            if progress is not None:
+                progress({'engine': 'Apriori', 'level': k, 'itemsets': by_size[k]})
+
+        return levels
@@ -1,21 +1,51 @@
+import os
 import time
 import tracemalloc
+import multiprocessing
+import multiprocessing.connection
 import pandas as pd
+from pathlib import Path
 from typing import Dict, List, Tuple, Any
 
 from .apriori import apriori, get_items_list as apriori_get_items
 from .eclat import eclat
 from .association_rules import generate_rules
+from .instrumentation import MiningStats
+from .cancellation import CancellationToken
+from .memory_profiling import profile_memory, print_memory_report
+from .engine_selection import DatasetProfile, fit_cost_model
+from .encoding import (
+    encode_dataset, decode_levels, encode_rules, decode_rules
+)
 
-def measure_algorithm_performance(algorithm_func, transactions, min_support=0.2,min_confidence=0.5, algorithm_name="Algorithm"):
+# Mining engines by name: the function and whether it expects plain item lists
+ENGINES = {
+    'Apriori': (apriori, True),
+    'Eclat': (eclat, False),
+}
+
+MB = 1024 * 1024
+
+def measure_algorithm_performance(algorithm_func, transactions, min_support=0.2,min_confidence=0.5, algorithm_name="Algorithm", collect_stats=False, progress=None, cancel=None):
+
+    stats = MiningStats() if collect_stats else None
 
     tracemalloc.start()
 
     start_time = time.time()
 
-    frequent_itemsets = algorithm_func(transactions, min_support)
+    frequent_itemsets = algorithm_func(transactions, min_support, stats=stats, progress=progress, cancel=cancel)
 
-    rules = generate_rules(frequent_itemsets, min_confidence)
+    # Mining stopped early: a timed out run gets the rules of its downward-closed
+    # itemsets under a short budget of their own, a cancelled one stops here
+    stopped = cancel.stop_reason if cancel is not None else None
+    if stopped is None:
+        rules = generate_rules(frequent_itemsets, min_confidence, progress=progress, cancel=cancel)
+    elif stopped == 'timeout':
+        rules = generate_rules(_downward_closed(frequent_itemsets), min_confidence, progress=progress,
+                               cancel=CancellationToken.with_budget(PARTIAL_RULES_BUDGET_S, cancel.parent))
+    else:
+        rules = []
 
     end_time = time.time()
     execution_time_ms = (end_time - start_time) * 1000  
@@ -30,47 +60,483 @@ def measure_algorithm_performance(algorithm_func, transactions, min_support=0.2,
 
     return {
         'algorithm': algorithm_name,
+        'status': cancel.stop_reason or 'ok' if cancel is not None else 'ok',
+        'error': None,
         'execution_time_ms': round(execution_time_ms, 2),
+        'num_candidates': stats.total_candidates if stats is not None else None,
         'num_frequent_itemsets': total_frequent_itemsets,
         'num_rules': len(rules),
         'current_memory_mb': round(current_memory_mb, 3),
         'peak_memory_mb': round(peak_memory_mb, 3),
+        'level_stats': stats.as_rows() if stats is not None else None,
         'rules': rules,
         'frequent_itemsets': frequent_itemsets
     }
 
 
-def compare_algorithms(transactions, min_support=0.2, min_confidence=0.5):
+# Run Apriori and Eclat and build the comparison table. By default each engine
+# runs concurrently in its own worker process (see run_engines_isolated), bounded
+# by timeout_s and memory_limit_mb; isolated=False runs them in this process.
+# Set collect_stats to record per-level instrumentation ('level_stats') for each engine.
+# progress receives summary events (see track_progress) and a CancellationToken as
+# cancel stops both engines early, keeping the levels they completed. In this
+# process each engine gets its own timeout_s budget under cancel.
+def compare_algorithms(transactions, min_support=0.2, min_confidence=0.5, collect_stats=False,
+                       timeout_s=None, memory_limit_mb=None, isolated=True, progress=None, cancel=None):
 
     print("Running performance comparison...")
     print(f"Parameters: min_support={min_support}, min_confidence={min_confidence}")
     print(f"Total transactions: {len(transactions)}\n")
 
-    apriori_transactions = apriori_get_items(transactions)
+    if isolated:
+        print("Running Apriori and Eclat in worker processes...")
+        results = run_engines_isolated(
+            ['Apriori', 'Eclat'],
+            transactions,
+            min_support,
+            min_confidence,
+            timeout_s=timeout_s,
+            memory_limit_mb=memory_limit_mb,
+            collect_stats=collect_stats,
+            progress=progress,
+            cancel=cancel
+        )
+        apriori_results = results['Apriori']
+        eclat_results = results['Eclat']
+
+        for res in (apriori_results, eclat_results):
+            print(f"✓ {res['algorithm']} {STATUS_LABELS[res['status']]} in {res['execution_time_ms']:.2f}ms")
+        print()
+
+    else:
+        apriori_transactions = apriori_get_items(transactions)
+
+        print("Running Apriori algorithm...")
+        apriori_results = measure_algorithm_performance(
+            apriori,
+            apriori_transactions,
+            min_support,
+            min_confidence,
+            "Apriori",
+            collect_stats,
+            track_progress('Apriori', progress),
+            CancellationToken.with_budget(timeout_s, cancel)
+        )
+        print(f"✓ Apriori {STATUS_LABELS[apriori_results['status']]} in {apriori_results['execution_time_ms']:.2f}ms")
+
+        print("Running Eclat algorithm...")
+        eclat_results = measure_algorithm_performance(
+            eclat,
+            transactions,
+            min_support,
+            min_confidence,
+            "Eclat",
+            collect_stats,
+            track_progress('Eclat', progress),
+            CancellationToken.with_budget(timeout_s, cancel)
+        )
+        print(f"✓ Eclat {STATUS_LABELS[eclat_results['status']]} in {eclat_results['execution_time_ms']:.2f}ms\n")
 
-    print("Running Apriori algorithm...")
-    apriori_results = measure_algorithm_performance(
-        apriori,
-        apriori_transactions,
-        min_support,
-        min_confidence,
-        "Apriori"
-    )
-    print(f"✓ Apriori completed in {apriori_results['execution_time_ms']:.2f}ms")
+    comparison_df = create_comparison_dataframe(apriori_results, eclat_results)
+
+    return apriori_results, eclat_results, comparison_df
+
+
+# Run one engine by name on {'transaction_id', 'items'} transactions
+def run_engine(engine, transactions, min_support=0.2, min_confidence=0.5, collect_stats=False, progress=None, cancel=None):
+    algorithm_func, uses_item_lists = ENGINES[engine]
+
+    if uses_item_lists:
+        transactions = apriori_get_items(transactions)
 
-    print("Running Eclat algorithm...")
-    eclat_results = measure_algorithm_performance(
-        eclat,
+    return measure_algorithm_performance(
+        algorithm_func,
         transactions,
         min_support,
         min_confidence,
-        "Eclat"
+        engine,
+        collect_stats,
+        progress,
+        cancel
     )
-    print(f"✓ Eclat completed in {eclat_results['execution_time_ms']:.2f}ms\n")
 
-    comparison_df = create_comparison_dataframe(apriori_results, eclat_results)
 
-    return apriori_results, eclat_results, comparison_df
+# Wrap a progress callback so it receives one summary event per engine event:
+# {'engine', 'phase' ('mining' or 'rules'), 'level', 'classes_done', 'classes_total',
+#  'levels_total', 'num_itemsets' (so far), 'num_rules'}. Returns None for no callback.
+def track_progress(engine, progress):
+    if progress is None:
+        return None
+
+    state = {'num_itemsets': 0}
+
+    def on_event(event):
+        if 'itemsets' in event:
+            state['num_itemsets'] += len(event['itemsets'])
+            phase = 'mining'
+        else:
+            phase = 'rules'
+
+        progress({
+            'engine': engine,
+            'phase': phase,
+            'level': event.get('level'),
+            'classes_done': event.get('classes_done'),
+            'classes_total': event.get('classes_total'),
+            'levels_total': event.get('levels_total'),
+            'num_itemsets': state['num_itemsets'],
+            'num_rules': event.get('num_rules')
+        })
+
+    return on_event
+
+
+# How a worker run ended
+STATUS_LABELS = {
+    'ok': 'completed',
+    'timeout': 'timed out',
+    'cancelled': 'was cancelled',
+    'memory_limit': 'hit the memory limit',
+    'error': 'failed'
+}
+
+# How often the parent checks worker memory or a cancellation token
+POLL_INTERVAL_S = 0.1
+
+# Time allowed for the rules of a timed out run, which has already used up its own budget
+PARTIAL_RULES_BUDGET_S = 1.0
+
+# Resident set size of a process in bytes, None where /proc is not available
+def _resident_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Worker process: mine the int-encoded transactions, streaming every completed
+# level (Apriori) or equivalence class (Eclat) back to the parent so partial
+# results survive a timeout, then send the final metrics and rules. The parent
+# rebuilds the itemsets from the streamed levels, so they are not sent twice.
+def _engine_worker(conn, engine, transactions, min_support, min_confidence,
+                   collect_stats, return_results):
+    def send_progress(event):
+        _, peak = tracemalloc.get_traced_memory()
+        message = {key: value for key, value in event.items() if key not in ('engine', 'itemsets')}
+        message['peak_memory_mb'] = round(peak / MB, 3)
+
+        # Rule generation events carry no itemsets
+        if 'itemsets' in event:
+            message['itemsets'] = [(tuple(sorted(itemset)), support) for itemset, support in event['itemsets'].items()]
+
+        conn.send(('progress', message))
+
+    try:
+        results = run_engine(
+            engine, transactions, min_support, min_confidence, collect_stats,
+            progress=send_progress if return_results else None
+        )
+        payload = {key: value for key, value in results.items() if key not in ('rules', 'frequent_itemsets')}
+
+        if return_results:
+            payload['rules'] = encode_rules(results['rules'])
+
+        conn.send(('ok', payload))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+# Group streamed (ids, support) pairs into levels by itemset size
+def _partial_levels(progress_messages):
+    levels = {}
+
+    for message in progress_messages:
+        for ids, support in message.get('itemsets', ()):
+            levels.setdefault(len(ids), []).append((ids, support))
+
+    return [levels[k] for k in sorted(levels)]
+
+# The part of frequent_itemsets whose every subset is in it too. A stopped
+# Eclat run has only some equivalence classes (the last one possibly cut
+# short), so a rule from the rest could lack its antecedent's support.
+# Apriori's completed levels are kept whole.
+def _downward_closed(frequent_itemsets):
+    closed = []
+
+    for k, Lk in enumerate(frequent_itemsets, 1):
+        Lk = {itemset: support for itemset, support in Lk.items()
+              if len(itemset) == k and (k == 1 or all(itemset - {item} in closed[-1] for item in itemset))}
+        if not Lk:
+            break
+        closed.append(Lk)
+
+    return closed
+
+# Result dict for a worker that did not finish: whatever levels it streamed
+# back. A timed out run also gets the rules of their downward-closed part,
+# generated here within PARTIAL_RULES_BUDGET_S (or until cancel trips). Other
+# runs get none: a cancelled run should stop promptly, and rules for a run
+# that hit its memory limit or failed could exhaust this process instead.
+def _partial_results(engine, status, error, progress_messages, vocabulary, min_confidence, elapsed_ms,
+                     return_results, cancel=None):
+    frequent_itemsets = decode_levels(_partial_levels(progress_messages), vocabulary)
+    rules = []
+    if return_results and status == 'timeout':
+        rules = generate_rules(_downward_closed(frequent_itemsets), min_confidence,
+                               cancel=CancellationToken.with_budget(PARTIAL_RULES_BUDGET_S, cancel))
+    peaks = [message['peak_memory_mb'] for message in progress_messages]
+
+    return {
+        'algorithm': engine,
+        'status': status,
+        'error': error,
+        'execution_time_ms': round(elapsed_ms, 2),
+        'num_candidates': None,
+        'num_frequent_itemsets': sum(len(Lk) for Lk in frequent_itemsets),
+        'num_rules': len(rules),
+        'current_memory_mb': None,
+        'peak_memory_mb': max(peaks) if peaks else None,
+        'level_stats': None,
+        'rules': rules,
+        'frequent_itemsets': frequent_itemsets
+    }
+
+# Run several engines concurrently, each in its own worker process with its own
+# tracemalloc measurement, a shared wall-clock timeout and a per-worker memory
+# ceiling (resident memory growth, checked from /proc on Linux). Transactions go
+# to the workers int-encoded and results come back in the same compact form.
+# A CancellationToken as cancel stops the workers when it trips; progress gets
+# the summary events described in track_progress.
+# Returns {engine: results}; results carry a 'status' (see STATUS_LABELS) and,
+# when a run was stopped, the levels it completed so far.
+def run_engines_isolated(engines, transactions, min_support=0.2, min_confidence=0.5, timeout_s=None,
+                         memory_limit_mb=None, collect_stats=False, return_results=True,
+                         progress=None, cancel=None):
+    vocabulary, encoded_transactions = encode_dataset(transactions)
+
+    start_time = time.time()
+    deadline = start_time + timeout_s if timeout_s is not None else None
+
+    token_remaining = cancel.remaining() if cancel is not None else None
+    if token_remaining is not None:
+        token_deadline = start_time + token_remaining
+        deadline = token_deadline if deadline is None else min(deadline, token_deadline)
+
+    workers = {}
+    for engine in engines:
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_engine_worker,
+            args=(child_conn, engine, encoded_transactions, min_support, min_confidence,
+                  collect_stats, return_results),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        workers[parent_conn] = {
+            'engine': engine,
+            'process': process,
+            'progress': [],
+            'status': 'timeout',
+            'payload': None,
+            'elapsed_ms': None,
+            'baseline_bytes': _resident_bytes(process.pid) if memory_limit_mb is not None else None,
+            'on_progress': track_progress(engine, progress)
+        }
+
+    pending = set(workers)
+    while pending:
+        remaining = None if deadline is None else deadline - time.time()
+        if remaining is not None and remaining <= 0:
+            break
+
+        if cancel is not None and cancel.cancelled:
+            for conn in pending:
+                workers[conn]['status'] = cancel.reason
+            break
+
+        wait_s = remaining
+        if memory_limit_mb is not None or cancel is not None:
+            wait_s = POLL_INTERVAL_S if remaining is None else min(remaining, POLL_INTERVAL_S)
+
+        if memory_limit_mb is not None:
+            for conn in list(pending):
+                worker = workers[conn]
+                resident = _resident_bytes(worker['process'].pid)
+                if resident is None or worker['baseline_bytes'] is None:
+                    continue
+
+                if resident - worker['baseline_bytes'] > memory_limit_mb * MB:
+                    worker['process'].terminate()
+                    worker['status'] = 'memory_limit'
+                    worker['elapsed_ms'] = (time.time() - start_time) * 1000
+                    pending.discard(conn)
+
+            if not pending:
+                break
+
+        for conn in multiprocessing.connection.wait(list(pending), timeout=wait_s):
+            worker = workers[conn]
+
+            try:
+                kind, payload = conn.recv()
+            except EOFError:
+                worker['process'].join()
+                kind, payload = 'error', f"worker exited with code {worker['process'].exitcode}"
+
+            if kind == 'progress':
+                worker['progress'].append(payload)
+                if worker['on_progress'] is not None:
+                    worker['on_progress'](payload)
+                continue
+
+            worker['status'] = kind
+            worker['payload'] = payload
+            worker['elapsed_ms'] = (time.time() - start_time) * 1000
+            pending.discard(conn)
+
+    results = {}
+    for conn, worker in workers.items():
+        process = worker['process']
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+        # Keep the levels a stopped worker sent before it was killed
+        if worker['status'] != 'ok':
+            try:
+                while conn.poll():
+                    kind, payload = conn.recv()
+                    if kind == 'progress':
+                        worker['progress'].append(payload)
+            except (EOFError, OSError):
+                pass
+        conn.close()
+
+        engine = worker['engine']
+        if worker['status'] == 'ok':
+            res = worker['payload']
+            res['status'] = 'ok'
+            res['error'] = None
+            if return_results:
+                res['frequent_itemsets'] = decode_levels(_partial_levels(worker['progress']), vocabulary)
+                res['rules'] = decode_rules(res['rules'], vocabulary)
+            results[engine] = res
+        else:
+            elapsed_ms = worker['elapsed_ms'] if worker['elapsed_ms'] is not None else (time.time() - start_time) * 1000
+            error = worker['payload'] if worker['status'] == 'error' else None
+            results[engine] = _partial_results(
+                engine, worker['status'], error, worker['progress'], vocabulary,
+                min_confidence, elapsed_ms, return_results, cancel
+            )
+
+    return results
+
+
+# Run every engine over a grid of dataset sizes and min_support values.
+# Datasets are prefixes of one synthetic stream (or of the given transactions),
+# so runtime vs N is measured on the same basket distribution. Once an engine
+# times out, the lower supports for that size are skipped since they only get slower.
+# Each row also carries the dataset statistics the cost model of
+# engine_selection is fitted on (see fit_cost_model).
+def run_sweep(sizes, supports, engines=None, min_confidence=0.5, timeout_s=60,
+              transactions=None, generator_options=None, verbose=True):
+    if engines is None:
+        engines = list(ENGINES)
+
+    sizes = sorted(sizes)
+    supports = sorted(supports, reverse=True)
+
+    if transactions is None:
+        from src.preprocessing.synthetic_data import generate_transactions
+        transactions = list(generate_transactions(sizes[-1], **(generator_options or {})))
+
+    rows = []
+
+    for size in sizes:
+        dataset = transactions[:size]
+        profile = DatasetProfile(dataset)
+
+        for engine in engines:
+            timed_out = False
+
+            for min_support in supports:
+                row = {
+                    'algorithm': engine,
+                    'num_transactions': len(dataset),
+                    'min_support': min_support,
+                    'status': 'skipped',
+                    'execution_time_ms': None,
+                    'peak_memory_mb': None,
+                    'num_candidates': None,
+                    'num_frequent_itemsets': None,
+                    'num_rules': None,
+                    'avg_basket_length': round(profile.avg_basket_length, 3),
+                    'frequent_items': profile.frequent_items(min_support),
+                    'frequent_pairs': profile.frequent_pairs(min_support),
+                    'itemset_estimate': profile.itemset_estimate(min_support)
+                }
+
+                if not timed_out:
+                    results = run_engines_isolated(
+                        [engine], dataset, min_support, min_confidence, timeout_s=timeout_s,
+                        collect_stats=True, return_results=False
+                    )[engine]
+                    status = results['status']
+                    row['status'] = status
+                    row['execution_time_ms'] = results['execution_time_ms']
+
+                    if status == 'ok':
+                        for key in ('peak_memory_mb', 'num_candidates', 'num_frequent_itemsets', 'num_rules'):
+                            row[key] = results[key]
+                    else:
+                        timed_out = True
+
+                if verbose:
+                    time_str = f"{row['execution_time_ms']:.2f}ms" if row['execution_time_ms'] is not None else "-"
+                    print(f"{engine:8s} N={row['num_transactions']:<8d} support={min_support:<6g} {row['status']:8s} {time_str}")
+
+                rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+# Charts for a sweep table: runtime vs support (one panel per N)
+# and runtime vs N (one panel per support), one line per algorithm
+def plot_sweep(sweep_df):
+    # Imported here: altair is slow to import and only the sweep draws charts
+    import altair as alt
+
+    df = sweep_df[sweep_df['status'] == 'ok']
+
+    runtime_vs_support = alt.Chart(df).mark_line(point=True).encode(
+        x=alt.X('min_support:Q', title='Minimum Support'),
+        y=alt.Y('execution_time_ms:Q', title='Runtime (ms)', scale=alt.Scale(type='log')),
+        color=alt.Color('algorithm:N', title='Algorithm'),
+        tooltip=['algorithm', 'num_transactions', 'min_support', 'execution_time_ms',
+                 'peak_memory_mb', 'num_candidates', 'num_frequent_itemsets']
+    ).properties(
+        width=250, height=200
+    ).facet(
+        column=alt.Column('num_transactions:O', title='Transactions')
+    ).properties(title='Runtime vs Minimum Support')
+
+    runtime_vs_size = alt.Chart(df).mark_line(point=True).encode(
+        x=alt.X('num_transactions:Q', title='Transactions'),
+        y=alt.Y('execution_time_ms:Q', title='Runtime (ms)', scale=alt.Scale(type='log')),
+        color=alt.Color('algorithm:N', title='Algorithm'),
+        tooltip=['algorithm', 'num_transactions', 'min_support', 'execution_time_ms',
+                 'peak_memory_mb', 'num_candidates', 'num_frequent_itemsets']
+    ).properties(
+        width=250, height=200
+    ).facet(
+        column=alt.Column('min_support:O', title='Minimum Support')
+    ).properties(title='Runtime vs Dataset Size')
+
+    return runtime_vs_support, runtime_vs_size
 
 
 def create_comparison_dataframe(apriori_results, eclat_results):
@@ -106,7 +572,7 @@ def create_comparison_dataframe(apriori_results, eclat_results):
         apriori_val = comparison_data['Apriori'][i]
         eclat_val = comparison_data['Eclat'][i]
 
-        if apriori_val == 0:
+        if apriori_val is None or eclat_val is None or apriori_val == 0:
             diff = "N/A"
         else:
             ratio = eclat_val / apriori_val
@@ -151,8 +617,57 @@ Rules Generated Match: {'Yes' if rules_match else 'No'} (Apriori: {apriori_resul
 
     return summary
 
+# Mine a transactions file without loading it, see out_of_core.apriori_out_of_core
+def out_of_core_main(args, transaction_path):
+    from .out_of_core import apriori_out_of_core
+
+    print(f"Mining {transaction_path} out of core (min_support={args.min_support}, "
+          f"memory budget {args.memory_budget_mb} MB)...")
+
+    start = time.perf_counter()
+    frequent_itemsets = apriori_out_of_core(transaction_path, args.min_support, memory_budget_mb=args.memory_budget_mb)
+    mining_time = (time.perf_counter() - start) * 1000
+    rules = generate_rules(frequent_itemsets, 0.5)
+
+    for k, level in enumerate(frequent_itemsets, 1):
+        print(f"  L{k}: {len(level)} frequent itemsets")
+    print(f"✓ Out-of-core Apriori completed in {mining_time:.2f}ms, {len(rules)} rules")
+
+def sweep_main(args, project_root):
+    sizes = [int(size) for size in args.sizes.split(',')]
+    supports = [float(support) for support in args.supports.split(',')]
+
+    generator_options = {
+        'avg_basket_length': args.basket_length,
+        'num_items': args.items,
+        'avg_pattern_length': args.pattern_length,
+        'seed': args.seed
+    }
+
+    sweep_df = run_sweep(
+        sizes,
+        supports,
+        min_confidence=0.5,
+        timeout_s=args.timeout,
+        generator_options=generator_options
+    )
+
+    output_dir = Path(args.output) if args.output else project_root / "data" / "sweep"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    sweep_df.to_csv(output_dir / "sweep_results.csv", index=False)
+    fit_cost_model(sweep_df).to_json(output_dir / "cost_model.json")
+
+    runtime_vs_support, runtime_vs_size = plot_sweep(sweep_df)
+    runtime_vs_support.save(str(output_dir / "runtime_vs_support.html"))
+    runtime_vs_size.save(str(output_dir / "runtime_vs_size.html"))
+
+    print("\n" + sweep_df.to_string(index=False))
+    print(f"\nSweep results, charts and the fitted cost model written to {output_dir}")
+
+
 def main():
-    from pathlib import Path
+    import argparse
     import sys
 
     project_root = Path(__file__).parent.parent.parent
@@ -160,18 +675,56 @@ def main():
 
     from src.preprocessing.preprocessing_utils import load_transactions
 
-    transaction_path = project_root / "data" / "cleaned_transactions.csv"
+    parser = argparse.ArgumentParser(description="Compare Apriori and Eclat")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Run every engine over a grid of synthetic dataset sizes and supports")
+    parser.add_argument("--sizes", default="1000,5000,10000,50000")
+    parser.add_argument("--supports", default="0.2,0.1,0.05,0.02,0.01")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-run timeout in seconds")
+    parser.add_argument("--basket-length", type=float, default=10)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--pattern-length", type=float, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Directory for sweep results")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Attribute memory to mining phases and data structures")
+    parser.add_argument("--min-support", type=float, default=0.2)
+    parser.add_argument("--top", type=int, default=10, help="Allocation sites per phase in the memory profile")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="Stream the transactions file from disk instead of loading it (Apriori only)")
+    parser.add_argument("--memory-budget-mb", type=int, default=512,
+                        help="Memory for pair counts and partitions in --out-of-core mode")
+    parser.add_argument("--transactions", default=None,
+                        help="Transactions to mine (.csv, .parquet, .arrow or .feather); "
+                             "defaults to data/cleaned_transactions.csv")
+    args = parser.parse_args()
+
+    if args.sweep:
+        sweep_main(args, project_root)
+        return
+
+    transaction_path = Path(args.transactions) if args.transactions else project_root / "data" / "cleaned_transactions.csv"
 
     if not transaction_path.exists():
         print(f"Error: {transaction_path} not found!")
         print("Please run preprocessing first to generate cleaned_transactions.csv")
         return
 
+    if args.out_of_core:
+        out_of_core_main(args, transaction_path)
+        return
+
     transactions = load_transactions(transaction_path)
 
+    if args.profile_memory:
+        for engine in ENGINES:
+            report = profile_memory(transactions, engine, args.min_support, 0.5, args.top)
+            print_memory_report(report)
+        return
+
     apriori_results, eclat_results, comparison_df = compare_algorithms(
         transactions,
-        min_support=0.2,
+        min_support=args.min_support,
         min_confidence=0.5
     )
 
@@ -0,0 +1,658 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+import pyarrow as pa
+
+from .pipeline import PRODUCTS_PATH, build_pipeline
+from .preprocessing.preprocessing_utils import (
+    PREPROCESS_CHUNK_SIZE, load_product_categories, load_product_prices, load_products_set, merge_stats,
+    preprocess_in_chunks, preprocess_transactions, save_transactions, stream_workers
+)
+from .preprocessing.fuzzy_matching import CatalogMatcher
+from .preprocessing.transaction_formats import iter_transaction_chunks, read_transaction_chunks
+from .algorithms.association_rules import RULE_PRUNING, generate_rules, prune_rules, save_rules
+from .algorithms.performance_comparison import (
+    STATUS_LABELS, create_comparison_dataframe, run_engines_isolated
+)
+
+# Headless entry point for batch and cron jobs: python -m src <command> ...
+#
+#   preprocess  clean a transactions file into another one
+#   mine        frequent itemsets of a transactions file
+#   rules       association rules of a transactions file
+#   benchmark   run several engines on one file and compare them
+#   export      convert a transactions file to another format
+#   serve       answer recommendation requests from a published rule set
+#
+# Inputs may be any format transaction_formats reads (wide or long CSV, FIMI
+# .dat, Parquet, Arrow/Feather). Results are written as they are produced, to
+# --output or stdout; progress and the summary go to stderr. Nothing here
+# imports Streamlit.
+
+# Exit codes
+EXIT_OK = 0
+# Unexpected failure, e.g. an engine raised
+EXIT_FAILURE = 1
+# Bad command line (argparse's own code)
+EXIT_USAGE = 2
+# Missing or unreadable input file or product catalog
+EXIT_INPUT = 3
+# An engine hit the time or memory limit; the levels it completed were written
+EXIT_STOPPED = 4
+# No transactions to work on (empty input, or nothing left after preprocessing)
+EXIT_NO_DATA = 5
+# --engine auto predicted the run to explode and --force was not given
+EXIT_REFUSED = 6
+
+# Engine names on the command line
+ENGINE_CHOICES = {'apriori': 'Apriori', 'eclat': 'Eclat'}
+OUT_OF_CORE = 'out-of-core'
+MULTILEVEL = 'multilevel'
+HIGH_UTILITY = 'high-utility'
+AUTO = 'auto'
+
+# Seconds between two progress lines of one engine
+PROGRESS_INTERVAL_S = 1.0
+
+# What the transaction readers raise on a malformed input file, e.g. an
+# ArrowKeyError for a CSV without a transaction_id column
+READ_ERRORS = (ValueError, OSError, pa.ArrowException)
+
+
+class InputError(Exception):
+    pass
+
+
+class RunRefused(Exception):
+    pass
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+# Text stream for --output: stdout for "-" or no path
+def _open_output(path):
+    if path in (None, '-'):
+        return sys.stdout
+    return open(path, 'w', newline='')
+
+# Writes rows as CSV or JSON Lines, flushing every flush_rows rows so a
+# downstream reader (or a tail -f) sees results while the run goes on
+class RowWriter:
+
+    def __init__(self, stream, columns, fmt='csv', flush_rows=1000):
+        self.stream = stream
+        self.columns = columns
+        self.fmt = fmt
+        self.flush_rows = flush_rows
+        self.rows = 0
+
+        if fmt == 'csv':
+            self._csv = csv.writer(stream)
+            self._csv.writerow(columns)
+
+    def write(self, values):
+        if self.fmt == 'csv':
+            self._csv.writerow(values)
+        else:
+            self.stream.write(json.dumps(dict(zip(self.columns, values))) + "\n")
+
+        self.rows += 1
+        if self.rows % self.flush_rows == 0:
+            self.stream.flush()
+
+    def close(self):
+        self.stream.flush()
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+def _check_input(path):
+    if not Path(path).exists():
+        raise InputError(f"{path} not found")
+
+def _load_products(path):
+    if not Path(path).exists():
+        raise InputError(f"Product catalog {path} not found")
+    return load_products_set(path)
+
+def _read_store(args):
+    _check_input(args.input)
+
+    try:
+        store = read_transaction_chunks(args.input, partitions=args.partitions)
+    except READ_ERRORS as e:
+        raise InputError(str(e)) from e
+    log(f"Loaded {len(store):,} transactions from {args.input}")
+
+    return store
+
+# Chunks of the input file, read lazily; a malformed file raises InputError
+# when the chunk that shows it is reached
+def _input_chunks(args):
+    try:
+        yield from iter_transaction_chunks(args.input, chunk_rows=args.chunk_rows, partitions=args.partitions)
+    except READ_ERRORS as e:
+        raise InputError(str(e)) from e
+
+# Whole input as a TransactionStore; with --preprocess, cleaned and encoded by
+# the pipeline's preprocess and encode stages
+def _load_store(args):
+    store = _read_store(args)
+
+    if getattr(args, 'preprocess', False):
+        _load_products(args.products)
+        pipeline = build_pipeline(store, args.products)
+        pipeline.configure('preprocess', repair=args.repair)
+        store = pipeline.get('encode')
+        log(f"{len(store):,} transactions left after preprocessing")
+
+    return store
+
+
+def _item_text(itemset):
+    return " ".join(sorted(itemset))
+
+# Progress callback logging each engine's state at most every PROGRESS_INTERVAL_S
+# seconds (and when Eclat finishes its last equivalence class)
+def _progress_logger():
+    logged_at = {}
+
+    def on_progress(event):
+        if event['phase'] == 'rules':
+            return
+
+        now = time.monotonic()
+        last_class = event['classes_total'] and event['classes_done'] == event['classes_total']
+        if not last_class and now - logged_at.get(event['engine'], -PROGRESS_INTERVAL_S) < PROGRESS_INTERVAL_S:
+            return
+        logged_at[event['engine']] = now
+
+        if event['classes_total']:
+            step = f"{event['classes_done']} of {event['classes_total']} equivalence classes"
+        else:
+            step = f"level {event['level']}"
+        log(f"  {event['engine']}: {step}, {event['num_itemsets']:,} frequent itemsets so far")
+
+    return on_progress
+
+def _run_out_of_core(args, min_confidence=None):
+    from .algorithms.out_of_core import apriori_out_of_core
+
+    _check_input(args.input)
+    try:
+        levels = apriori_out_of_core(
+            args.input,
+            args.min_support,
+            memory_budget_mb=args.memory_budget_mb,
+            progress=lambda event: log(f"  Apriori: level {event['level']}, "
+                                       f"{len(event['itemsets']):,} frequent itemsets"),
+            partitions=args.partitions
+        )
+    except READ_ERRORS as e:
+        raise InputError(str(e)) from e
+    rules = generate_rules(levels, min_confidence) if min_confidence is not None else None
+
+    return levels, rules, 'ok'
+
+# Engine choice of --engine auto for store (see engine_selection.select_engine),
+# logged; raises RunRefused for a run predicted to explode unless --force
+def _select_engine(args, store):
+    from .algorithms.engine_selection import CostModel, select_engine
+
+    try:
+        model = CostModel.from_json(args.cost_model) if args.cost_model else None
+    except (OSError, ValueError) as e:
+        raise InputError(f"Cost model {args.cost_model}: {e}") from e
+
+    choice = select_engine(store, args.min_support, model, memory_limit_mb=args.memory_limit_mb,
+                           out_of_core=not args.preprocess)
+    prediction = choice['prediction']
+    profile = choice['profile']
+    log(f"  {profile['num_items']:,} items, {profile['avg_basket_length']} per basket, density {profile['density']}; "
+        f"predicted {prediction['itemsets']:,.0f} frequent itemsets, "
+        + ", ".join(f"{engine} {ms / 1000:,.1f}s" for engine, ms in prediction['runtime_ms'].items()))
+    log(f"  auto: {choice['engine']} ({choice['representation']})")
+
+    for reason in choice['reasons']:
+        log(f"  Warning: {reason}")
+    if choice['verdict'] == 'refuse' and not args.force:
+        raise RunRefused(f"Run predicted to explode at support {args.min_support:g}; "
+                         f"raise --min-support or pass --force")
+
+    return choice
+
+# (frequent itemset levels, rules or None, status) for the chosen engine. The
+# out-of-core engine streams the input file itself; the others run in a
+# worker process under the time and memory limits. auto picks one of them
+# from the loaded transactions.
+def _run_engine(args, min_confidence=None):
+    if args.engine == OUT_OF_CORE:
+        return _run_out_of_core(args, min_confidence)
+
+    store = _load_store(args)
+    if len(store) == 0:
+        return None, None, 'empty'
+
+    # The pick replaces auto, so status messages and published metadata name it
+    if args.engine == AUTO:
+        choice = _select_engine(args, store)
+        if choice['representation'] == 'out-of-core':
+            args.engine = OUT_OF_CORE
+            return _run_out_of_core(args, min_confidence)
+        args.engine = choice['engine'].lower()
+
+    if args.engine == MULTILEVEL:
+        mined, status = _run_multilevel(args, store)
+        levels = mined['items']
+        rules = generate_rules(levels, min_confidence) if min_confidence is not None else None
+        return levels, rules, status
+
+    engine = ENGINE_CHOICES[args.engine]
+    results = run_engines_isolated(
+        [engine],
+        store,
+        args.min_support,
+        min_confidence if min_confidence is not None else 1.0,
+        timeout_s=args.timeout,
+        memory_limit_mb=args.memory_limit_mb,
+        progress=_progress_logger()
+    )[engine]
+
+    if results['status'] == 'error':
+        raise RuntimeError(f"{engine} failed: {results['error']}")
+
+    return results['frequent_itemsets'], results['rules'], results['status']
+
+# Category- and item-level itemsets of store (see multilevel.mine_multilevel),
+# in this process under --timeout
+def _run_multilevel(args, store):
+    from .algorithms.multilevel import mine_multilevel
+    from .algorithms.cancellation import CancellationToken
+
+    cancel = CancellationToken.with_budget(args.timeout)
+    mined = mine_multilevel(store, load_product_categories(args.products), args.min_support,
+                            category_min_support=args.category_support, cancel=cancel)
+
+    log(f"  {sum(len(level) for level in mined['categories']):,} frequent category itemsets, "
+        f"{mined['items_dropped']:,} frequent items dropped under infrequent categories, "
+        f"{mined['pruned_by_category']:,} item extensions pruned by category")
+
+    return mined, cancel.stop_reason or 'ok'
+
+# Baskets with quantities for --engine high-utility: the input, where an item
+# repeated in a basket is bought that many times, or with --preprocess the
+# cleaned baskets with the quantities preprocessing kept
+def _load_baskets(args):
+    store = _read_store(args)
+    if not args.preprocess:
+        return store
+
+    products = _load_products(args.products)
+    matcher = CatalogMatcher(products) if args.repair else None
+    cleaned, _ = preprocess_transactions(store, products, matcher=matcher, keep_quantities=True)
+    log(f"{len(cleaned):,} transactions left after preprocessing")
+
+    return cleaned
+
+# High-utility itemsets of the input (see high_utility.mine_high_utility),
+# priced from --products, in this process under --timeout
+def _run_high_utility(args):
+    from .algorithms.high_utility import mine_high_utility
+    from .algorithms.cancellation import CancellationToken
+
+    _check_input(args.products)
+    try:
+        prices = load_product_prices(args.products)
+    except ValueError as e:
+        raise InputError(str(e)) from e
+
+    baskets = _load_baskets(args)
+    if len(baskets) == 0:
+        return None, 'empty'
+
+    cancel = CancellationToken.with_budget(args.timeout)
+    mined = mine_high_utility(baskets, prices, args.min_utility, cancel=cancel)
+
+    log(f"  total revenue {mined['total_utility']:,.2f}; {mined['unpriced_items']:,} items without a price left out, "
+        f"{mined['pruned_by_twu']:,} items pruned by TWU, {mined['joins']:,} utility list joins")
+
+    return mined, cancel.stop_reason or 'ok'
+
+def _exit_status(status, engine):
+    if status == 'empty':
+        log("No transactions to mine")
+        return EXIT_NO_DATA
+    if status != 'ok':
+        log(f"{engine} {STATUS_LABELS[status]}; wrote the levels it completed")
+        return EXIT_STOPPED
+    return EXIT_OK
+
+
+def cmd_preprocess(args):
+    _check_input(args.input)
+    products = _load_products(args.products)
+    matcher = CatalogMatcher(products) if args.repair else None
+
+    chunks = _input_chunks(args)
+    if args.workers is None:
+        workers, chunks = stream_workers(chunks)
+    else:
+        workers = args.workers
+
+    partial_stats = []
+
+    def cleaned_chunks():
+        for cleaned, partial in preprocess_in_chunks(chunks, products, workers=workers, matcher=matcher,
+                                                     chunked=True):
+            partial_stats.append(partial)
+            log(f"  cleaned {sum(stats['first_total'] for stats in partial_stats):,} transactions")
+            yield cleaned
+
+    save_transactions(cleaned_chunks(), args.output, chunked=True)
+    stats = merge_stats(partial_stats)
+
+    log(json.dumps(stats))
+    if stats['valid_transactions'] == 0:
+        return EXIT_NO_DATA
+    return EXIT_OK
+
+def cmd_mine(args):
+    start = time.perf_counter()
+
+    if args.engine == MULTILEVEL:
+        # Both levels, told apart by a 'level' column
+        _load_products(args.products)
+        store = _load_store(args)
+        if len(store) == 0:
+            return _exit_status('empty', args.engine)
+        mined, status = _run_multilevel(args, store)
+
+        writer = RowWriter(_open_output(args.output), ['level', 'itemset', 'size', 'support'], args.format)
+        for level_name, key in (('category', 'categories'), ('item', 'items')):
+            for level in mined[key]:
+                for itemset, support in level.items():
+                    writer.write([level_name, _item_text(itemset), len(itemset), support])
+        writer.close()
+
+        log(f"{writer.rows:,} frequent itemsets in {time.perf_counter() - start:.2f}s")
+        return _exit_status(status, args.engine)
+
+    if args.engine == HIGH_UTILITY:
+        mined, status = _run_high_utility(args)
+        if mined is None:
+            return _exit_status(status, args.engine)
+
+        writer = RowWriter(_open_output(args.output), ['itemset', 'size', 'utility'], args.format)
+        for level in mined['itemsets']:
+            for itemset, utility in level.items():
+                writer.write([_item_text(itemset), len(itemset), round(utility, 2)])
+        writer.close()
+
+        log(f"{writer.rows:,} high-utility itemsets in {time.perf_counter() - start:.2f}s")
+        return _exit_status(status, args.engine)
+
+    levels, _, status = _run_engine(args)
+    if levels is None:
+        return _exit_status(status, args.engine)
+
+    writer = RowWriter(_open_output(args.output), ['itemset', 'size', 'support'], args.format)
+    for level in levels:
+        for itemset, support in level.items():
+            writer.write([_item_text(itemset), len(itemset), support])
+    writer.close()
+
+    log(f"{writer.rows:,} frequent itemsets in {time.perf_counter() - start:.2f}s")
+    return _exit_status(status, args.engine)
+
+def cmd_rules(args):
+    start = time.perf_counter()
+    _, rules, status = _run_engine(args, args.min_confidence)
+    if rules is None:
+        return _exit_status(status, args.engine)
+
+    if args.prune != 'none':
+        generated = len(rules)
+        rules = prune_rules(rules, args.prune)
+        log(f"Kept {len(rules):,} of {generated:,} rules ({args.prune})")
+
+    writer = RowWriter(_open_output(args.output),
+                       ['antecedent', 'consequent', 'support', 'confidence', 'lift'], args.format)
+    for rule in rules:
+        writer.write([_item_text(rule['antecedent']), _item_text(rule['consequent']),
+                      rule['support'], rule['confidence'], rule['lift']])
+    writer.close()
+
+    log(f"{writer.rows:,} rules in {time.perf_counter() - start:.2f}s")
+
+    if args.publish:
+        save_rules(rules, args.publish, metadata={
+            'source': str(args.input),
+            'engine': args.engine,
+            'min_support': args.min_support,
+            'min_confidence': args.min_confidence,
+            'pruning': args.prune,
+            'status': status,
+            'created_at': time.time()
+        })
+        log(f"Published the rules to {args.publish}")
+
+    return _exit_status(status, args.engine)
+
+def cmd_benchmark(args):
+    store = _load_store(args)
+    if len(store) == 0:
+        return _exit_status('empty', None)
+
+    engines = [ENGINE_CHOICES[engine] for engine in args.engines]
+    results = run_engines_isolated(
+        engines,
+        store,
+        args.min_support,
+        args.min_confidence,
+        timeout_s=args.timeout,
+        memory_limit_mb=args.memory_limit_mb,
+        collect_stats=True,
+        progress=_progress_logger()
+    )
+
+    writer = RowWriter(_open_output(args.output),
+                       ['engine', 'status', 'execution_time_ms', 'peak_memory_mb', 'num_candidates',
+                        'num_frequent_itemsets', 'num_rules'], args.format)
+    for engine in engines:
+        res = results[engine]
+        writer.write([engine, res['status'], res['execution_time_ms'], res['peak_memory_mb'],
+                      res.get('num_candidates'), res['num_frequent_itemsets'], res['num_rules']])
+    writer.close()
+
+    if set(engines) == {'Apriori', 'Eclat'}:
+        log(create_comparison_dataframe(results['Apriori'], results['Eclat']).to_string(index=False))
+
+    code = EXIT_OK
+    for engine in engines:
+        if results[engine]['status'] == 'error':
+            log(f"{engine} failed: {results[engine]['error']}")
+            code = EXIT_FAILURE
+        elif code == EXIT_OK:
+            code = _exit_status(results[engine]['status'], engine)
+
+    return code
+
+def cmd_export(args):
+    _check_input(args.input)
+
+    chunks = _input_chunks(args)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for chunk in chunks:
+            count += len(chunk)
+            yield chunk
+
+    save_transactions(counted(), args.output, chunked=True)
+    log(f"Wrote {count:,} transactions to {args.output}")
+
+    return EXIT_OK if count else EXIT_NO_DATA
+
+
+def cmd_serve(args):
+    from .recommendation_service import serve
+
+    _check_input(args.rules)
+
+    def ready(server):
+        host, port = server.server_address[:2]
+        log(f"Serving recommendations from {args.rules} on http://{host}:{port}")
+
+    try:
+        serve(args.rules, args.host, args.port, args.poll_interval, ready=ready)
+    except ValueError as e:
+        raise InputError(str(e)) from e
+    except KeyboardInterrupt:
+        log("Stopped")
+
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src", description="Batch preprocessing and mining of transaction files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_input(command):
+        command.add_argument("input", help="Transactions: wide (transaction_id,items) or long (transaction_id,item) "
+                                           "CSV, FIMI .dat, .parquet, .arrow or .feather")
+        command.add_argument("--partitions", type=int, default=None,
+                             help="Group a long-format CSV whose rows are not ordered by transaction "
+                                  "through this many temporary partitions")
+
+    def add_output(command):
+        command.add_argument("-o", "--output", default=None, help="Where to write the results (default: stdout)")
+        command.add_argument("--format", choices=['csv', 'jsonl'], default='csv')
+
+    def add_preprocessing(command, flag):
+        if flag:
+            command.add_argument("--preprocess", action="store_true",
+                                 help="Clean the transactions against the product catalog before mining")
+        command.add_argument("--products", default=PRODUCTS_PATH, help="Product catalog CSV")
+        command.add_argument("--repair", action="store_true",
+                             help="Repair misspelled items instead of removing them")
+
+    def add_limits(command):
+        command.add_argument("--min-support", type=float, default=0.2)
+        command.add_argument("--timeout", type=float, default=None, help="Time limit per engine in seconds")
+        command.add_argument("--memory-limit-mb", type=int, default=None, help="Memory ceiling per engine")
+
+    def add_engine(command, high_utility=False):
+        extra = [HIGH_UTILITY] if high_utility else []
+        command.add_argument("--engine", choices=[*ENGINE_CHOICES, OUT_OF_CORE, MULTILEVEL, AUTO, *extra],
+                             default='eclat',
+                             help=f"{OUT_OF_CORE} streams the file from disk instead of loading it; "
+                                  f"{MULTILEVEL} also mines the categories of --products and prunes the "
+                                  f"item search with them; {AUTO} runs the engine a cost model predicts "
+                                  f"to be fastest")
+        command.add_argument("--cost-model", default=None,
+                             help=f"cost_model.json written by performance_comparison --sweep, for --engine {AUTO}")
+        command.add_argument("--force", action="store_true",
+                             help=f"Start runs --engine {AUTO} predicts to explode")
+        command.add_argument("--category-support", type=float, default=None,
+                             help=f"Minimum support of category itemsets with --engine {MULTILEVEL} "
+                                  f"(default: --min-support, which finds every frequent itemset)")
+        if high_utility:
+            command.add_argument("--min-utility", type=float, default=None,
+                                 help=f"Minimum revenue (quantity x price from --products) of an itemset with "
+                                      f"--engine {HIGH_UTILITY}")
+        command.add_argument("--memory-budget-mb", type=int, default=512,
+                             help=f"Memory for pair counts and partitions with --engine {OUT_OF_CORE}")
+
+    command = commands.add_parser("preprocess", help="Clean a transactions file")
+    add_input(command)
+    command.add_argument("-o", "--output", required=True, help="Cleaned transactions; the suffix picks the format")
+    add_preprocessing(command, flag=False)
+    command.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU for large inputs)")
+    command.add_argument("--chunk-rows", type=int, default=PREPROCESS_CHUNK_SIZE)
+    command.set_defaults(handler=cmd_preprocess)
+
+    command = commands.add_parser("mine", help="Write the frequent itemsets of a transactions file")
+    add_input(command)
+    add_output(command)
+    add_engine(command, high_utility=True)
+    add_limits(command)
+    add_preprocessing(command, flag=True)
+    command.set_defaults(handler=cmd_mine)
+
+    command = commands.add_parser("rules", help="Write the association rules of a transactions file")
+    add_input(command)
+    add_output(command)
+    add_engine(command)
+    add_limits(command)
+    command.add_argument("--min-confidence", type=float, default=0.5)
+    command.add_argument("--prune", choices=RULE_PRUNING, default='none',
+                         help="Drop rules a more general rule with the same consequent is at least as confident "
+                              "as (redundant), and also rules with a lift of 1 or less (productive)")
+    command.add_argument("--publish", default=None,
+                         help="Also save the rules as JSON for the recommendation service (replaced atomically)")
+    add_preprocessing(command, flag=True)
+    command.set_defaults(handler=cmd_rules)
+
+    command = commands.add_parser("benchmark", help="Run engines side by side and write their metrics")
+    add_input(command)
+    add_output(command)
+    command.add_argument("--engines", type=lambda value: value.split(','), default=list(ENGINE_CHOICES),
+                         help="Comma-separated engines (default: apriori,eclat)")
+    add_limits(command)
+    command.add_argument("--min-confidence", type=float, default=0.5)
+    add_preprocessing(command, flag=True)
+    command.set_defaults(handler=cmd_benchmark)
+
+    command = commands.add_parser("export", help="Convert a transactions file to CSV, Parquet or Arrow")
+    add_input(command)
+    command.add_argument("-o", "--output", required=True, help="Output file; the suffix picks the format")
+    command.add_argument("--chunk-rows", type=int, default=PREPROCESS_CHUNK_SIZE)
+    command.set_defaults(handler=cmd_export)
+
+    command = commands.add_parser("serve", help="Serve recommendations over HTTP from a published rule set")
+    command.add_argument("rules", help="Rules JSON written by rules --publish")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8765)
+    command.add_argument("--poll-interval", type=float, default=2.0,
+                         help="Seconds between checks for a newly published rule set")
+    command.set_defaults(handler=cmd_serve)
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        unknown = [engine for engine in args.engines if engine not in ENGINE_CHOICES]
+        if unknown:
+            parser.error(f"unknown engine(s): {', '.join(unknown)} (choose from {', '.join(ENGINE_CHOICES)})")
+    if getattr(args, 'preprocess', False) and getattr(args, 'engine', None) == OUT_OF_CORE:
+        parser.error(f"--preprocess cannot be combined with --engine {OUT_OF_CORE}; preprocess the file first")
+    if getattr(args, 'engine', None) == HIGH_UTILITY and args.min_utility is None:
+        parser.error(f"--engine {HIGH_UTILITY} needs --min-utility")
+
+    try:
+        return args.handler(args)
+    except InputError as e:
+        log(f"Error: {e}")
+        return EXIT_INPUT
+    except RunRefused as e:
+        log(f"Refused: {e}")
+        return EXIT_REFUSED
+    except KeyboardInterrupt:
+        log("Interrupted")
+        return EXIT_FAILURE
+    except BrokenPipeError:
+        # Output piped into e.g. head, which stopped reading
+        sys.stderr.close()
+        return EXIT_OK
+    except Exception as e:
+        log(f"Error: {type(e).__name__}: {e}")
+        return EXIT_FAILURE
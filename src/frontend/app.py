@@ -6,7 +6,9 @@ import sys
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 from preprocessing.preprocessing_utils import preprocess_transactions, load_products_set
+from preprocessing.transaction_store import TransactionStore
 from algorithms.performance_comparison import compare_algorithms
+from pipeline import build_pipeline
 
 # Import page modules
 from components import (
@@ -285,20 +287,25 @@ st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 # Session state initialization
 if 'current_cart' not in st.session_state:
     st.session_state.current_cart = []
-if 'transactions' not in st.session_state:
-    st.session_state.transactions = []
-if 'imported_transactions' not in st.session_state:
-    st.session_state.imported_transactions = []
+# Manual and imported transactions, kept in one columnar store tagged by source
+if 'store' not in st.session_state:
+    st.session_state.store = TransactionStore()
 if 'transaction_counter' not in st.session_state:
     st.session_state.transaction_counter = 1
 if 'preprocessing_stats' not in st.session_state:
     st.session_state.preprocessing_stats = None
 if 'cleaned_transactions' not in st.session_state:
     st.session_state.cleaned_transactions = []
-if 'mining_results' not in st.session_state:
-    st.session_state.mining_results = None
-if 'comparison_df' not in st.session_state:
-    st.session_state.comparison_df = None
+# import -> preprocess -> encode -> mine -> rules, memoized per session
+if 'pipeline' not in st.session_state:
+    st.session_state.pipeline = build_pipeline(st.session_state.store, matcher=preprocessing.catalog_matcher)
+if 'mining_job' not in st.session_state:
+    st.session_state.mining_job = None
+if 'mining_error' not in st.session_state:
+    st.session_state.mining_error = None
+
+# Pick up a background mining job that finished since the last rerun
+mining.collect_mining_job()
 
 # Sidebar Navigation
 st.sidebar.title("Navigation")
@@ -325,10 +332,13 @@ page = st.sidebar.radio(
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("### Quick Stats")
-st.sidebar.metric("Manual Transactions", len(st.session_state.transactions))
-st.sidebar.metric("Imported Transactions", len(st.session_state.imported_transactions))
+st.sidebar.metric("Manual Transactions", st.session_state.store.count('manual'))
+st.sidebar.metric("Imported Transactions", st.session_state.store.count('imported'))
 st.sidebar.metric("Items in Cart", len(st.session_state.current_cart))
 
+with st.sidebar:
+    mining.render_job_status()
+
 # Route to appropriate page
 if page == "Home":
     home.render_page()
@@ -1,6 +1,53 @@
 import streamlit as st
 import pandas as pd
 from pathlib import Path
+from preprocessing.preprocessing_utils import read_transactions_csv, CSV_CHUNK_ROWS
+from preprocessing.transaction_formats import (
+    BINARY_SUFFIXES, is_binary_path, read_transactions_table, table_to_dataframe
+)
+
+# Uploads larger than this are read in chunks behind a progress bar
+CHUNKED_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Parsed sample dataset, re-read only when the file changes on disk
+@st.cache_data(show_spinner=False)
+def load_sample_dataframe(path, modified_time):
+    return read_transactions_csv(path)
+
+# Parse an uploaded CSV once per file; reruns reuse the DataFrame kept in the session
+def load_uploaded_dataframe(uploaded_file):
+    cached = st.session_state.get('uploaded_dataframe')
+    if cached is not None and cached[0] == uploaded_file.file_id:
+        return cached[1]
+
+    if is_binary_path(uploaded_file.name):
+        # Parquet / Arrow uploads are already split into items, nothing to parse
+        df = table_to_dataframe(read_transactions_table(uploaded_file, Path(uploaded_file.name).suffix))
+    elif uploaded_file.size > CHUNKED_UPLOAD_BYTES:
+        progress_bar = st.progress(0.0, text="Reading file...")
+
+        def on_chunk(rows_read):
+            fraction = min(1.0, uploaded_file.tell() / uploaded_file.size)
+            progress_bar.progress(fraction, text=f"Read {rows_read:,} transactions ({fraction:.0%})")
+
+        df = read_transactions_csv(uploaded_file, chunksize=CSV_CHUNK_ROWS, progress=on_chunk)
+        progress_bar.empty()
+    else:
+        df = read_transactions_csv(uploaded_file)
+
+    st.session_state.uploaded_dataframe = (uploaded_file.file_id, df)
+
+    return df
+
+# Append every transaction of df to the imported transactions in one go
+def import_dataframe(df):
+    st.session_state.store.extend_from_dataframe(df, 'imported')
+
+    return len(df)
+
+# Show parsed item lists the way they appear in the CSV
+def preview(df):
+    return df.head().assign(items=lambda d: d['items'].map(','.join))
 
 def render_page(): 
     st.title("📁 Data Import")
@@ -11,42 +58,32 @@ def render_page():
 
     with col1:
         st.markdown("### 📂 Upload CSV File")
-        st.markdown("Upload your own transaction CSV file with the format: `transaction_id,items`")
+        st.markdown("Upload your own transaction CSV file with the format: `transaction_id,items`, "
+                    "or a Parquet / Arrow file with `transaction_id` and `items` (list of strings) columns")
 
-        uploaded_file = st.file_uploader("Choose a CSV file", type=['csv'], key="csv_uploader")
+        uploaded_file = st.file_uploader(
+            "Choose a CSV file",
+            type=['csv'] + [suffix.lstrip('.') for suffix in BINARY_SUFFIXES],
+            key="csv_uploader"
+        )
 
         if uploaded_file is not None:
             try:
                 # Read the uploaded file
-                df = pd.read_csv(uploaded_file)
-
-                # Validate format
-                if 'transaction_id' not in df.columns or 'items' not in df.columns:
-                    st.error("Invalid CSV format! File must contain 'transaction_id' and 'items' columns.")
-                else:
-                    st.success(f"File loaded successfully! Found {len(df)} transactions.")
-
-                    # Preview
-                    st.markdown("#### Preview (first 5 rows)")
-                    st.dataframe(df.head(), use_container_width=True)
-
-                    # Import button
-                    if st.button("Import Transactions", key="import_uploaded", type="primary"):
-                        imported_count = 0
-                        for _, row in df.iterrows():
-                            # Parse items (comma-separated string)
-                            items_str = str(row['items'])
-                            items_list = [item.strip() for item in items_str.split(',')]
-
-                            transaction = {
-                                'transaction_id': row['transaction_id'],
-                                'items': items_list
-                            }
-                            st.session_state.imported_transactions.append(transaction)
-                            imported_count += 1
-
-                        st.success(f"Successfully imported {imported_count} transactions!")
-                        st.rerun()
+                df = load_uploaded_dataframe(uploaded_file)
+
+                st.success(f"File loaded successfully! Found {len(df)} transactions.")
+
+                # Preview
+                st.markdown("#### Preview (first 5 rows)")
+                st.dataframe(preview(df), use_container_width=True)
+
+                # Import button
+                if st.button("Import Transactions", key="import_uploaded", type="primary"):
+                    imported_count = import_dataframe(df)
+
+                    st.success(f"Successfully imported {imported_count} transactions!")
+                    st.rerun()
 
             except Exception as e:
                 st.error(f"Error reading file: {str(e)}")
@@ -61,28 +98,17 @@ def render_page():
         if sample_file_path.exists():
             try:
                 # Read sample file
-                df_sample = pd.read_csv(sample_file_path)
+                df_sample = load_sample_dataframe(str(sample_file_path), sample_file_path.stat().st_mtime)
 
                 st.info(f"Sample dataset contains {len(df_sample)} transactions")
 
                 # Preview
                 st.markdown("#### Preview (first 5 rows)")
-                st.dataframe(df_sample.head(), use_container_width=True)
+                st.dataframe(preview(df_sample), use_container_width=True)
 
                 # Load button
                 if st.button("Load Sample Data", key="load_sample", type="primary"):
-                    imported_count = 0
-                    for _, row in df_sample.iterrows():
-                        # Parse items (comma-separated string)
-                        items_str = str(row['items'])
-                        items_list = [item.strip() for item in items_str.split(',')]
-
-                        transaction = {
-                            'transaction_id': row['transaction_id'],
-                            'items': items_list
-                        }
-                        st.session_state.imported_transactions.append(transaction)
-                        imported_count += 1
+                    imported_count = import_dataframe(df_sample)
 
                     st.success(f"Successfully loaded {imported_count} sample transactions!")
                     st.rerun()
@@ -99,19 +125,19 @@ def render_page():
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        st.metric("Imported Transactions", len(st.session_state.imported_transactions))
+        st.metric("Imported Transactions", st.session_state.store.count('imported'))
 
     with col2:
-        st.metric("Manual Transactions", len(st.session_state.transactions))
+        st.metric("Manual Transactions", st.session_state.store.count('manual'))
 
     with col3:
-        total = len(st.session_state.imported_transactions) + len(st.session_state.transactions)
+        total = len(st.session_state.store)
         st.metric("Total Transactions", total)
 
     # Clear imported data option
-    if len(st.session_state.imported_transactions) > 0:
+    if st.session_state.store.count('imported') > 0:
         st.markdown("---")
         if st.button("Clear All Imported Data", type="secondary"):
-            st.session_state.imported_transactions = []
+            st.session_state.store.clear('imported')
             st.success("All imported transactions have been cleared.")
-            st.rerun()
\ No newline at end of file
+            st.rerun()
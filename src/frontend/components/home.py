@@ -152,7 +152,7 @@ def render_page():
 
     col1, col2, col3 = st.columns(3)
 
-    total_transactions = len(st.session_state.transactions) + len(st.session_state.imported_transactions)
+    total_transactions = len(st.session_state.store)
 
     with col1:
         st.markdown(f"""
@@ -172,13 +172,11 @@ def render_page():
 
     with col3:
         # Calculate unique items
-        all_items = set()
-        for txn in st.session_state.transactions + st.session_state.imported_transactions:
-            all_items.update(txn.get('items', []))
+        unique_items = st.session_state.store.aggregates.distinct_items
 
         st.markdown(f"""
         <div class="stats-box">
-            <h2 style="color: #2E7D32; margin: 0;">{len(all_items)}</h2>
+            <h2 style="color: #2E7D32; margin: 0;">{unique_items}</h2>
             <p style="margin: 0.5rem 0 0 0;">Unique Products</p>
         </div>
         """, unsafe_allow_html=True)
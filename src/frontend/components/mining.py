@@ -1,13 +1,140 @@
 import streamlit as st
 import pandas as pd
-from algorithms.performance_comparison import compare_algorithms
+import traceback
+from algorithms.performance_comparison import STATUS_LABELS
+from algorithms.association_rules import RULE_PRUNING
+from algorithms.engine_selection import select_engine
+from algorithms.mining_jobs import MiningScheduler, SchedulerBusy, submit_mining_job
+from pipeline import mined_result
+
+# One scheduler for the whole server, shared by every session: identical runs
+# on the same dataset are computed once and the worker pool is bounded
+@st.cache_resource
+def get_scheduler():
+    return MiningScheduler()
+
+
+# One line of live status for an engine's latest progress event
+def _describe_progress(engine, event):
+    if event is None:
+        return f"**{engine}:** starting..."
+
+    if event['phase'] == 'rules':
+        return (f"**{engine}:** generating rules (level {event['level']} of {event['levels_total']}), "
+                f"{event['num_rules']:,} rules so far")
+
+    if event['classes_total']:
+        step = f"{event['classes_done']} of {event['classes_total']} equivalence classes done"
+    else:
+        step = f"level {event['level']} done"
+
+    return f"**{engine}:** {step}, {event['num_itemsets']:,} frequent itemsets so far"
+
+
+# Move the results of a finished background job into the session. Called on
+# every rerun of the app, so results land even when the user is on another page.
+def collect_mining_job():
+    job = st.session_state.mining_job
+    if job is None or job.active:
+        return
+
+    st.session_state.mining_job = None
+
+    # Cancelled before every engine ran: nothing complete enough to show
+    if job.error() is None and not job.has_results:
+        return
+
+    error = job.error()
+    if error is not None:
+        st.session_state.mining_error = "".join(
+            traceback.format_exception(type(error), error, error.__traceback__))
+        return
+
+    apriori_results, eclat_results, comparison_df = job.result()
+
+    # Cached as the pipeline's mine stage, for the inputs the job was started
+    # with; results of engines stopped early are shown but mined again next time
+    complete = all(res.get('status', 'ok') == 'ok' for res in (apriori_results, eclat_results))
+    st.session_state.pipeline.put('mine', job.stage_key, mined_result(
+        apriori_results, eclat_results, job.params['min_support'], job.params['min_confidence']), complete)
+    st.session_state.mining_error = None
+
+
+# Sidebar status of the background job, refreshed while it runs on any page
+@st.fragment(run_every=2.0)
+def render_job_status():
+    job = st.session_state.mining_job
+    if job is None:
+        return
+
+    if job.active:
+        st.info(f"⏳ Mining {job.status} ({job.elapsed:.0f}s)")
+    else:
+        st.success("✅ Mining finished, results are on the Association Rules Mining page")
+
+
+# Polls the job once a second. Only this fragment reruns while mining, the
+# rest of the page (and every other page) stays usable.
+@st.fragment(run_every=1.0)
+def _render_mining_progress():
+    job = st.session_state.mining_job
+    if job is None:
+        return
+
+    if not job.active:
+        # Full rerun so the results section picks up the finished job
+        st.rerun(scope="app")
+
+    st.markdown("---")
+    st.markdown("### ⏳ Mining in Progress")
+
+    if job.status == 'queued':
+        st.info("Waiting for a free mining worker...")
+    else:
+        budget = job.params['timeout_s']
+        st.progress(
+            min(1.0, job.elapsed / budget),
+            text=f"Elapsed {job.elapsed:.1f}s of the {budget}s time limit"
+        )
+        for engine in ('Apriori', 'Eclat'):
+            st.markdown(_describe_progress(engine, job.progress.get(engine)))
+
+    st.caption(f"Mining {job.params['num_transactions']:,} transactions at "
+               f"support {job.params['min_support']:.2f}, confidence {job.params['min_confidence']:.2f}. "
+               "You can keep using the other pages meanwhile.")
+
+    assessment = job.assessment
+    if assessment is not None:
+        prediction = assessment['prediction']
+        if assessment['verdict'] != 'ok':
+            st.warning(f"This run may explode: {'; '.join(assessment['reasons'])}.")
+        st.caption(f"Predicted {prediction['itemsets']:,.0f} frequent itemsets; "
+                   + ", ".join(f"{engine} {ms / 1000:,.1f}s" for engine, ms in prediction['runtime_ms'].items())
+                   + f". --engine auto would run {assessment['engine']} alone.")
+
+    if st.button("✖ Cancel Mining", key="cancel_mining"):
+        job.cancel()
+
+    _render_scheduler_load()
+
+
+def _render_scheduler_load():
+    load = get_scheduler().stats()
+    memory = f"{load['memory_in_use_mb']:,} MB" if load['memory_budget_mb'] is None else \
+        f"{load['memory_in_use_mb']:,} of {load['memory_budget_mb']:,} MB"
+    st.caption(f"Mining server: {load['running']} of {load['cpu_slots']} workers busy "
+               f"({load['utilization']:.0%}), {load['queue_depth']} queued, {memory} reserved, "
+               f"{load['shared_requests']} requests served by a run already in progress.")
+
 
 def render_page(): 
     st.title("🔍 Association Rules Mining")
     st.markdown("Discover patterns in shopping behavior using Apriori and Eclat algorithms.")
 
-    # Combine all transactions
-    all_transactions = st.session_state.transactions + st.session_state.imported_transactions
+    # Manual and imported transactions together; mining runs on their
+    # preprocessed, encoded form from the session's pipeline
+    all_transactions = st.session_state.store
+    pipeline = st.session_state.pipeline
 
     if len(all_transactions) == 0:
         st.warning("No transactions available for mining. Please create or import transactions first.")
@@ -16,6 +143,36 @@ def render_page():
         # Algorithm Configuration Section
         st.markdown("### ⚙️ Mining Parameters")
 
+        # Each algorithm runs in its own worker process, stopped at these limits
+        with st.expander("⏱️ Run Limits", expanded=False):
+            limit_col1, limit_col2 = st.columns(2)
+
+            with limit_col1:
+                timeout_s = st.number_input(
+                    "Time Limit (seconds)",
+                    min_value=1,
+                    value=60,
+                    step=5,
+                    help="Wall-clock limit for the mining run. Algorithms still running are stopped and return the levels they completed."
+                )
+
+            with limit_col2:
+                memory_limit_mb = st.number_input(
+                    "Memory Ceiling per Algorithm (MB)",
+                    min_value=64,
+                    value=1024,
+                    step=64,
+                    help="An algorithm whose worker process grows past this is stopped and returns the levels it completed."
+                )
+
+            force_run = st.checkbox(
+                "Run even when predicted to explode",
+                value=False,
+                help="Before a run starts, a cost model predicts its frequent itemsets and runtime from the "
+                     "basket statistics. Runs predicted to explode (e.g. a very low support on dense baskets) "
+                     "are not started unless this is ticked."
+            )
+
         col1, col2, col3 = st.columns(3)
 
         with col1:
@@ -37,47 +194,102 @@ def render_page():
                 step=0.01,
                 help="Minimum confidence for a rule to be included (e.g., 0.5 = 50% confidence)"
             )
+            rule_pruning = st.radio(
+                "Rule Pruning",
+                RULE_PRUNING,
+                horizontal=True,
+                format_func=lambda pruning: pruning.title(),
+                help="Redundant drops a rule when a rule with fewer antecedent items and the same consequent "
+                     "is at least as confident. Productive also drops rules no better than the consequent's "
+                     "own support (lift of 1 or less)."
+            )
 
         with col3:
             st.metric("Total Transactions", len(all_transactions))
+            job = st.session_state.mining_job
             if st.button("🚀 Run Mining Algorithms", type="primary", use_container_width=True):
-                try:
-                    with st.spinner("Running Apriori and Eclat algorithms..."):
-                        # Run both algorithms
-                        apriori_results, eclat_results, comparison_df = compare_algorithms(
-                            all_transactions,
-                            min_support=min_support,
-                            min_confidence=min_confidence
-                        )
-
-                        # Store in session state
-                        st.session_state.mining_results = {
-                            'apriori': apriori_results,
-                            'eclat': eclat_results,
-                            'min_support': min_support,
-                            'min_confidence': min_confidence
-                        }
-                        st.session_state.comparison_df = comparison_df
+                pipeline.configure('mine', min_support=min_support, timeout_s=timeout_s, memory_limit_mb=memory_limit_mb)
+                pipeline.configure('rules', min_confidence=min_confidence, pruning=rule_pruning)
 
-                    st.success("Mining completed successfully!")
-                    st.rerun()
-
-                except Exception as e:
-                    st.error(f"Error during mining: {str(e)}")
-                    import traceback
-                    st.code(traceback.format_exc())
+                try:
+                    # Preprocesses and encodes the transactions, unless they did not change
+                    stage_key = pipeline.key('mine')
+                    encoded = pipeline.get('encode')
+                except FileNotFoundError:
+                    st.error("products.csv file not found. Cannot preprocess the transactions for mining.")
+                else:
+                    # Nothing to submit when these cleaned transactions were already mined at
+                    # this support (a new confidence only regenerates the rules), or are being mined
+                    mined_already = pipeline.current('mine') or (
+                        job is not None and job.active and job.stage_key == stage_key)
+
+                    assessment = None if len(encoded) == 0 or mined_already else select_engine(
+                        encoded, min_support, memory_limit_mb=memory_limit_mb)
+
+                    if len(encoded) == 0:
+                        st.warning("No transactions are left after preprocessing. Nothing to mine.")
+                    elif assessment is not None and assessment['verdict'] == 'refuse' and not force_run:
+                        st.error(f"Not started: {'; '.join(assessment['reasons'])}. Raise the minimum support, "
+                                 "or tick 'Run even when predicted to explode' under Run Limits.")
+                    elif not mined_already:
+                        # A job still running for other inputs is cancelled and replaced
+                        if job is not None:
+                            job.cancel()
+                        try:
+                            job = submit_mining_job(
+                                get_scheduler(),
+                                encoded,
+                                min_support=min_support,
+                                min_confidence=min_confidence,
+                                timeout_s=timeout_s,
+                                memory_limit_mb=memory_limit_mb
+                            )
+                            job.stage_key = stage_key
+                            job.assessment = assessment
+                            st.session_state.mining_job = job
+                        except SchedulerBusy as e:
+                            st.session_state.mining_job = None
+                            st.error(f"Mining server is busy: {e}")
+            elif job is not None and job.active and (
+                    job.params['min_support'], job.params['min_confidence']) != (min_support, min_confidence):
+                st.caption("Parameters changed: run again to replace the running job.")
+
+        _render_mining_progress()
+
+        if st.session_state.mining_error is not None:
+            st.error("Error during mining")
+            st.code(st.session_state.mining_error)
 
         # Display results if available
-        if st.session_state.mining_results is not None:
-            results = st.session_state.mining_results
-            apriori_res = results['apriori']
-            eclat_res = results['eclat']
+        mined = pipeline.latest('mine')
+        if mined is not None:
+            apriori_res = mined['apriori']
+            eclat_res = mined['eclat']
+
+            if pipeline.dirty('mine'):
+                # Results of an earlier run, with the rules its engines generated
+                min_confidence_used = mined['min_confidence']
+                rules = pipeline.latest_derived('rules', min_confidence=min_confidence_used)
+                st.info("The transactions or the mining parameters changed since these results were mined. "
+                        "Run the algorithms again to update them.")
+            else:
+                rules = pipeline.get('rules')
+                min_confidence_used = pipeline.params['rules']['min_confidence']
 
             st.markdown("---")
 
             # Performance Comparison
             st.markdown("### 📊 Algorithm Performance Comparison")
 
+            for res in (apriori_res, eclat_res):
+                status = res.get('status', 'ok')
+                if status == 'error':
+                    st.error(f"{res['algorithm']} failed: {res['error']}. "
+                             f"Showing the {res['num_frequent_itemsets']} frequent itemsets it found before failing.")
+                elif status != 'ok':
+                    st.warning(f"{res['algorithm']} {STATUS_LABELS[status]} and was stopped. "
+                               f"Showing the {res['num_frequent_itemsets']} frequent itemsets from the levels it completed.")
+
             col1, col2, col3, col4 = st.columns(4)
 
             with col1:
@@ -97,12 +309,34 @@ def render_page():
                 st.metric("Faster Algorithm", faster)
 
             with col4:
-                st.metric("Rules Generated", apriori_res['num_rules'])
+                st.metric("Rules Generated", len(rules))
 
             # Detailed comparison table
-            if st.session_state.comparison_df is not None:
+            if mined['comparison_df'] is not None:
                 with st.expander("📈 Detailed Performance Metrics", expanded=False):
-                    st.dataframe(st.session_state.comparison_df, use_container_width=True)
+                    st.dataframe(mined['comparison_df'], use_container_width=True)
+
+                    # Per-level instrumentation: where each algorithm spends its time
+                    for res in (apriori_res, eclat_res):
+                        if res.get('level_stats'):
+                            st.markdown(f"**{res['algorithm']} per-level statistics** "
+                                        f"({res['num_candidates']} candidates in total)")
+                            df_levels = pd.DataFrame(res['level_stats']).rename(columns={
+                                'level': 'Level (k)',
+                                'candidates_generated': 'Candidates',
+                                'candidates_pruned': 'Pruned',
+                                'frequent_itemsets': 'Frequent',
+                                'transactions_scanned': 'Transactions Scanned',
+                                'generation_time_ms': 'Generation (ms)',
+                                'counting_time_ms': 'Counting (ms)',
+                                'tidsets': 'Tidsets',
+                                'tidset_size_total': 'Tidset Size (total)',
+                                'tidset_size_max': 'Tidset Size (max)',
+                                'tidset_size_avg': 'Tidset Size (avg)'
+                            })
+                            if res['algorithm'] == 'Apriori':
+                                df_levels = df_levels.drop(columns=['Tidsets', 'Tidset Size (total)', 'Tidset Size (max)', 'Tidset Size (avg)'])
+                            st.dataframe(df_levels, use_container_width=True, hide_index=True)
 
             st.markdown("---")
 
@@ -110,26 +344,17 @@ def render_page():
             st.markdown("### 🎯 Product Recommendation System")
             st.markdown("Select a product to see what customers frequently buy together with it.")
 
-            # Get all unique products from transactions
-            all_items = set()
-            for txn in all_transactions:
-                all_items.update(txn['items'])
+            # All products of the mined (cleaned) transactions
+            encoded = pipeline.latest('encode')
+            all_items = set(encoded.vocabulary) if encoded is not None else set()
 
             # Sort products by those with association rules first
-            products_with_rules = set()
-            products_without_rules = set()
-
-            for item in all_items:
-                has_rules = False
-                for rule in apriori_res['rules']:
-                    if item in rule['antecedent']:
-                        has_rules = True
-                        break
-
-                if has_rules:
-                    products_with_rules.add(item)
-                else:
-                    products_without_rules.add(item)
+            antecedent_items = set()
+            for rule in rules:
+                antecedent_items.update(rule['antecedent'])
+
+            products_with_rules = all_items & antecedent_items
+            products_without_rules = all_items - antecedent_items
 
             # Create sorted list: products with rules first (alphabetically), then products without rules (alphabetically)
             product_names = sorted(list(products_with_rules)) + sorted(list(products_without_rules))
@@ -153,7 +378,7 @@ def render_page():
 
                 # Filter rules where selected product is in antecedent
                 relevant_rules = []
-                for rule in apriori_res['rules']:
+                for rule in rules:
                     if selected_product in rule['antecedent']:
                         relevant_rules.append(rule)
 
@@ -231,12 +456,12 @@ def render_page():
 
             # All Rules View
             with st.expander("📋 View All Association Rules", expanded=False):
-                st.markdown(f"**Total Rules Found:** {apriori_res['num_rules']}")
+                st.markdown(f"**Total Rules Found:** {len(rules)}")
 
-                if apriori_res['num_rules'] > 0:
+                if len(rules) > 0:
                     # Create DataFrame of all rules
                     rules_data = []
-                    for rule in apriori_res['rules']:
+                    for rule in rules:
                         antecedent_str = ", ".join(sorted(list(rule['antecedent'])))
                         consequent_str = ", ".join(sorted(list(rule['consequent'])))
 
@@ -277,7 +502,7 @@ def render_page():
                         st.download_button(
                             label="Download Rules CSV",
                             data=csv_rules,
-                            file_name=f"association_rules_sup{results['min_support']}_conf{results['min_confidence']}.csv",
+                            file_name=f"association_rules_sup{mined['min_support']}_conf{min_confidence_used}.csv",
                             mime="text/csv",
                             use_container_width=True
                         )
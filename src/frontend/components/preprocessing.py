@@ -1,14 +1,29 @@
 import streamlit as st
 import pandas as pd
 from pathlib import Path
-from preprocessing.preprocessing_utils import preprocess_transactions, load_products_set
+from preprocessing.preprocessing_utils import load_products_set
+from preprocessing.fuzzy_matching import CatalogMatcher
+from preprocessing.transaction_formats import parquet_bytes
+from pipeline import PRODUCTS_PATH
+
+# One matcher per catalog version, shared by every session so corrections
+# found for one dataset are reused for the next
+@st.cache_resource
+def get_catalog_matcher(products_path, modified_time):
+    return CatalogMatcher(load_products_set(products_path))
+
+# Matcher for the pipeline's preprocess stage, from the shared cache
+def catalog_matcher(products_path=PRODUCTS_PATH):
+    path = Path(products_path)
+
+    return get_catalog_matcher(str(path), path.stat().st_mtime)
 
 def render_page():
     st.title("🔧 Data Preprocessing")
     st.markdown("Clean and standardize your transaction data to prepare it for analysis.")
 
-    # Combine all transactions
-    all_transactions = st.session_state.transactions + st.session_state.imported_transactions
+    # Manual and imported transactions together
+    all_transactions = st.session_state.store
 
     if len(all_transactions) == 0:
         st.warning("No transactions available for preprocessing. Please create or import transactions first.")
@@ -21,6 +36,7 @@ def render_page():
         - **Standardizing product names** (converting to lowercase, removing extra spaces)
         - **Removing duplicate items** within each transaction
         - **Removing invalid products** (items not in the official product catalog)
+        - **Optionally repairing misspelled products** (e.g. "bred" becomes "bread") instead of removing them
         - **Filtering empty transactions** (transactions with no items after cleaning)
         - **Filtering single-item transactions** (transactions with only one item have no association value)
         """)
@@ -32,18 +48,17 @@ def render_page():
 
         col1, col2, col3 = st.columns(3)
 
+        # Read from the store's running aggregates, no rescan of the transactions
+        aggregates = all_transactions.aggregates
+
         with col1:
-            st.metric("Total Transactions", len(all_transactions))
+            st.metric("Total Transactions", aggregates.transactions)
 
         with col2:
-            total_items = sum(len(txn['items']) for txn in all_transactions)
-            st.metric("Total Items", total_items)
+            st.metric("Total Items", aggregates.total_items)
 
         with col3:
-            all_items = set()
-            for txn in all_transactions:
-                all_items.update(txn.get('items', []))
-            st.metric("Unique Items", len(all_items))
+            st.metric("Unique Items", aggregates.distinct_items)
 
         # Preview before preprocessing
         st.markdown("#### Sample Transactions (Before Cleaning)")
@@ -67,19 +82,24 @@ def render_page():
 
         with col1:
             st.info("Click the button below to clean and standardize your transaction data. The preprocessing report will show you what changes were made.")
+            repair_items = st.checkbox(
+                "Repair misspelled items",
+                value=False,
+                help="Replace items that are not in the catalog with the closest product name (one or two typos) instead of removing them"
+            )
 
         with col2:
             if st.button("🚀 Run Preprocessing", type="primary", use_container_width=True):
-                # Load valid products from products.csv
-                products_path = Path("data/products.csv")
+                # Valid products come from products.csv
+                products_path = Path(PRODUCTS_PATH)
 
                 if products_path.exists():
                     try:
-                        # Load valid products
-                        valid_products = load_products_set(str(products_path))
-
-                        # Run preprocessing
-                        cleaned_txns, stats = preprocess_transactions(all_transactions, valid_products)
+                        # The pipeline's preprocess stage: rerun only if the
+                        # transactions, the catalog or the repair option changed
+                        pipeline = st.session_state.pipeline
+                        pipeline.configure('preprocess', repair=repair_items)
+                        cleaned_txns, stats = pipeline.get('preprocess')
 
                         # Store results in session state
                         st.session_state.cleaned_transactions = cleaned_txns
@@ -100,6 +120,9 @@ def render_page():
 
             stats = st.session_state.preprocessing_stats
 
+            if st.session_state.pipeline.dirty('preprocess'):
+                st.info("The transactions or options changed since this report was made. Run preprocessing again to update it.")
+
             # Before Cleaning Section
             st.markdown("#### Before Cleaning")
             col1, col2, col3, col4 = st.columns(4)
@@ -127,6 +150,7 @@ def render_page():
                 st.markdown("**Data Quality Issues:**")
                 st.write(f"- Duplicate items found: **{stats['duplicates']}** instances")
                 st.write(f"- Invalid items found: **{stats['invalid']}** instances")
+                st.write(f"- Misspelled items repaired: **{stats.get('repaired', 0)}** instances")
 
             with col2:
                 removed_txns = stats['empty'] + stats['single']
@@ -158,7 +182,7 @@ def render_page():
 
             if len(st.session_state.cleaned_transactions) > 0:
                 # Get the first 10 transaction IDs from cleaned data
-                cleaned_ids = [txn['transaction_id'] for txn in st.session_state.cleaned_transactions]
+                cleaned_ids = {txn['transaction_id'] for txn in st.session_state.cleaned_transactions}
 
                 # Find corresponding original transactions
                 original_preview = [txn for txn in all_transactions if txn['transaction_id'] in cleaned_ids]
@@ -206,14 +230,14 @@ def render_page():
                 if len(st.session_state.cleaned_transactions) > 0:
                     if st.button("Apply Cleaned Transactions", use_container_width=True, type="primary"):
                         # Replace all transactions with cleaned ones
-                        st.session_state.transactions = []
-                        st.session_state.imported_transactions = st.session_state.cleaned_transactions.copy()
+                        st.session_state.store.clear()
+                        st.session_state.store.extend(st.session_state.cleaned_transactions, 'imported')
 
                         # Clear preprocessing results
                         st.session_state.preprocessing_stats = None
                         st.session_state.cleaned_transactions = []
 
-                        st.success(f"Successfully applied {len(st.session_state.imported_transactions)} cleaned transactions!")
+                        st.success(f"Successfully applied {st.session_state.store.count('imported')} cleaned transactions!")
                         st.info("Your transaction data has been updated. Visit the 'View Transactions' page to see the changes.")
                         st.rerun()
 
@@ -253,6 +277,14 @@ def render_page():
                             use_container_width=True
                         )
 
+                        st.download_button(
+                            label="Download Cleaned Parquet",
+                            data=parquet_bytes(st.session_state.cleaned_transactions),
+                            file_name="cleaned_transactions.parquet",
+                            mime="application/vnd.apache.parquet",
+                            use_container_width=True
+                        )
+
             with col2:
                 if st.button("Export Preprocessing Report", use_container_width=True):
                     # Create report text
@@ -264,6 +296,7 @@ Before Cleaning:
 - Single-item transactions: {stats['single']}
 - Duplicate items found: {stats['duplicates']} instances
 - Invalid items found: {stats['invalid']} instances
+- Misspelled items repaired: {stats.get('repaired', 0)} instances
 
 After Cleaning:
 - Valid transactions: {stats['valid_transactions']}
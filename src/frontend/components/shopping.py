@@ -119,23 +119,21 @@ def render_page():
         with col3:
             if st.button("Complete Transaction", use_container_width=True, type="primary"):
                 # Create transaction
-                transaction = {
-                    'transaction_id': st.session_state.transaction_counter,
-                    'items': st.session_state.current_cart.copy()
-                }
-                st.session_state.transactions.append(transaction)
+                transaction_id = st.session_state.transaction_counter
+                st.session_state.store.append(transaction_id, st.session_state.current_cart, 'manual')
                 st.session_state.transaction_counter += 1
                 st.session_state.current_cart = []
-                st.success(f"Transaction #{transaction['transaction_id']} completed successfully!")
+                st.success(f"Transaction #{transaction_id} completed successfully!")
                 st.rerun()
 
     # Show recent transactions
-    if len(st.session_state.transactions) > 0:
+    manual_transactions = st.session_state.store.view('manual')
+    if len(manual_transactions) > 0:
         st.markdown("---")
         st.markdown("### Recent Transactions")
 
         # Show last 5 transactions
-        recent = st.session_state.transactions[-5:][::-1]  # Last 5, reversed
+        recent = manual_transactions[-5:][::-1]  # Last 5, reversed
 
         for txn in recent:
             with st.expander(f"Transaction #{txn['transaction_id']} - {len(txn['items'])} items"):
@@ -1,12 +1,35 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+SORT_OPTIONS = {
+    "Insertion order": None,
+    "Transaction ID": 'transaction_id',
+    "Item Count": 'item_count',
+    "Source": 'source'
+}
+
+# Display table for some rows of the store; only these rows are materialized
+def transactions_frame(store, rows):
+    df_page = store.take(rows).to_dataframe()
+    # Number rows by their position in the store
+    df_page.index = rows + 1
+
+    return pd.DataFrame({
+        'Transaction ID': df_page['transaction_id'],
+        'Items': df_page['items'].map(', '.join),
+        'Item Count': df_page['items'].map(len),
+        'Source': df_page['source'].str.capitalize()
+    })
 
 def render_page():
     st.title("📊 View Transactions")
     st.markdown("View and analyze all your transaction data in one place.")
 
-    # Combine all transactions
-    all_transactions = st.session_state.transactions + st.session_state.imported_transactions
+    # Manual and imported transactions together
+    all_transactions = st.session_state.store
 
     if len(all_transactions) == 0:
         st.info("No transactions found. Create transactions in the Shopping page or import data from the Data Import page.")
@@ -20,30 +43,24 @@ def render_page():
             st.metric("Total Transactions", len(all_transactions))
 
         with col2:
-            st.metric("Manual Transactions", len(st.session_state.transactions))
+            st.metric("Manual Transactions", all_transactions.count('manual'))
 
         with col3:
-            st.metric("Imported Transactions", len(st.session_state.imported_transactions))
+            st.metric("Imported Transactions", all_transactions.count('imported'))
 
         with col4:
             # Calculate total items across all transactions
-            total_items = sum(len(txn['items']) for txn in all_transactions)
-            st.metric("Total Items Purchased", total_items)
+            st.metric("Total Items Purchased", all_transactions.total_items)
 
         st.markdown("---")
 
         # Item Frequency Analysis
         st.markdown("### 🔝 Most Popular Items")
 
-        from collections import Counter
-
         # Count all items
-        all_items = []
-        for txn in all_transactions:
-            all_items.extend(txn['items'])
-
-        item_counts = Counter(all_items)
-        most_common = item_counts.most_common(10)
+        counts = all_transactions.item_counts()
+        top_items = np.argsort(-counts, kind='stable')[:10]
+        most_common = [(all_transactions.vocabulary[i], int(counts[i])) for i in top_items if counts[i] > 0]
 
         if most_common:
             # Create DataFrame for display
@@ -57,7 +74,7 @@ def render_page():
 
             with col2:
                 st.markdown("#### Quick Stats")
-                st.metric("Unique Items", len(item_counts))
+                st.metric("Unique Items", all_transactions.aggregates.distinct_items)
                 if most_common:
                     st.metric("Most Popular Item", most_common[0][0])
                     st.metric("Times Purchased", most_common[0][1])
@@ -67,18 +84,6 @@ def render_page():
         # Transaction Data Table
         st.markdown("### 📋 All Transactions")
 
-        # Create DataFrame from transactions
-        transaction_data = []
-        for txn in all_transactions:
-            transaction_data.append({
-                'Transaction ID': txn['transaction_id'],
-                'Items': ', '.join(txn['items']),
-                'Item Count': len(txn['items']),
-                'Source': 'Manual' if txn in st.session_state.transactions else 'Imported'
-            })
-
-        df_transactions = pd.DataFrame(transaction_data)
-
         # Filter options
         col1, col2 = st.columns([1, 3])
 
@@ -88,17 +93,35 @@ def render_page():
         with col2:
             search_item = st.text_input("Search for item:", placeholder="Enter item name...")
 
-        # Apply filters
-        df_filtered = df_transactions.copy()
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            sort_label = st.selectbox("Sort by:", list(SORT_OPTIONS))
+
+        with col2:
+            descending = st.checkbox("Descending", value=False)
 
-        if source_filter != "All":
-            df_filtered = df_filtered[df_filtered['Source'] == source_filter]
+        with col3:
+            page_size = st.selectbox("Rows per page:", PAGE_SIZES, index=1)
+
+        # Filtering and sorting run on the store's arrays and item index;
+        # only the rows of the current page are turned into a table
+        rows = all_transactions.select(
+            source=None if source_filter == "All" else source_filter.lower(),
+            query=search_item or None,
+            sort_by=SORT_OPTIONS[sort_label],
+            descending=descending
+        )
+        num_pages = max(1, -(-len(rows) // page_size))
+
+        with col4:
+            page = st.number_input("Page:", min_value=1, max_value=num_pages, value=1, step=1)
 
-        if search_item:
-            df_filtered = df_filtered[df_filtered['Items'].str.contains(search_item, case=False, na=False)]
+        page_rows = rows[(page - 1) * page_size:page * page_size]
 
-        st.markdown(f"Showing **{len(df_filtered)}** of **{len(df_transactions)}** transactions")
-        st.dataframe(df_filtered, use_container_width=True, height=400)
+        st.markdown(f"Showing **{len(page_rows)}** of **{len(rows)}** matching transactions "
+                    f"(page {page} of {num_pages}, {len(all_transactions)} in total)")
+        st.dataframe(transactions_frame(all_transactions, page_rows), use_container_width=True, height=400)
 
         st.markdown("---")
 
@@ -110,7 +133,7 @@ def render_page():
         with col1:
             # Export all transactions to CSV
             if st.button("Export All Transactions", use_container_width=True):
-                csv = df_transactions.to_csv(index=False)
+                csv = transactions_frame(all_transactions, np.arange(len(all_transactions))).to_csv(index=False)
                 st.download_button(
                     label="Download CSV",
                     data=csv,
@@ -121,15 +144,13 @@ def render_page():
 
         with col2:
             # Export manual transactions only
-            if len(st.session_state.transactions) > 0:
+            if all_transactions.count('manual') > 0:
                 if st.button("Export Manual Only", use_container_width=True):
-                    manual_data = []
-                    for txn in st.session_state.transactions:
-                        manual_data.append({
-                            'transaction_id': txn['transaction_id'],
-                            'items': ','.join(txn['items'])
-                        })
-                    df_manual = pd.DataFrame(manual_data)
+                    manual = all_transactions.view('manual')[:].to_dataframe()
+                    df_manual = pd.DataFrame({
+                        'transaction_id': manual['transaction_id'],
+                        'items': manual['items'].map(','.join)
+                    })
                     csv_manual = df_manual.to_csv(index=False)
                     st.download_button(
                         label="Download CSV",
@@ -142,7 +163,11 @@ def render_page():
         with col3:
             # Export item frequency analysis
             if st.button("Export Item Frequencies", use_container_width=True):
-                df_freq = pd.DataFrame(item_counts.items(), columns=['Item', 'Frequency'])
+                nonzero = np.flatnonzero(counts)
+                df_freq = pd.DataFrame({
+                    'Item': np.array(all_transactions.vocabulary, dtype=object)[nonzero],
+                    'Frequency': counts[nonzero]
+                })
                 df_freq = df_freq.sort_values('Frequency', ascending=False)
                 csv_freq = df_freq.to_csv(index=False)
                 st.download_button(
@@ -158,8 +183,7 @@ def render_page():
         st.markdown("### ⚠️ Danger Zone")
 
         if st.button("Clear All Transactions", type="secondary"):
-            st.session_state.transactions = []
-            st.session_state.imported_transactions = []
+            st.session_state.store.clear()
             st.session_state.transaction_counter = 1
             st.success("All transactions have been cleared.")
             st.rerun()
\ No newline at end of file
@@ -0,0 +1,330 @@
+import hashlib
+import itertools
+import os
+
+import pandas as pd
+
+try:
+    from .preprocessing.preprocessing_utils import preprocess_transactions, load_products_set
+    from .preprocessing.fuzzy_matching import CatalogMatcher
+    from .preprocessing.transaction_store import TransactionStore
+    from .algorithms.association_rules import generate_rules, prune_rules
+    from .algorithms.performance_comparison import run_engines_isolated, create_comparison_dataframe
+except ImportError:
+    # Imported with src/ on the path (the Streamlit app)
+    from preprocessing.preprocessing_utils import preprocess_transactions, load_products_set
+    from preprocessing.fuzzy_matching import CatalogMatcher
+    from preprocessing.transaction_store import TransactionStore
+    from algorithms.association_rules import generate_rules, prune_rules
+    from algorithms.performance_comparison import run_engines_isolated, create_comparison_dataframe
+
+# Memoized mining pipeline: a DAG of named stages
+#
+#   import ──┐
+#            ├─> preprocess ─> encode ─> mine ─> rules
+#   catalog ─┘
+#
+# Every stage result is cached together with its key, a hash of the stage's
+# parameters and of the content hashes of its inputs. A stage is recomputed
+# only when its key changes, so a change upstream (a new transaction, another
+# support threshold) invalidates just the stages downstream of it. Stages whose
+# output comes out unchanged (e.g. preprocessing drops the new single-item
+# transaction) stop the invalidation there, since the stages after them see
+# the same content hash.
+
+PRODUCTS_PATH = "data/products.csv"
+
+ENGINE_NAMES = ['Apriori', 'Eclat']
+
+
+def _hash(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+# Content hash of a TransactionStore, transaction ids included
+def store_digest(store):
+    tids = pd.util.hash_array(store.tids).tobytes() if len(store) else b""
+
+    return _hash(store.fingerprint(), hashlib.sha1(tids).hexdigest())
+
+# Mining results of both engines in the shape of the 'mine' stage
+def mined_result(apriori_results, eclat_results, min_support, min_confidence):
+    return {
+        'apriori': apriori_results,
+        'eclat': eclat_results,
+        'comparison_df': create_comparison_dataframe(apriori_results, eclat_results),
+        'min_support': min_support,
+        # Rules generated (and timed) inside each engine's run used this confidence
+        'min_confidence': min_confidence
+    }
+
+
+class Stage:
+
+    def __init__(self, name, compute, inputs=(), digest=None, token=None):
+        self.name = name
+        # compute(*input values, **params) -> value
+        self.compute = compute
+        self.inputs = tuple(inputs)
+        # Content hash of a value; by default the stage's key stands in for it
+        self.digest = digest
+        # Source stages (no inputs) have a cheap change token, e.g. a version
+        # counter, checked before rehashing their content
+        self.token = token
+
+
+# Key a stage result was (or will be) computed for
+class StageKey:
+
+    def __init__(self, key, params, input_digests):
+        self.key = key
+        self.params = params
+        self.input_digests = input_digests
+
+    def __eq__(self, other):
+        return isinstance(other, StageKey) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+class StageResult:
+
+    def __init__(self, stage_key, value, digest, token=None):
+        self.stage_key = stage_key
+        self.value = value
+        self.digest = digest
+        self.token = token
+
+
+class Pipeline:
+
+    def __init__(self):
+        self.stages = {}
+        self.params = {}
+        self._results = {}
+        # Tells apart the partial values recorded by put()
+        self._partial_runs = itertools.count()
+        # Stage runs and cache hits, for display
+        self.computed = {}
+        self.reused = {}
+
+    def add(self, name, compute, inputs=(), digest=None, token=None, **params):
+        for upstream in inputs:
+            if upstream not in self.stages:
+                raise ValueError(f"Stage {name} needs the unknown stage {upstream}")
+
+        self.stages[name] = Stage(name, compute, inputs, digest, token)
+        self.params[name] = params
+        self.computed[name] = 0
+        self.reused[name] = 0
+
+    # Change a stage's parameters; its result stays cached until it is requested
+    def configure(self, name, **params):
+        self.params[name] = {**self.params[name], **params}
+
+    # StageKey for the current inputs and parameters of a stage; computes the
+    # stages upstream of it as needed, never the stage itself
+    def key(self, name):
+        stage = self.stages[name]
+        params = dict(self.params[name])
+        input_digests = tuple(self._get(upstream).digest for upstream in stage.inputs)
+
+        return StageKey(_hash(name, sorted(params.items()), input_digests), params, input_digests)
+
+    # Value of a stage, computing it (and whatever it depends on) only if its key changed
+    def get(self, name):
+        return self._get(name).value
+
+    def _get(self, name):
+        stage = self.stages[name]
+        result = self._results.get(name)
+
+        if stage.token is not None:
+            token = stage.token()
+            if result is not None and result.token == token and result.stage_key.params == self.params[name]:
+                self.reused[name] += 1
+                return result
+
+        stage_key = self.key(name)
+        if result is not None and result.stage_key == stage_key and stage.token is None:
+            self.reused[name] += 1
+            return result
+
+        inputs = [self._results[upstream].value for upstream in stage.inputs]
+        value = stage.compute(*inputs, **stage_key.params)
+        self.computed[name] += 1
+
+        return self._store(name, stage_key, value, token if stage.token is not None else None)
+
+    def _store(self, name, stage_key, value, token=None):
+        stage = self.stages[name]
+        if stage.digest is not None:
+            digest = stage.digest(value)
+        elif stage_key.key is None:
+            digest = _hash(name, 'partial', next(self._partial_runs))
+        else:
+            digest = stage_key.key
+        result = StageResult(stage_key, value, digest, token)
+        self._results[name] = result
+
+        return result
+
+    # Record a value computed outside the pipeline (e.g. by a background job)
+    # for the key the computation was started with. A partial value (a run
+    # stopped early) is kept for display but never counts as current.
+    def put(self, name, stage_key, value, complete=True):
+        if not complete:
+            stage_key = StageKey(None, stage_key.params, stage_key.input_digests)
+
+        self._store(name, stage_key, value)
+
+    # Whether the cached value of a stage matches its current inputs and parameters
+    def current(self, name):
+        result = self._results.get(name)
+
+        return result is not None and result.stage_key == self.key(name)
+
+    # Last value computed for a stage, current or not (None if there is none)
+    def latest(self, name):
+        result = self._results.get(name)
+
+        return None if result is None else result.value
+
+    # Value of a stage computed from the last values of its inputs, current or
+    # not (e.g. the rules of results mined before the data changed), with
+    # params overriding the stage's own. Nothing upstream is recomputed, and
+    # the value is cached like get()'s. None while an input has no value.
+    def latest_derived(self, name, **params):
+        stage = self.stages[name]
+        inputs = [self._results.get(upstream) for upstream in stage.inputs]
+        if any(result is None for result in inputs):
+            return None
+
+        params = {**self.params[name], **params}
+        input_digests = tuple(result.digest for result in inputs)
+        stage_key = StageKey(_hash(name, sorted(params.items()), input_digests), params, input_digests)
+
+        result = self._results.get(name)
+        if result is not None and result.stage_key == stage_key:
+            self.reused[name] += 1
+            return result.value
+
+        value = stage.compute(*[result.value for result in inputs], **params)
+        self.computed[name] += 1
+
+        return self._store(name, stage_key, value).value
+
+    # Cheap check, without computing anything, of whether a stage may need to
+    # be recomputed: it has no result, its parameters changed, or something
+    # upstream of it changed since it ran
+    def dirty(self, name):
+        stage = self.stages[name]
+        result = self._results.get(name)
+
+        if result is None or result.stage_key.key is None or result.stage_key.params != self.params[name]:
+            return True
+        if stage.token is not None:
+            return result.token != stage.token()
+
+        for upstream, digest in zip(stage.inputs, result.stage_key.input_digests):
+            if self.dirty(upstream) or self._results[upstream].digest != digest:
+                return True
+
+        return False
+
+    # Drop cached results: of one stage and everything downstream of it, or all
+    def invalidate(self, name=None):
+        for stage in self.stages:
+            if name is None or stage == name or name in self.upstream(stage):
+                self._results.pop(stage, None)
+
+    # Every stage a stage depends on, directly or not
+    def upstream(self, name):
+        found = set()
+        pending = list(self.stages[name].inputs)
+
+        while pending:
+            stage = pending.pop()
+            if stage not in found:
+                found.add(stage)
+                pending.extend(self.stages[stage].inputs)
+
+        return found
+
+    # 'ready', 'stale' or 'missing' per stage, in pipeline order
+    def status(self):
+        return {
+            name: 'missing' if name not in self._results else ('stale' if self.dirty(name) else 'ready')
+            for name in self.stages
+        }
+
+
+# Modification time of the catalog; None while the file is missing, which
+# loading it then reports
+def _catalog_token(products_path):
+    try:
+        return os.stat(products_path).st_mtime_ns
+    except OSError:
+        return None
+
+def _preprocess(transactions, products, repair=False, matcher=None):
+    if repair:
+        matcher = matcher() if matcher is not None else CatalogMatcher(products)
+    else:
+        matcher = None
+
+    return preprocess_transactions(transactions, products, matcher=matcher)
+
+# The cleaned transactions, encoded into a TransactionStore for the miners
+def _encode(preprocessed):
+    cleaned, stats = preprocessed
+
+    return TransactionStore.from_transactions(cleaned)
+
+def _mine(encoded, min_support=0.2, min_confidence=0.5, timeout_s=None, memory_limit_mb=None):
+    results = run_engines_isolated(
+        ENGINE_NAMES,
+        encoded,
+        min_support,
+        min_confidence,
+        timeout_s=timeout_s,
+        memory_limit_mb=memory_limit_mb,
+        collect_stats=True
+    )
+
+    return mined_result(results['Apriori'], results['Eclat'], min_support, min_confidence)
+
+# Apriori's rules at min_confidence, pruned as association_rules.prune_rules
+# names it; reuses the ones generated while mining when they were made at the
+# same confidence
+def _rules(mined, min_confidence=0.5, pruning='none'):
+    if mined['min_confidence'] == min_confidence:
+        rules = mined['apriori']['rules']
+    else:
+        rules = generate_rules(mined['apriori']['frequent_itemsets'], min_confidence)
+
+    return prune_rules(rules, pruning)
+
+# Pipeline over a TransactionStore and a product catalog. matcher, when given,
+# returns the CatalogMatcher used when preprocessing repairs misspelled items
+# (e.g. one cached across sessions); by default one is built from the catalog.
+#
+# Parameters: preprocess (repair), mine (min_support, timeout_s,
+# memory_limit_mb) and rules (min_confidence, pruning). The confidence is not part of
+# the mining key: changing it only regenerates the rules, while the rules each
+# engine generates and times during its run use the confidence set when it ran.
+def build_pipeline(store, products_path=PRODUCTS_PATH, matcher=None):
+    pipeline = Pipeline()
+
+    pipeline.add('import', lambda: store, digest=store_digest, token=lambda: (id(store), store.version))
+    pipeline.add('catalog', lambda: load_products_set(products_path),
+                 digest=lambda products: _hash(sorted(products)),
+                 token=lambda: _catalog_token(products_path))
+    pipeline.add('preprocess', lambda transactions, products, repair: _preprocess(transactions, products, repair, matcher),
+                 inputs=('import', 'catalog'), repair=False)
+    pipeline.add('encode', _encode, inputs=('preprocess',), digest=store_digest)
+    pipeline.add('mine', lambda encoded, **params: _mine(encoded, min_confidence=pipeline.params['rules']['min_confidence'], **params),
+                 inputs=('encode',), min_support=0.2, timeout_s=None, memory_limit_mb=None)
+    pipeline.add('rules', _rules, inputs=('mine',), min_confidence=0.5, pruning='none')
+
+    return pipeline
@@ -0,0 +1,125 @@
+# Repair of misspelled items ("bred" -> "bread", "chese" -> "cheese").
+# Catalog products are indexed by their character bigrams: a product within
+# d edits of a typo must share most of the typo's bigrams, so a lookup only
+# computes edit distances for the few products that pass that count filter
+# instead of comparing the typo against the whole catalog.
+
+# Bigram size; each edit destroys at most this many bigrams
+GRAM_SIZE = 2
+
+
+# Edit distance between two strings (insertions, deletions, substitutions),
+# or max_distance + 1 as soon as it is certain to exceed max_distance
+def levenshtein(a, b, max_distance=None):
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    if not b:
+        return len(a)
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return previous[-1]
+
+# Distinct padded bigrams of a word ("milk" -> {"#m", "mi", "il", "lk", "k#"})
+def grams(word):
+    padded = "#" * (GRAM_SIZE - 1) + word + "#" * (GRAM_SIZE - 1)
+
+    return {padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)}
+
+
+# Inverted index from bigram to the words containing it
+class NGramIndex:
+
+    def __init__(self, words=()):
+        self.words = []
+        self.postings = {}
+
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        word_id = len(self.words)
+        self.words.append(word)
+
+        for gram in grams(word):
+            self.postings.setdefault(gram, []).append(word_id)
+
+    # All (distance, word) pairs within max_distance of word, closest first.
+    # A word loses at most GRAM_SIZE distinct bigrams per edit, so candidates
+    # must share at least len(grams(word)) - GRAM_SIZE * max_distance of them.
+    def search(self, word, max_distance):
+        word_grams = grams(word)
+        min_shared = len(word_grams) - GRAM_SIZE * max_distance
+
+        shared = {}
+        for gram in word_grams:
+            for word_id in self.postings.get(gram, ()):
+                shared[word_id] = shared.get(word_id, 0) + 1
+
+        if min_shared > 0:
+            candidates = [word_id for word_id, count in shared.items() if count >= min_shared]
+        else:
+            # Too short for the filter to rule anything out
+            candidates = range(len(self.words))
+
+        matches = []
+        for word_id in candidates:
+            candidate = self.words[word_id]
+            distance = levenshtein(word, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+
+        return sorted(matches)
+
+
+# Largest correction accepted for an item: short names would match too many
+# other products after a couple of edits
+def max_edit_distance(item):
+    if len(item) < 4:
+        return 0
+    if len(item) < 8:
+        return 1
+
+    return 2
+
+
+# Maps unknown items to their closest catalog product. Lookups are memoized,
+# so every distinct typo is searched for once per matcher.
+class CatalogMatcher:
+
+    def __init__(self, products):
+        self.products = set(products)
+        self.index = NGramIndex(sorted(self.products))
+        self.corrections = {}
+
+    # Closest product for item, item itself if it is a product, None if nothing
+    # is close enough or two products are equally close
+    def match(self, item):
+        if item in self.products:
+            return item
+        if item in self.corrections:
+            return self.corrections[item]
+
+        correction = None
+        max_distance = max_edit_distance(item)
+        if max_distance > 0:
+            matches = self.index.search(item, max_distance)
+            if len(matches) == 1 or (len(matches) > 1 and matches[0][0] < matches[1][0]):
+                correction = matches[0][1]
+
+        self.corrections[item] = correction
+
+        return correction
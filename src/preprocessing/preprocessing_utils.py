@@ -1,17 +1,121 @@
+import gc
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+try:
+    from .transaction_formats import (
+        file_layout, is_binary_path, iter_transaction_chunks, read_transaction_chunks, read_transactions,
+        write_transactions
+    )
+except ImportError:
+    # Run as a script (python src/preprocessing/preprocessing_utils.py)
+    from transaction_formats import (
+        file_layout, is_binary_path, iter_transaction_chunks, read_transaction_chunks, read_transactions,
+        write_transactions
+    )
 
+# Binary files (.parquet, .arrow, .feather) load as a TransactionStore without
+# parsing, long-format CSVs (transaction_id,item) and FIMI .dat files as a
+# TransactionStore built by the streaming readers; transaction_id,items CSVs
+# as a list of {'transaction_id', 'items'} dicts
 def load_transactions(csv_path):
+    if is_binary_path(csv_path):
+        return read_transactions(csv_path)
+    if file_layout(csv_path) in ('long', 'fimi'):
+        return read_transaction_chunks(csv_path)
+
     df = pd.read_csv(csv_path)
 
     df['items'] = df['items'].fillna('').str.split(',')
 
     return df.to_dict('records')
 
+# Rows per chunk when a transactions CSV is read in pieces
+CSV_CHUNK_ROWS = 200000
+
+# Building millions of small item lists makes the cyclic garbage collector run
+# over and over although none of them can form a cycle, so it is paused meanwhile
+@contextmanager
+def gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+# Split a column of comma-separated item strings into lists of stripped items.
+# Whitespace around the commas is removed before splitting, so the whole column
+# is parsed by vectorized Arrow string kernels instead of a Python loop per row.
+# The result is an Arrow list<string> column, which TransactionStore can ingest without
+# creating Python strings.
+def parse_items_column(items):
+    items = items.astype(pd.ArrowDtype(pa.string())).fillna('')
+
+    return items.str.replace(r'\s*,\s*', ',', regex=True).str.strip().str.split(',')
+
+# Read a transaction_id,items CSV (a path or file object) into a DataFrame whose
+# 'items' column holds item lists. With chunksize the file is read and parsed
+# chunk by chunk and progress(rows_read) is called after each one.
+def read_transactions_csv(source, chunksize=None, progress=None):
+    if chunksize:
+        reader = pd.read_csv(source, chunksize=chunksize, dtype={'items': pd.ArrowDtype(pa.string())})
+    else:
+        reader = [pd.read_csv(source, engine='pyarrow', dtype={'items': pd.ArrowDtype(pa.string())})]
+
+    chunks = []
+    rows_read = 0
+    with gc_paused():
+        for chunk in reader:
+            if 'transaction_id' not in chunk.columns or 'items' not in chunk.columns:
+                raise ValueError("Invalid CSV format! File must contain 'transaction_id' and 'items' columns.")
+
+            chunks.append(chunk[['transaction_id']].assign(items=parse_items_column(chunk['items'])))
+
+            rows_read += len(chunks[-1])
+            if progress is not None:
+                progress(rows_read)
+
+    if not chunks:
+        return pd.DataFrame({'transaction_id': [], 'items': []})
+
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+# DataFrame from read_transactions_csv -> list of {'transaction_id', 'items'} dicts
+def transactions_from_dataframe(df):
+    with gc_paused():
+        return [
+            {'transaction_id': transaction_id, 'items': items}
+            for transaction_id, items in zip(df['transaction_id'].tolist(), df['items'].tolist())
+        ]
+
 def load_products_set(csv_path):
     df = pd.read_csv(csv_path)
 
     return set(df['product_name'].str.strip().str.lower())
 
+# {product name: category}, both standardized like the transaction items
+def load_product_categories(csv_path):
+    df = pd.read_csv(csv_path)
+
+    return dict(zip(df['product_name'].str.strip().str.lower(), df['category'].str.strip().str.lower()))
+
+# {product name: unit price} from the catalog's price column
+def load_product_prices(csv_path):
+    df = pd.read_csv(csv_path)
+    if 'price' not in df.columns:
+        raise ValueError(f"{csv_path} has no price column")
+
+    return dict(zip(df['product_name'].str.strip().str.lower(), df['price'].astype(float)))
+
 def standardize_items(items):
     return [item.strip().lower() for item in items]
 
@@ -53,56 +157,257 @@ def clean_transaction(items, products_set):
 
     return new_items, stats, set(new_items)
 
-def preprocess_transactions(transactions, products):
-    processed_transactions = []
-    uniques_set = set()
+# Transactions per chunk, and the input size from which chunks are cleaned in
+# a process pool instead of in this process
+PREPROCESS_CHUNK_SIZE = 250000
+PARALLEL_MIN_TRANSACTIONS = 500000
 
-    stats = {
+# Clean every transaction in one columnar pass over the exploded item column.
+# Same output and counts as running clean_transaction on each basket:
+# items are standardized, repeated items within a transaction dropped (counted
+# as duplicates), items missing from products dropped (counted as invalid),
+# and transactions left with fewer than two items counted as empty or single.
+# With a CatalogMatcher, items missing from products are first replaced by
+# their closest product where there is one (counted as repaired).
+# With keep_quantities=True every cleaned transaction also has a 'quantities'
+# list, aligned with its items: how often each item occurred in the basket
+# (e.g. a cart holding two milks), repeats still counted as duplicates.
+# Returns the cleaned transactions and partial stats (see merge_stats).
+def clean_chunk(transactions, products, matcher=None, keep_quantities=False):
+    if hasattr(transactions, 'offsets'):
+        # A TransactionStore is already columnar: the item column is its vocabulary indexed by item id
+        ids = transactions.tids.tolist()
+        lengths = np.diff(transactions.offsets)
+        flat_items = np.array(transactions.vocabulary, dtype=object)[transactions.items]
+    else:
+        ids = [transaction["transaction_id"] for transaction in transactions]
+        lengths = np.fromiter((len(transaction["items"]) for transaction in transactions), dtype=np.int64, count=len(ids))
+        flat_items = list(chain.from_iterable(transaction["items"] for transaction in transactions))
+
+    # One row per item, tagged with the position of its transaction
+    positions = np.repeat(np.arange(len(ids)), lengths)
+    items = pd.Series(flat_items, dtype='string[pyarrow]')
+    items = items.str.strip().str.lower()
+
+    repaired = 0
+    if matcher is not None:
+        unknown = ~items.isin(list(products)).to_numpy()
+        corrections = {item: matcher.match(item) for item in items[unknown].unique().tolist()}
+        corrected = items[unknown].map(corrections)
+        fixed = corrected.notna().to_numpy()
+        repaired = int(fixed.sum())
+        if repaired:
+            items.iloc[np.flatnonzero(unknown)[fixed]] = corrected[fixed].to_numpy()
+
+    # A repeat is the same item code again within the same transaction
+    codes, uniques = pd.factorize(items)
+    keys = positions * max(len(uniques), 1) + codes
+    duplicated = pd.Series(keys).duplicated().to_numpy()
+    valid = items.isin(list(products)).to_numpy()
+    kept = ~duplicated & valid
+
+    kept_positions = positions[kept]
+    kept_counts = np.bincount(kept_positions, minlength=len(ids))
+    is_valid_transaction = kept_counts >= 2
+
+    # Surviving items stay in their original order, grouped by transaction
+    kept_items = items[kept].tolist()
+    offsets = np.concatenate(([0], np.cumsum(kept_counts))).tolist()
+
+    with gc_paused():
+        processed_transactions = [
+            {"transaction_id": ids[i], "items": kept_items[offsets[i]:offsets[i + 1]]}
+            for i in np.flatnonzero(is_valid_transaction).tolist()
+        ]
+
+    if keep_quantities:
+        # Occurrences of each kept item in its transaction
+        item_keys, occurrences = np.unique(keys[valid], return_counts=True)
+        quantities = occurrences[np.searchsorted(item_keys, keys[kept])].tolist()
+        for i, transaction in zip(np.flatnonzero(is_valid_transaction).tolist(), processed_transactions):
+            transaction["quantities"] = quantities[offsets[i]:offsets[i + 1]]
+
+    unique_codes = np.unique(codes[kept][is_valid_transaction[kept_positions]])
+
+    partial_stats = {
         "first_total": len(transactions),
+        "empty": int((kept_counts == 0).sum()),
+        "single": int((kept_counts == 1).sum()),
+        "duplicates": int(duplicated.sum()),
+        "invalid": int((~duplicated & ~valid).sum()),
+        "repaired": repaired,
+        "total_items": int(kept_counts[is_valid_transaction].sum()),
+        "valid_transactions": len(processed_transactions),
+        # Kept as the items themselves so chunks can be merged: the number
+        # of unique products across chunks is the size of their union
+        "unique_items": set(uniques.take(unique_codes).tolist())
+    }
+
+    return processed_transactions, partial_stats
+
+# Combine the partial stats of several chunks into the report dict
+# returned by preprocess_transactions
+def merge_stats(partial_stats):
+    stats = {
+        "first_total": 0,
         "empty": 0,
         "single": 0,
         "duplicates": 0,
         "invalid": 0,
+        "repaired": 0,
         "total_items": 0
     }
+    unique_items = set()
+    valid_transactions = 0
 
-    for transaction in transactions:
+    for partial in partial_stats:
+        for key in stats:
+            stats[key] += partial[key]
+        unique_items |= partial["unique_items"]
+        valid_transactions += partial["valid_transactions"]
 
-        new_transaction, transaction_stats, unique_items = clean_transaction(transaction["items"], products)
+    stats["uniques"] = len(unique_items)
+    stats["valid_transactions"] = valid_transactions
 
-        if len(new_transaction) <= 0:
-            stats["empty"] += 1
-        elif len(new_transaction) == 1:
-            stats["single"] += 1
-        else:
-            processed_transactions.append({"transaction_id": transaction["transaction_id"], "items": new_transaction})
-            stats["total_items"] += len(new_transaction)
-            uniques_set |= unique_items
+    return stats
 
-        stats["duplicates"] += transaction_stats["duplicates"]
-        stats["invalid"] += transaction_stats["invalid"] 
-    
-    stats["uniques"] = len(uniques_set)
-    stats["valid_transactions"] = len(processed_transactions)
+# Products (and matcher) for the pool workers, sent once per worker instead of once per chunk
+_worker_products = None
+_worker_matcher = None
+_worker_keep_quantities = False
 
-    return processed_transactions, stats
+def _init_preprocess_worker(products, matcher, keep_quantities=False):
+    global _worker_products, _worker_matcher, _worker_keep_quantities
+    _worker_products = products
+    _worker_matcher = matcher
+    _worker_keep_quantities = keep_quantities
 
-def save_to_csv(transactions, path):
-    df = pd.DataFrame(transactions)
+def _clean_chunk_in_worker(transactions):
+    return clean_chunk(transactions, _worker_products, _worker_matcher, _worker_keep_quantities)
 
-    df["items"] = df["items"].apply(lambda lst: ",".join(lst))
-    
-    df.to_csv(path, index=False)
+# Clean transactions chunk by chunk, yielding (cleaned_chunk, partial_stats)
+# in input order. With more than one worker the chunks are cleaned in a process
+# pool; at most two chunks per worker are in flight, so memory stays bounded
+# and a consumer (e.g. save_to_csv) can handle each chunk as soon as it is ready.
+# With chunked=True, transactions is already an iterable of chunks (e.g. from
+# transaction_formats.iter_transaction_chunks) and is consumed lazily.
+def preprocess_in_chunks(transactions, products, workers=1, chunk_size=PREPROCESS_CHUNK_SIZE, matcher=None,
+                         chunked=False, keep_quantities=False):
+    if chunked:
+        chunks = iter(transactions)
+    else:
+        chunks = (transactions[i:i + chunk_size] for i in range(0, len(transactions), chunk_size))
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield clean_chunk(chunk, products, matcher, keep_quantities)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_preprocess_worker,
+                             initargs=(products, matcher, keep_quantities)) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_clean_chunk_in_worker, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+# Workers for a stream of chunks, picked like preprocess_transactions does for
+# a list: one per CPU from PARALLEL_MIN_TRANSACTIONS transactions on, otherwise
+# none besides this process. Chunks are read ahead until that many were seen
+# or the input ended. Returns (workers, chunks), chunks yielding every chunk.
+def stream_workers(chunks):
+    chunks = iter(chunks)
+    head = []
+    seen = 0
+
+    for chunk in chunks:
+        head.append(chunk)
+        seen += len(chunk)
+        if seen >= PARALLEL_MIN_TRANSACTIONS:
+            return os.cpu_count() or 1, chain(head, chunks)
+
+    return 1, head
+
+# workers=None picks a process pool for large inputs (one worker per CPU).
+# Pass a fuzzy_matching.CatalogMatcher to repair misspelled items instead of
+# dropping them, and keep_quantities=True to keep how often each item was
+# bought (see clean_chunk).
+def preprocess_transactions(transactions, products, workers=None, chunk_size=PREPROCESS_CHUNK_SIZE, matcher=None,
+                            keep_quantities=False):
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(transactions) >= PARALLEL_MIN_TRANSACTIONS else 1
+
+    if workers <= 1 and len(transactions) <= chunk_size:
+        processed_transactions, partial_stats = clean_chunk(transactions, products, matcher, keep_quantities)
+        return processed_transactions, merge_stats([partial_stats])
+
+    processed_transactions = []
+    partial_stats = []
+    for cleaned, partial in preprocess_in_chunks(transactions, products, workers, chunk_size, matcher,
+                                                 keep_quantities=keep_quantities):
+        processed_transactions.extend(cleaned)
+        partial_stats.append(partial)
+
+    return processed_transactions, merge_stats(partial_stats)
+
+# Write transactions to a transaction_id,items CSV. With chunked=True,
+# transactions is an iterable of transaction lists (e.g. the cleaned chunks of
+# preprocess_in_chunks), each appended to the file as soon as it arrives.
+def save_to_csv(transactions, path, chunked=False):
+    chunks = transactions if chunked else [transactions]
+
+    header = True
+    with open(path, 'w', newline='') as f:
+        for chunk in chunks:
+            df = pd.DataFrame(chunk, columns=["transaction_id", "items"])
+
+            df["items"] = df["items"].apply(lambda lst: ",".join(lst))
+
+            df.to_csv(f, index=False, header=header)
+            header = False
+
+# Write transactions as CSV or, for a .parquet/.arrow/.feather path, in the
+# binary transaction format (see transaction_formats)
+def save_transactions(transactions, path, chunked=False):
+    if is_binary_path(path):
+        write_transactions(transactions, path, chunked=chunked)
+    else:
+        save_to_csv(transactions, path, chunked=chunked)
 
 def main():
-    transactions_path = "data/sample_transactions.csv"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Clean a transactions file")
+    parser.add_argument("--input", default="data/sample_transactions.csv",
+                        help="Transactions to clean: a transaction_id,items or transaction_id,item CSV, "
+                             "a FIMI .dat file, .parquet, .arrow or .feather")
+    parser.add_argument("--partitions", type=int, default=None,
+                        help="Group a long-format CSV whose rows are not ordered by transaction "
+                             "through this many temporary partitions")
+    parser.add_argument("--output", default="data/cleaned_transactions.csv",
+                        help="Where to write the cleaned transactions; the suffix picks the format")
+    args = parser.parse_args()
+
     products_path = "data/products.csv"
 
-    df = load_transactions(transactions_path)
+    # The input is streamed chunk by chunk and cleaned chunks are written out
+    # as they come back from the workers
+    chunks = iter_transaction_chunks(args.input, chunk_rows=PREPROCESS_CHUNK_SIZE, partitions=args.partitions)
 
     products = load_products_set(products_path)
+    workers, chunks = stream_workers(chunks)
+
+    partial_stats = []
+    def cleaned_chunks():
+        for cleaned, partial in preprocess_in_chunks(chunks, products, workers=workers, chunked=True):
+            partial_stats.append(partial)
+            yield cleaned
 
-    transactions, stats = preprocess_transactions(df, products)
+    save_transactions(cleaned_chunks(), args.output, chunked=True)
+    stats = merge_stats(partial_stats)
 
     print("Preprocessing Report:\n" \
     "----------------------\n" \
@@ -116,7 +421,5 @@ def main():
     f"- Total items: {stats['total_items']}\n" \
     f"- Unique products: {stats['uniques']}\n")
 
-    save_to_csv(transactions, "data/cleaned_transactions.csv")
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,209 @@
+import argparse
+import csv
+import math
+import random
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+products_path = project_root / "data" / "products.csv"
+
+# Load product names from the catalog, in catalog order
+def load_product_names(csv_path=products_path):
+    df = pd.read_csv(csv_path)
+
+    return list(dict.fromkeys(df['product_name'].str.strip().str.lower()))
+
+# Build a catalog of num_items product names. Real products are used first,
+# generated names ("item_00031", ...) fill the rest.
+def build_catalog(num_items, base_names=None):
+    if base_names is None:
+        base_names = []
+
+    catalog = list(base_names[:num_items])
+    width = max(5, len(str(num_items)))
+
+    i = len(catalog) + 1
+    while len(catalog) < num_items:
+        name = f"item_{i:0{width}d}"
+        if name not in base_names:
+            catalog.append(name)
+        i += 1
+
+    return catalog
+
+# Draw from a Poisson distribution (Knuth for small means, normal approximation otherwise)
+def poisson(rng, mean):
+    if mean <= 0:
+        return 0
+
+    if mean > 30:
+        return max(0, int(round(rng.gauss(mean, math.sqrt(mean)))))
+
+    limit = math.exp(-mean)
+    k = 0
+    p = rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+
+    return k
+
+# Generate the pool of potentially large itemsets (IBM Quest "patterns").
+# Each pattern reuses an exponentially distributed fraction of the previous one
+# (controlled by correlation), gets an exponential weight and a corruption level.
+def generate_patterns(rng, num_items, num_patterns, avg_pattern_length, correlation=0.5, corruption=0.5):
+    patterns = []
+    previous = []
+
+    for _ in range(num_patterns):
+        size = min(num_items, max(1, poisson(rng, avg_pattern_length - 1) + 1))
+
+        items = []
+        if previous:
+            fraction = min(1.0, rng.expovariate(1 / correlation)) if correlation > 0 else 0.0
+            reused = min(len(previous), int(round(fraction * size)))
+            items.extend(rng.sample(previous, reused))
+
+        chosen = set(items)
+        while len(items) < size:
+            item = rng.randrange(num_items)
+            if item not in chosen:
+                chosen.add(item)
+                items.append(item)
+
+        patterns.append({
+            'items': items,
+            'weight': rng.expovariate(1.0),
+            'corruption': min(1.0, max(0.0, rng.gauss(corruption, 0.1)))
+        })
+        previous = items
+
+    total_weight = sum(p['weight'] for p in patterns)
+    for p in patterns:
+        p['weight'] /= total_weight
+
+    return patterns
+
+# Generate synthetic transactions one at a time, in the same
+# {'transaction_id', 'items'} shape that load_transactions returns
+def generate_transactions(num_transactions, avg_basket_length=10, num_items=1000,
+                          avg_pattern_length=4, num_patterns=None, correlation=0.5,
+                          corruption=0.5, catalog=None, seed=0):
+    rng = random.Random(seed)
+
+    if catalog is None:
+        catalog = build_catalog(num_items, load_product_names())
+    num_items = len(catalog)
+
+    if num_patterns is None:
+        num_patterns = max(1, num_items // 5)
+
+    patterns = generate_patterns(rng, num_items, num_patterns, avg_pattern_length, correlation, corruption)
+    weights = [p['weight'] for p in patterns]
+
+    # A pattern that did not fit in the previous basket is carried over to the next one
+    carried = None
+
+    for tid in range(1, num_transactions + 1):
+        size = min(num_items, max(1, poisson(rng, avg_basket_length)))
+        basket = []
+        chosen = set()
+        misses = 0
+
+        # Give up on filling the basket if the patterns keep adding nothing new
+        while len(basket) < size and misses < 10 * size:
+            if carried is not None:
+                pattern, carried = carried, None
+            else:
+                pattern = patterns[rng.choices(range(len(patterns)), weights)[0]]
+
+            # Corrupt the pattern by dropping items while a coin toss says so
+            items = list(pattern['items'])
+            while items and rng.random() < pattern['corruption']:
+                items.pop(rng.randrange(len(items)))
+
+            new_items = [item for item in items if item not in chosen]
+            if not new_items:
+                misses += 1
+                continue
+
+            # Half of the time an oversized pattern is deferred, otherwise added anyway
+            if len(basket) + len(new_items) > size and basket and rng.random() < 0.5:
+                carried = pattern
+                break
+
+            basket.extend(new_items)
+            chosen.update(new_items)
+
+        yield {'transaction_id': tid, 'items': [catalog[item] for item in basket]}
+
+# Write transactions to a transaction_id,items CSV without holding them in memory
+def write_transactions_csv(transactions, path):
+    count = 0
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['transaction_id', 'items'])
+
+        for transaction in transactions:
+            writer.writerow([transaction['transaction_id'], ",".join(transaction['items'])])
+            count += 1
+
+    return count
+
+# Name a dataset the way the Quest family does, e.g. T10I4D100K
+def dataset_name(num_transactions, avg_basket_length, avg_pattern_length):
+    if num_transactions >= 1000 and num_transactions % 1000 == 0:
+        size = f"{num_transactions // 1000}K"
+    else:
+        size = str(num_transactions)
+
+    return f"T{avg_basket_length:g}I{avg_pattern_length:g}D{size}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate IBM Quest-style synthetic transactions")
+    parser.add_argument("--transactions", "-D", type=int, default=100000)
+    parser.add_argument("--basket-length", "-T", type=float, default=10)
+    parser.add_argument("--items", "-N", type=int, default=1000)
+    parser.add_argument("--pattern-length", "-I", type=float, default=4)
+    parser.add_argument("--patterns", "-L", type=int, default=None)
+    parser.add_argument("--correlation", type=float, default=0.5)
+    parser.add_argument("--corruption", type=float, default=0.5)
+    parser.add_argument("--catalog-only", action="store_true",
+                        help="Only use products.csv names (caps --items at the catalog size)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", default=None)
+    args = parser.parse_args()
+
+    base_names = load_product_names()
+    num_items = min(args.items, len(base_names)) if args.catalog_only else args.items
+    catalog = build_catalog(num_items, base_names)
+
+    output = args.output
+    if output is None:
+        name = dataset_name(args.transactions, args.basket_length, args.pattern_length)
+        output = project_root / "data" / f"{name}.csv"
+
+    transactions = generate_transactions(
+        args.transactions,
+        avg_basket_length=args.basket_length,
+        avg_pattern_length=args.pattern_length,
+        num_patterns=args.patterns,
+        correlation=args.correlation,
+        corruption=args.corruption,
+        catalog=catalog,
+        seed=args.seed
+    )
+
+    count = write_transactions_csv(transactions, output)
+    print(f"Wrote {count} transactions over {len(catalog)} items to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+try:
+    from .transaction_store import TransactionStore
+except ImportError:
+    # Run as a script (python src/preprocessing/preprocessing_utils.py)
+    from transaction_store import TransactionStore
+
+# Binary transaction files: a transaction_id column and an items column of
+# type list<dictionary<int32, string>>, i.e. every basket is a list of indices
+# into one table of item names. Unlike the comma-joined CSV, nothing has to be
+# re-split on load: the indices are exactly a TransactionStore's item ids.
+#
+# Arrow IPC (.arrow / .feather) files are written uncompressed so they can be
+# memory-mapped and loaded without copying the item ids. Parquet files are
+# smaller but are decoded on load.
+
+ARROW_SUFFIXES = ('.arrow', '.feather')
+PARQUET_SUFFIXES = ('.parquet',)
+BINARY_SUFFIXES = ARROW_SUFFIXES + PARQUET_SUFFIXES
+# FIMI basket files: one transaction per line, items separated by whitespace
+FIMI_SUFFIXES = ('.dat',)
+
+# Bytes of text parsed per chunk by the streaming readers
+STREAM_BLOCK_BYTES = 16 * 1024 * 1024
+# Transactions per chunk for files that are already columnar
+STREAM_CHUNK_ROWS = 200000
+
+
+def is_binary_path(path):
+    return Path(str(path)).suffix.lower() in BINARY_SUFFIXES
+
+# Arrow table for a TransactionStore or a list of {'transaction_id', 'items'} dicts.
+# A store's arrays are wrapped as they are, without re-encoding the items.
+def transactions_to_table(transactions):
+    store = transactions if hasattr(transactions, 'offsets') else TransactionStore.from_transactions(transactions)
+
+    offsets = store.offsets
+    # 32-bit list offsets unless the dataset has more than 2^31 items
+    list_type = pa.LargeListArray if store.total_items >= 2 ** 31 else pa.ListArray
+    offsets = offsets if list_type is pa.LargeListArray else offsets.astype(np.int32)
+
+    items = pa.DictionaryArray.from_arrays(pa.array(store.items, pa.int32()), pa.array(store.vocabulary, pa.string()))
+
+    return pa.table({
+        'transaction_id': pa.array(store.tids.tolist() if store.tids.dtype == object else store.tids),
+        'items': list_type.from_arrays(pa.array(offsets), items)
+    })
+
+# Write transactions to path in the format given by its suffix. With chunked=True,
+# transactions is an iterable of transaction lists (like save_to_csv): Parquet
+# writes one row group per chunk, Arrow IPC collects the chunks into one store
+# first so the file keeps a single dictionary.
+def write_transactions(transactions, path, chunked=False):
+    suffix = Path(str(path)).suffix.lower()
+    if suffix not in BINARY_SUFFIXES:
+        raise ValueError(f"Unsupported transaction file type '{suffix}', expected one of {', '.join(BINARY_SUFFIXES)}")
+
+    if suffix in PARQUET_SUFFIXES:
+        chunks = transactions if chunked else [transactions]
+        writer = None
+        try:
+            for chunk in chunks:
+                table = transactions_to_table(chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(str(path), table.schema)
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            pq.write_table(transactions_to_table([]), str(path))
+        return
+
+    if chunked:
+        store = TransactionStore()
+        for chunk in transactions:
+            store.extend(chunk)
+        transactions = store
+
+    feather.write_feather(transactions_to_table(transactions), str(path), compression='uncompressed')
+
+# Parquet file contents for transactions, e.g. for a download button
+def parquet_bytes(transactions):
+    sink = pa.BufferOutputStream()
+    pq.write_table(transactions_to_table(transactions), sink)
+
+    return sink.getvalue().to_pybytes()
+
+# Read a binary transaction file into an Arrow table. source is a path, which
+# Arrow IPC files are memory-mapped from, or a file object (e.g. an upload),
+# whose format is then given by suffix.
+def read_transactions_table(source, suffix=None):
+    if suffix is None:
+        suffix = Path(str(source)).suffix
+    suffix = suffix.lower()
+
+    if isinstance(source, (str, Path)):
+        if suffix in PARQUET_SUFFIXES:
+            table = pq.read_table(str(source), memory_map=True)
+        elif suffix in ARROW_SUFFIXES:
+            table = pa.ipc.open_file(pa.memory_map(str(source))).read_all()
+        else:
+            raise ValueError(f"Unsupported transaction file type '{suffix}'")
+    else:
+        buffer = pa.py_buffer(source.getvalue() if hasattr(source, 'getvalue') else source.read())
+        if suffix in PARQUET_SUFFIXES:
+            table = pq.read_table(pa.BufferReader(buffer))
+        elif suffix in ARROW_SUFFIXES:
+            table = pa.ipc.open_file(buffer).read_all()
+        else:
+            raise ValueError(f"Unsupported transaction file type '{suffix}'")
+
+    _check_columns(table.column_names)
+
+    return table
+
+def _check_columns(names):
+    if 'transaction_id' not in names or 'items' not in names:
+        raise ValueError("Invalid transaction file! File must contain 'transaction_id' and 'items' columns.")
+
+# TransactionStore over an Arrow table's columns. With a single dictionary
+# (any Arrow IPC file this module wrote) the store's item ids are the file's
+# dictionary indices themselves: zero-copy from a memory-mapped file.
+def store_from_table(table, source='imported'):
+    items = table.column('items')
+    tids = table.column('transaction_id')
+
+    store = None
+    for tid_chunk, item_chunk in zip(tids.chunks, items.chunks):
+        tid_chunk = tid_chunk.to_numpy(zero_copy_only=False)
+        if item_chunk.null_count:
+            item_chunk = item_chunk.fill_null(pa.scalar([], item_chunk.type))
+
+        offsets = item_chunk.offsets.to_numpy()
+        values = item_chunk.values.slice(offsets[0], offsets[-1] - offsets[0])
+        offsets = offsets - offsets[0]
+        if not pa.types.is_dictionary(values.type):
+            values = values.dictionary_encode()
+
+        vocabulary = values.dictionary.to_pylist()
+        item_ids = values.indices.to_numpy(zero_copy_only=False)
+
+        if store is None:
+            store = TransactionStore.from_encoded(vocabulary, tid_chunk, offsets, item_ids, source)
+        else:
+            store.extend_from_encoded(vocabulary, tid_chunk, offsets, item_ids, source)
+
+    return store if store is not None else TransactionStore()
+
+# Load a binary transaction file as a TransactionStore
+def read_transactions(path, source='imported'):
+    return store_from_table(read_transactions_table(path), source)
+
+# DataFrame like read_transactions_csv returns, with Arrow-backed columns
+def table_to_dataframe(table):
+    return table.select(['transaction_id', 'items']).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+# Streaming readers. Each yields the file as a sequence of TransactionStore
+# chunks, parsing STREAM_BLOCK_BYTES of text at a time with Arrow's CSV
+# reader, so the whole text is never held in memory.
+
+# 'wide' (transaction_id,items), 'long' (transaction_id,item per row) or
+# 'fimi' (.dat), judged from the suffix and the CSV header
+def file_layout(path):
+    suffix = Path(str(path)).suffix.lower()
+    if suffix in FIMI_SUFFIXES:
+        return 'fimi'
+    if suffix in BINARY_SUFFIXES:
+        return suffix.lstrip('.')
+
+    with open(path, newline='') as f:
+        header = [column.strip() for column in f.readline().split(',')]
+
+    if 'item' in header and 'items' not in header:
+        return 'long'
+
+    return 'wide'
+
+def _lines_reader(path, block_bytes):
+    return pa_csv.open_csv(
+        str(path),
+        read_options=pa_csv.ReadOptions(column_names=['line'], block_size=block_bytes),
+        # A delimiter that never occurs: every line is one field
+        parse_options=pa_csv.ParseOptions(delimiter='\x1f', quote_char=False, ignore_empty_lines=False),
+        convert_options=pa_csv.ConvertOptions(column_types={'line': pa.string()}, strings_can_be_null=False)
+    )
+
+# TransactionStore chunks of a FIMI .dat file. Transaction ids are line
+# numbers starting at 1; an empty line is a transaction without items.
+def iter_fimi_chunks(path, block_bytes=STREAM_BLOCK_BYTES, source='imported'):
+    first_tid = 1
+    for batch in _lines_reader(path, block_bytes):
+        if batch.num_rows == 0:
+            continue
+
+        item_lists = pc.utf8_split_whitespace(pc.utf8_trim_whitespace(batch.column(0)))
+        lengths = pc.list_value_length(item_lists).to_numpy()
+        values = item_lists.flatten()
+
+        # Splitting an empty line gives one empty string
+        keep = pc.not_equal(values, '').to_numpy(zero_copy_only=False)
+        lengths = np.bincount(np.repeat(np.arange(len(lengths)), lengths)[keep], minlength=len(lengths))
+        encoded = pc.dictionary_encode(values.filter(keep))
+
+        tids = np.arange(first_tid, first_tid + batch.num_rows, dtype=np.int64)
+        first_tid += batch.num_rows
+
+        yield TransactionStore.from_encoded(
+            encoded.dictionary.to_pylist(), tids, np.concatenate(([0], np.cumsum(lengths))),
+            encoded.indices.to_numpy(), source
+        )
+
+def _long_reader(path, block_bytes):
+    return pa_csv.open_csv(
+        str(path),
+        read_options=pa_csv.ReadOptions(block_size=block_bytes),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=['transaction_id', 'item'],
+            column_types={'item': pa.string()}
+        )
+    )
+
+# TransactionStore over rows whose transaction ids are grouped together;
+# rows without an item keep their transaction but add no item
+def _group_rows(tids, items, source):
+    tids = np.asarray(tids)
+    if isinstance(items, pa.ChunkedArray):
+        items = items.combine_chunks()
+    starts = np.concatenate(([0], np.flatnonzero(tids[1:] != tids[:-1]) + 1))
+
+    items = pc.utf8_trim_whitespace(items)
+    keep = pc.fill_null(pc.not_equal(items, ''), False).to_numpy(zero_copy_only=False)
+    lengths = np.add.reduceat(keep.astype(np.int64), starts) if len(tids) else np.empty(0, np.int64)
+    encoded = pc.dictionary_encode(items.filter(keep))
+
+    return TransactionStore.from_encoded(
+        encoded.dictionary.to_pylist(), tids[starts], np.concatenate(([0], np.cumsum(lengths))),
+        encoded.indices.to_numpy(), source
+    )
+
+# Transaction ids already yielded by iter_long_chunks, to catch one that
+# comes back in a later block. Integer ids are kept as sorted arrays, merged
+# only when a block does not continue above the largest id so far (an export
+# ordered by id never merges); other ids go in a set.
+class _EmittedIds:
+
+    def __init__(self):
+        self._sorted = []
+        self._max = None
+        self._others = set()
+
+    # Those of ids that were already added
+    def repeated(self, ids):
+        if ids.dtype.kind not in 'iu':
+            return [tid for tid in ids if tid in self._others]
+        if self._max is None or (len(ids) and ids.min() > self._max):
+            return []
+
+        if len(self._sorted) > 1:
+            self._sorted = [np.concatenate(self._sorted)]
+        at = np.minimum(np.searchsorted(self._sorted[0], ids), len(self._sorted[0]) - 1)
+        return ids[self._sorted[0][at] == ids].tolist()
+
+    def add(self, ids):
+        if ids.dtype.kind not in 'iu':
+            self._others.update(ids.tolist())
+            return
+        if not len(ids):
+            return
+
+        ids = np.sort(ids.astype(np.int64))
+        if self._max is not None and ids[0] <= self._max:
+            ids = np.sort(np.concatenate(self._sorted + [ids]))
+            self._sorted = []
+        self._sorted.append(ids)
+        self._max = int(ids[-1])
+
+
+# TransactionStore chunks of a long-format CSV (transaction_id,item per row).
+#
+# By default the rows of a transaction must be adjacent, as in an export
+# ordered by transaction: each block is grouped on its own and the last,
+# possibly unfinished transaction is carried into the next block, so memory
+# holds one block and the ids yielded so far. A transaction id that comes
+# back after other ids, in the same block or a later one, raises ValueError.
+#
+# For files in any order pass partitions=N: rows are first spilled to N
+# temporary Arrow files by a hash of their transaction id, then each
+# partition (about 1/N of the file) is grouped in memory. Transactions then
+# come out partition by partition, in order of first appearance within each.
+def iter_long_chunks(path, block_bytes=STREAM_BLOCK_BYTES, partitions=None, source='imported'):
+    if partitions:
+        yield from _iter_long_partitioned(path, block_bytes, partitions, source)
+        return
+
+    carry = None
+    emitted = _EmittedIds()
+    for batch in _long_reader(path, block_bytes):
+        if batch.num_rows == 0:
+            continue
+        if carry is not None:
+            batch = pa.concat_tables([carry, pa.Table.from_batches([batch])]).combine_chunks().to_batches()[0]
+
+        tids = batch.column('transaction_id').to_numpy(zero_copy_only=False)
+        boundaries = np.flatnonzero(tids[1:] != tids[:-1]) + 1
+        block_ids = tids[np.concatenate(([0], boundaries))]
+        if len(pd.unique(block_ids)) != len(block_ids) or emitted.repeated(block_ids):
+            raise ValueError(
+                f"Rows of a transaction in {path} are not adjacent; "
+                "read it with partitions=N to group them in any order")
+
+        # Keep the last transaction open, it may continue in the next block
+        split = boundaries[-1] if len(boundaries) else 0
+        carry = pa.Table.from_batches([batch.slice(split)])
+        if split:
+            complete = batch.slice(0, split)
+            emitted.add(block_ids[:-1])
+            yield _group_rows(tids[:split], complete.column('item'), source)
+
+    if carry is not None and carry.num_rows:
+        carry = carry.combine_chunks()
+        yield _group_rows(carry.column('transaction_id').to_numpy(), carry.column('item').combine_chunks(), source)
+
+def _partition_of(tids, partitions):
+    if tids.dtype.kind in 'iu':
+        return np.mod(tids, partitions)
+
+    return pd.util.hash_array(tids.astype(object)) % partitions
+
+def _iter_long_partitioned(path, block_bytes, partitions, source):
+    with tempfile.TemporaryDirectory(prefix="long-format-") as spill_dir:
+        writers = {}
+        try:
+            for batch in _long_reader(path, block_bytes):
+                parts = _partition_of(batch.column('transaction_id').to_numpy(zero_copy_only=False), partitions)
+                for part in np.unique(parts):
+                    rows = batch.filter(pa.array(parts == part))
+                    if part not in writers:
+                        writers[part] = pa.ipc.new_file(f"{spill_dir}/{part}.arrow", rows.schema)
+                    writers[part].write_batch(rows)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        for part in sorted(writers):
+            table = pa.ipc.open_file(pa.memory_map(f"{spill_dir}/{part}.arrow")).read_all().combine_chunks()
+            tids = table.column('transaction_id').to_numpy()
+
+            # Stable sort by order of first appearance makes every transaction's rows adjacent
+            codes, _ = pd.factorize(tids)
+            order = np.argsort(codes, kind='stable')
+            yield _group_rows(tids[order], table.column('item').take(pa.array(order)), source)
+
+# TransactionStore chunks of a wide transaction_id,items CSV, parsed like read_transactions_csv
+def iter_wide_chunks(path, block_bytes=STREAM_BLOCK_BYTES, source='imported'):
+    reader = pa_csv.open_csv(
+        str(path),
+        read_options=pa_csv.ReadOptions(block_size=block_bytes),
+        convert_options=pa_csv.ConvertOptions(include_columns=['transaction_id', 'items'],
+                                              column_types={'items': pa.string()})
+    )
+    for batch in reader:
+        items = pc.fill_null(batch.column('items'), '')
+        item_lists = pc.split_pattern(pc.utf8_trim_whitespace(pc.replace_substring_regex(items, r'\s*,\s*', ',')), ',')
+
+        store = TransactionStore()
+        store.extend_from_arrow(batch.column('transaction_id').to_numpy(zero_copy_only=False), item_lists, source)
+        yield store
+
+# TransactionStore chunks of any supported transaction file: wide or long CSV,
+# FIMI .dat, Parquet or Arrow. Only one chunk is in memory at a time (for
+# unordered long-format files pass partitions, see iter_long_chunks).
+def iter_transaction_chunks(path, block_bytes=STREAM_BLOCK_BYTES, chunk_rows=STREAM_CHUNK_ROWS, partitions=None,
+                            source='imported'):
+    layout = file_layout(path)
+
+    if layout == 'fimi':
+        yield from iter_fimi_chunks(path, block_bytes, source)
+    elif layout == 'long':
+        yield from iter_long_chunks(path, block_bytes, partitions, source)
+    elif layout == 'wide':
+        yield from iter_wide_chunks(path, block_bytes, source)
+    elif layout == 'parquet':
+        parquet_file = pq.ParquetFile(str(path))
+        _check_columns(parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+            yield store_from_table(pa.Table.from_batches([batch]), source)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        _check_columns(reader.schema.names)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunk_rows):
+                yield store_from_table(pa.Table.from_batches([batch.slice(start, chunk_rows)]), source)
+
+# Whole file as one TransactionStore, built chunk by chunk
+def read_transaction_chunks(path, **options):
+    store = TransactionStore()
+    for chunk in iter_transaction_chunks(path, **options):
+        store.extend(chunk)
+
+    return store
@@ -0,0 +1,484 @@
+import hashlib
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Columnar (CSR) storage for transactions. Instead of one dict and one list of
+# strings per basket, items are kept as ids into a shared vocabulary in one
+# flat array; offsets[i]:offsets[i + 1] are the items of transaction i, and
+# the transaction ids and source tags are parallel arrays. Arrays grow by
+# doubling, so appending a transaction is amortized O(1).
+#
+# Iterating a store (or indexing it with an int) still yields the usual
+# {'transaction_id', 'items'} dicts, so code written for lists of dicts keeps
+# working; code that cares about speed uses the arrays directly.
+
+# Where a transaction came from
+SOURCES = ('manual', 'imported')
+
+_INITIAL_ROWS = 64
+_INITIAL_ITEMS = 512
+
+
+# Array with room for needed entries. Read-only arrays (adopted from a
+# memory-mapped file) are always copied, even when they are large enough.
+def _grow(array, needed, fill=None):
+    if needed <= len(array) and array.flags.writeable:
+        return array
+
+    capacity = max(needed, 2 * len(array))
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    if fill is not None:
+        grown[len(array):] = fill
+
+    return grown
+
+
+# Dataset-wide counters kept up to date by the store on every append and
+# clear, so pages read their metrics in O(1) instead of rescanning the data
+class DatasetAggregates:
+
+    def __init__(self):
+        self.transactions = 0
+        self.total_items = 0
+        self.distinct_items = 0
+        # Occurrences per item id; may be shorter than the vocabulary
+        self.counts = np.zeros(0, dtype=np.int64)
+        # Transactions per source, indexed like SOURCES
+        self.source_counts = np.zeros(len(SOURCES), dtype=np.int64)
+
+    # Count new transactions: the item ids of all of them, and one source index per transaction
+    def add(self, item_ids, sources):
+        item_ids = np.asarray(item_ids)
+        self.transactions += len(sources)
+        self.total_items += len(item_ids)
+        self.source_counts += np.bincount(sources, minlength=len(SOURCES))
+        if not len(item_ids):
+            return
+
+        if len(item_ids) > 4096:
+            # Bulk imports: one counting pass
+            counts = np.bincount(item_ids)
+            ids = np.flatnonzero(counts)
+            counts = counts[ids]
+        else:
+            ids, counts = np.unique(item_ids, return_counts=True)
+        self.counts = _grow(self.counts, int(ids[-1]) + 1, fill=0)
+
+        self.distinct_items += int(np.count_nonzero(self.counts[ids] == 0))
+        self.counts[ids] += counts
+
+    # Counts for item ids 0 .. size - 1
+    def item_counts(self, size):
+        if len(self.counts) >= size:
+            return self.counts[:size]
+
+        return np.concatenate((self.counts, np.zeros(size - len(self.counts), dtype=np.int64)))
+
+
+class TransactionStore:
+
+    # Inverted index (see item_index) and the version it was built for
+    _index = None
+    _index_version = None
+
+    def __init__(self, vocabulary=None):
+        # Item names by id, and ids by name. Both are append-only and may be
+        # shared with stores sliced from this one.
+        self.vocabulary = [] if vocabulary is None else vocabulary
+        self._item_ids = {item: i for i, item in enumerate(self.vocabulary)}
+
+        self._items = np.empty(_INITIAL_ITEMS, dtype=np.int32)
+        self._offsets = np.zeros(_INITIAL_ROWS + 1, dtype=np.int64)
+        self._tids = np.empty(_INITIAL_ROWS, dtype=np.int64)
+        self._sources = np.empty(_INITIAL_ROWS, dtype=np.int8)
+        self._rows = 0
+        self.aggregates = DatasetAggregates()
+        # Bumped on every change, lets views and callers cache derived data
+        self.version = 0
+
+    # Build a store from {'transaction_id', 'items'} dicts
+    @classmethod
+    def from_transactions(cls, transactions, source='imported'):
+        store = cls()
+        store.extend(transactions, source)
+
+        return store
+
+    # Store over already-encoded arrays (e.g. the columns of a memory-mapped
+    # Arrow file): item_ids index vocabulary and offsets[i]:offsets[i + 1] are
+    # transaction i. int32 item ids are adopted without a copy; the first append
+    # moves them into a growable array.
+    @classmethod
+    def from_encoded(cls, vocabulary, tids, offsets, item_ids, source='imported'):
+        store = cls(list(vocabulary))
+        if len(store._item_ids) != len(store.vocabulary):
+            # Repeated names in the vocabulary: fall back to remapping
+            store = cls()
+            store.extend_from_encoded(vocabulary, tids, offsets, item_ids, source)
+            return store
+
+        rows = len(offsets) - 1
+        offsets = np.asarray(offsets, dtype=np.int64)
+        store._items = np.asarray(item_ids, dtype=np.int32)[offsets[0]:offsets[-1]]
+        store._offsets = offsets - offsets[0]
+        store._tids = np.empty(rows, dtype=np.int64)
+        store._store_tids(0, tids)
+        store._sources = np.full(rows, SOURCES.index(source), dtype=np.int8)
+        store._rows = rows
+        store.aggregates.add(store.items, store._sources)
+
+        return store
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def items(self):
+        return self._items[:self._offsets[self._rows]]
+
+    @property
+    def offsets(self):
+        return self._offsets[:self._rows + 1]
+
+    @property
+    def tids(self):
+        return self._tids[:self._rows]
+
+    @property
+    def sources(self):
+        return self._sources[:self._rows]
+
+    @property
+    def total_items(self):
+        return int(self._offsets[self._rows])
+
+    # Number of distinct items in the transactions
+    @property
+    def distinct_items(self):
+        return self.aggregates.distinct_items
+
+    # Bytes held by the arrays (vocabulary strings not included)
+    @property
+    def nbytes(self):
+        return self.items.nbytes + self.offsets.nbytes + self.tids.nbytes + self.sources.nbytes
+
+    def _item_id(self, item):
+        item_id = self._item_ids.get(item)
+        if item_id is None:
+            item_id = len(self.vocabulary)
+            self.vocabulary.append(item)
+            self._item_ids[item] = item_id
+
+        return item_id
+
+    # Transaction ids are int64 until a non-integer id shows up
+    def _store_tids(self, start, tids):
+        if self._tids.dtype != object:
+            try:
+                self._tids[start:start + len(tids)] = np.asarray(tids, dtype=np.int64)
+                return
+            except (TypeError, ValueError, OverflowError):
+                self._tids = self._tids.astype(object)
+
+        self._tids[start:start + len(tids)] = tids
+
+    def _reserve(self, rows, items):
+        self._offsets = _grow(self._offsets, self._rows + rows + 1)
+        self._tids = _grow(self._tids, self._rows + rows)
+        self._sources = _grow(self._sources, self._rows + rows)
+        self._items = _grow(self._items, self.total_items + items)
+
+    def append(self, transaction_id, items, source='manual'):
+        self._reserve(1, len(items))
+
+        start = self.total_items
+        end = start + len(items)
+        self._items[start:end] = [self._item_id(item) for item in items]
+        self._offsets[self._rows + 1] = end
+        self._store_tids(self._rows, [transaction_id])
+        self._sources[self._rows] = SOURCES.index(source)
+        self.aggregates.add(self._items[start:end], self._sources[self._rows:self._rows + 1])
+        self._rows += 1
+        self.version += 1
+
+    # Bulk append of {'transaction_id', 'items'} dicts
+    def extend(self, transactions, source='imported'):
+        if isinstance(transactions, TransactionStore):
+            return self._extend_from_store(transactions, source)
+
+        tids = [transaction['transaction_id'] for transaction in transactions]
+        item_lists = [transaction['items'] for transaction in transactions]
+
+        self._extend_columns(tids, item_lists, source)
+
+    # Bulk append of a DataFrame with transaction_id and item-list columns
+    # (as returned by read_transactions_csv), without building dicts
+    def extend_from_dataframe(self, df, source='imported'):
+        if isinstance(df['items'].dtype, pd.ArrowDtype):
+            self.extend_from_arrow(df['transaction_id'].to_numpy(), pa.array(df['items']), source)
+        else:
+            self._extend_columns(df['transaction_id'].tolist(), df['items'], source)
+
+    # Bulk append from an Arrow list<string> array: items are dictionary-encoded
+    # in Arrow, so only the distinct item names ever become Python strings
+    def extend_from_arrow(self, tids, item_lists, source='imported'):
+        if isinstance(item_lists, pa.ChunkedArray):
+            # One chunk at a time: the chunks may have different dictionaries
+            start = 0
+            for chunk in item_lists.chunks:
+                self.extend_from_arrow(tids[start:start + len(chunk)], chunk, source)
+                start += len(chunk)
+            return
+
+        lengths = pc.list_value_length(item_lists).fill_null(0).to_numpy()
+        values = item_lists.flatten()
+        # Lists read from a binary transaction file are dictionary-encoded already
+        encoded = values if pa.types.is_dictionary(values.type) else pc.dictionary_encode(values)
+        id_map = np.fromiter((self._item_id(item) for item in encoded.dictionary.to_pylist()), dtype=np.int32,
+                             count=len(encoded.dictionary))
+
+        self._append_rows(tids, lengths, id_map[encoded.indices.to_numpy()], source)
+
+    # Bulk append of already-encoded arrays, see from_encoded()
+    def extend_from_encoded(self, vocabulary, tids, offsets, item_ids, source='imported'):
+        id_map = np.fromiter((self._item_id(item) for item in vocabulary), dtype=np.int32, count=len(vocabulary))
+        offsets = np.asarray(offsets, dtype=np.int64)
+
+        self._append_rows(tids, np.diff(offsets), id_map[np.asarray(item_ids)[offsets[0]:offsets[-1]]], source)
+
+    def _extend_columns(self, tids, item_lists, source):
+        lengths = np.fromiter((len(items) for items in item_lists), dtype=np.int64, count=len(tids))
+        flat = pd.Series(list(chain.from_iterable(item_lists)), dtype=object)
+
+        # Factorize once, then map the distinct names to store ids
+        codes, uniques = pd.factorize(flat)
+        id_map = np.fromiter((self._item_id(item) for item in uniques), dtype=np.int32, count=len(uniques))
+
+        self._append_rows(tids, lengths, id_map[codes] if len(codes) else np.empty(0, np.int32), source)
+
+    def _extend_from_store(self, other, source):
+        id_map = np.fromiter((self._item_id(item) for item in other.vocabulary), dtype=np.int32,
+                             count=len(other.vocabulary))
+        lengths = np.diff(other.offsets)
+
+        self._append_rows(other.tids.tolist(), lengths, id_map[other.items], source)
+
+    def _append_rows(self, tids, lengths, item_ids, source):
+        rows = len(tids)
+        self._reserve(rows, len(item_ids))
+
+        start = self.total_items
+        self._items[start:start + len(item_ids)] = item_ids
+        self._offsets[self._rows + 1:self._rows + rows + 1] = start + np.cumsum(lengths)
+        self._store_tids(self._rows, tids)
+        self._sources[self._rows:self._rows + rows] = SOURCES.index(source)
+        self.aggregates.add(item_ids, self._sources[self._rows:self._rows + rows])
+        self._rows += rows
+        self.version += 1
+
+    # Drop every transaction of a source, or all of them with source=None
+    def clear(self, source=None):
+        if source is None:
+            # The version keeps counting up so that cached data is never mistaken as current
+            version = self.version
+            self.__init__()
+            self.version = version + 1
+            return
+
+        keep = np.flatnonzero(self.sources != SOURCES.index(source))
+        kept = self.take(keep)
+
+        self._items, self._offsets = kept._items, kept._offsets
+        self._tids, self._sources, self._rows = kept._tids, kept._sources, kept._rows
+        self.aggregates = kept.aggregates
+        self.version += 1
+
+    # New compact store holding the given rows; shares this store's vocabulary
+    def take(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self._offsets[rows]
+        lengths = self._offsets[rows + 1] - starts
+
+        # Positions of every selected item in the flat array, row by row
+        positions = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) \
+            + np.arange(lengths.sum())
+
+        taken = TransactionStore.__new__(TransactionStore)
+        taken.vocabulary = self.vocabulary
+        taken._item_ids = self._item_ids
+        taken._items = self._items[positions].astype(np.int32)
+        taken._offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        taken._tids = self._tids[rows]
+        taken._sources = self._sources[rows]
+        taken._rows = len(rows)
+        taken.aggregates = DatasetAggregates()
+        taken.aggregates.add(taken._items, taken._sources)
+        taken.version = 0
+
+        return taken
+
+    # Frozen copy for readers in other threads (e.g. a background mining job)
+    def snapshot(self):
+        return self.take(np.arange(self._rows))
+
+    def _row(self, i):
+        start, end = self._offsets[i], self._offsets[i + 1]
+        tid = self._tids[i]
+
+        return {
+            'transaction_id': tid.item() if isinstance(tid, np.generic) else tid,
+            'items': [self.vocabulary[item_id] for item_id in self._items[start:end].tolist()]
+        }
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(np.arange(self._rows)[key])
+
+        if key < 0:
+            key += self._rows
+        if not 0 <= key < self._rows:
+            raise IndexError("transaction index out of range")
+
+        return self._row(key)
+
+    def __iter__(self):
+        vocabulary = self.vocabulary
+        items = self.items.tolist()
+        offsets = self.offsets.tolist()
+
+        for i, tid in enumerate(self.tids.tolist()):
+            yield {'transaction_id': tid, 'items': [vocabulary[item_id] for item_id in items[offsets[i]:offsets[i + 1]]]}
+
+    # Number of transactions from a source
+    def count(self, source):
+        return int(self.aggregates.source_counts[SOURCES.index(source)])
+
+    # Zero-copy view of the transactions from one source
+    def view(self, source):
+        return TransactionView(self, source)
+
+    # Occurrences of every vocabulary item, indexed by item id (do not modify)
+    def item_counts(self):
+        return self.aggregates.item_counts(len(self.vocabulary))
+
+    # Item -> transactions index in CSR form: rows[starts[i]:starts[i + 1]]
+    # are the rows (ascending) whose transaction contains item id i. Built on
+    # first use and kept until the store changes.
+    def item_index(self):
+        if self._index_version != self.version:
+            lengths = np.diff(self.offsets)
+            # A stable sort keeps every item's rows in ascending order (Arrow's
+            # sort is stable and several times faster than numpy's on int32)
+            order = pc.array_sort_indices(pa.array(self.items)).to_numpy()
+            rows = np.repeat(np.arange(self._rows), lengths)[order]
+            starts = np.concatenate(([0], np.cumsum(self.item_counts())))
+
+            self._index = (starts, rows)
+            self._index_version = self.version
+
+        return self._index
+
+    # Rows with an item whose name contains query (case-insensitive), ascending
+    def rows_with_item(self, query):
+        query = query.lower()
+        starts, rows = self.item_index()
+
+        matches = [rows[starts[i]:starts[i + 1]] for i, item in enumerate(self.vocabulary) if query in str(item).lower()]
+        if not matches:
+            return np.empty(0, dtype=np.int64)
+
+        return np.unique(np.concatenate(matches))
+
+    # Row numbers of the transactions from source (None for all) that have an
+    # item matching query, ordered by sort_by: 'transaction_id', 'item_count',
+    # 'source' or None for insertion order
+    def select(self, source=None, query=None, sort_by=None, descending=False):
+        rows = self.rows_with_item(query) if query else np.arange(self._rows)
+        if source is not None:
+            rows = rows[self._sources[rows] == SOURCES.index(source)]
+
+        if sort_by is not None:
+            keys = {
+                'transaction_id': lambda: self._tids[rows],
+                'item_count': lambda: self._offsets[rows + 1] - self._offsets[rows],
+                'source': lambda: self._sources[rows]
+            }[sort_by]()
+            # Stable on the key's rank (negated to descend), so equal keys keep
+            # insertion order either way; ranks also work for string ids
+            ranks = np.unique(keys, return_inverse=True)[1].reshape(-1)
+            order = np.argsort(-ranks if descending else ranks, kind='stable')
+            rows = rows[order]
+
+        return rows
+
+    # Transaction ids, item lists and source names as a DataFrame
+    def to_dataframe(self):
+        vocabulary = np.array(self.vocabulary, dtype=object)
+        names = vocabulary[self.items] if len(self.vocabulary) else np.empty(0, dtype=object)
+
+        return pd.DataFrame({
+            'transaction_id': self.tids,
+            'items': np.split(names, self.offsets[1:-1]) if self._rows else [],
+            'source': np.array(SOURCES, dtype=object)[self.sources]
+        })
+
+    # Hand-off to the miners: (vocabulary, transactions with item ids), the
+    # same shape as encoding.encode_transactions but without a name lookup per item
+    def encoded(self):
+        items = self.items.tolist()
+        offsets = self.offsets.tolist()
+
+        return list(self.vocabulary), [
+            {'transaction_id': tid, 'items': items[offsets[i]:offsets[i + 1]]}
+            for i, tid in enumerate(self.tids.tolist())
+        ]
+
+    # Content hash of the vocabulary and the arrays: equal for stores that
+    # received the same baskets in the same order
+    def fingerprint(self):
+        digest = hashlib.sha1()
+
+        for item in self.vocabulary:
+            digest.update(str(item).encode())
+            digest.update(b"\x1f")
+        digest.update(self.items.tobytes())
+        digest.update(self.offsets.tobytes())
+
+        return digest.hexdigest()
+
+
+# The transactions of one source, read straight from the store's arrays
+class TransactionView:
+
+    def __init__(self, store, source):
+        self.store = store
+        self.source = source
+        self._version = None
+        self._rows = None
+
+    # Row numbers of this source in the store, recomputed when the store changes
+    @property
+    def rows(self):
+        if self._version != self.store.version:
+            self._rows = np.flatnonzero(self.store.sources == SOURCES.index(self.source))
+            self._version = self.store.version
+
+        return self._rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.store.take(self.rows[key])
+
+        return self.store._row(self.rows[key])
+
+    def __iter__(self):
+        for row in self.rows.tolist():
+            yield self.store._row(row)
@@ -0,0 +1,371 @@
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import combinations
+from urllib.parse import parse_qs, urlsplit
+
+from .algorithms.association_rules import load_rules
+
+# Recommendation service over a persisted rule set (see
+# association_rules.save_rules), for POS kiosks and other clients that need
+# answers in a few milliseconds without the Streamlit app:
+#
+#   GET  /recommend?items=milk,bread&k=5   recommendations for one cart
+#   POST /recommend/batch                  {"carts": [["milk", "bread"], ...], "k": 5}
+#   GET  /stats                            rule set info and latency percentiles
+#   GET  /health
+#
+# Rules are indexed by antecedent, so a cart is answered by looking up its
+# subsets instead of scanning every rule. The rules file is polled and, when a
+# new rule set is published, a fresh index is built beside the live one and
+# swapped in with one reference assignment: requests in flight finish on the
+# index they started with.
+
+DEFAULT_PORT = 8765
+DEFAULT_TOP_K = 5
+# Seconds between two checks of the rules file
+DEFAULT_POLL_INTERVAL_S = 2.0
+# Request times kept per endpoint for the percentiles
+LATENCY_WINDOW = 10000
+# Carts with more antecedent-sized subsets than this are matched through the
+# item -> antecedents index instead of subset lookups
+SUBSET_LOOKUP_LIMIT = 16384
+MAX_BODY_BYTES = 1024 * 1024
+
+
+# Items as preprocessing stores them (lowercase, trimmed)
+def normalize_items(items):
+    return {item.strip().lower() for item in items if item.strip()}
+
+
+class RuleIndex:
+
+    def __init__(self, rules, metadata=None):
+        # antecedent -> [(-confidence, -lift, item, support, antecedent items), ...],
+        # best first, one entry per item of a rule's consequent
+        self.by_antecedent = {}
+        # smallest item of an antecedent -> antecedents, so each antecedent is
+        # listed under exactly one item
+        self.by_item = {}
+        self.max_antecedent = 0
+        self.num_rules = len(rules)
+        self.metadata = metadata or {}
+        self.loaded_at = time.time()
+
+        for rule in rules:
+            antecedent = frozenset(rule['antecedent'])
+            entries = self.by_antecedent.get(antecedent)
+            if entries is None:
+                entries = self.by_antecedent[antecedent] = []
+                self.by_item.setdefault(min(antecedent), []).append(antecedent)
+            for item in rule['consequent']:
+                entries.append((-rule['confidence'], -rule['lift'], item, rule['support'], tuple(sorted(antecedent))))
+            self.max_antecedent = max(self.max_antecedent, len(antecedent))
+
+        for entries in self.by_antecedent.values():
+            entries.sort()
+
+    # Antecedents of the index contained in cart
+    def matching_antecedents(self, cart):
+        sizes = range(1, min(self.max_antecedent, len(cart)) + 1)
+
+        if sum(math.comb(len(cart), size) for size in sizes) <= SUBSET_LOOKUP_LIMIT:
+            items = sorted(cart)
+            for size in sizes:
+                for subset in combinations(items, size):
+                    antecedent = frozenset(subset)
+                    if antecedent in self.by_antecedent:
+                        yield antecedent
+            return
+
+        for item in cart:
+            for antecedent in self.by_item.get(item, ()):
+                if antecedent <= cart:
+                    yield antecedent
+
+    # Top k items not in the cart, each scored by the most confident rule
+    # that fires on the cart and recommends it (ties broken by lift). The
+    # matching antecedents' entries are merged best first, so the search stops
+    # after k distinct items instead of visiting every rule that fires.
+    def recommend(self, cart, k=DEFAULT_TOP_K):
+        merged = heapq.merge(*(self.by_antecedent[antecedent] for antecedent in self.matching_antecedents(cart)))
+
+        recommendations = []
+        seen = set(cart)
+        for confidence, lift, item, support, antecedent in merged:
+            if item in seen:
+                continue
+            seen.add(item)
+            recommendations.append({
+                'item': item,
+                'confidence': -confidence,
+                'lift': -lift,
+                'support': support,
+                'because': list(antecedent)
+            })
+            if len(recommendations) == k:
+                break
+
+        return recommendations
+
+
+# Sliding window of request times per endpoint
+class LatencyRecorder:
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, elapsed_ms):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(elapsed_ms)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+
+    # {endpoint: {'count', 'p50', 'p90', 'p99', 'max'}} in milliseconds, over the window
+    def percentiles(self):
+        with self._lock:
+            snapshot = {endpoint: sorted(samples) for endpoint, samples in self._samples.items()}
+            counts = dict(self._counts)
+
+        summary = {}
+        for endpoint, samples in snapshot.items():
+            # Nearest-rank percentile
+            def rank(p):
+                return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+            summary[endpoint] = {
+                'count': counts[endpoint],
+                'p50': rank(50),
+                'p90': rank(90),
+                'p99': rank(99),
+                'max': samples[-1]
+            }
+
+        return summary
+
+
+class RecommendationService:
+
+    def __init__(self, rules_path, poll_interval_s=DEFAULT_POLL_INTERVAL_S):
+        self.rules_path = rules_path
+        self.poll_interval_s = poll_interval_s
+        self.latency = LatencyRecorder()
+        self.index = None
+        self.reloads = 0
+        self.last_error = None
+        self._stamp = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+        if not self.reload():
+            raise ValueError(f"Could not load rules from {rules_path}: {self.last_error}")
+
+    # Identity of the rules file's current content: publishing renames a new
+    # file over it, which changes the inode
+    def _file_stamp(self):
+        stat = os.stat(self.rules_path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    # Load the rules file if it changed since the last load. A file that cannot
+    # be read leaves the current index serving. Returns whether an index is loaded.
+    def reload(self):
+        with self._reload_lock:
+            try:
+                stamp = self._file_stamp()
+                if stamp != self._stamp:
+                    rules, metadata = load_rules(self.rules_path)
+                    index = RuleIndex(rules, metadata)
+                    # The swap: new requests see the new index from here on
+                    self.index = index
+                    self._stamp = stamp
+                    self.reloads += 1
+                self.last_error = None
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+
+        return self.index is not None
+
+    def start_watching(self):
+        def watch():
+            while not self._stop.wait(self.poll_interval_s):
+                self.reload()
+
+        self._watcher = threading.Thread(target=watch, name="rules-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def recommend(self, items, k=DEFAULT_TOP_K):
+        return self.index.recommend(normalize_items(items), k)
+
+    def recommend_batch(self, carts, k=DEFAULT_TOP_K):
+        # One index for the whole batch, even if a reload lands meanwhile
+        index = self.index
+        return [index.recommend(normalize_items(cart), k) for cart in carts]
+
+    def stats(self):
+        index = self.index
+
+        return {
+            'rules_path': self.rules_path,
+            'num_rules': index.num_rules,
+            'antecedents': len(index.by_antecedent),
+            'loaded_at': index.loaded_at,
+            'reloads': self.reloads,
+            'last_reload_error': self.last_error,
+            'metadata': index.metadata,
+            'latency_ms': self.latency.percentiles()
+        }
+
+
+class RequestError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RecommendationHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a kiosk reuses its connection between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle's algorithm the
+    # body would wait for the client's delayed ACK (~40 ms) on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def _handle(self, route):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+
+        try:
+            status, body = 200, route(url)
+        except RequestError as e:
+            status, body = e.status, {'error': str(e)}
+        except Exception as e:
+            self.log_error("%s", f"{type(e).__name__}: {e}")
+            status, body = 500, {'error': "Internal error"}
+
+        self._send(status, body)
+        self.service.latency.record(url.path, (time.perf_counter() - start) * 1000)
+
+    def _get(self, url):
+        query = parse_qs(url.query)
+
+        if url.path == '/recommend':
+            items = [item for value in query.get('items', []) for item in value.split(',')]
+            if not items:
+                raise RequestError(400, "Pass the cart as ?items=milk,bread")
+            return {'items': sorted(normalize_items(items)),
+                    'recommendations': self.service.recommend(items, _top_k(query.get('k', [None])[0]))}
+        if url.path == '/stats':
+            return self.service.stats()
+        if url.path == '/health':
+            return {'status': 'ok', 'num_rules': self.service.index.num_rules}
+
+        raise RequestError(404, f"Unknown endpoint {url.path}")
+
+    # Errors raised before the body is read leave it in the stream, where it
+    # would be parsed as the next request, so they close the connection
+    def _post(self, url):
+        if url.path != '/recommend/batch':
+            self.close_connection = True
+            raise RequestError(404, f"Unknown endpoint {url.path}")
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise RequestError(400, "Content-Length must be a non-negative integer")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise RequestError(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            carts = request['carts']
+            if not isinstance(carts, list) or not all(
+                    isinstance(cart, list) and all(isinstance(item, str) for item in cart) for cart in carts):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            raise RequestError(400, 'Expected a JSON body like {"carts": [["milk", "bread"]], "k": 5}')
+
+        return {'results': [{'recommendations': recommendations}
+                            for recommendations in self.service.recommend_batch(carts, _top_k(request.get('k')))]}
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    # Request lines would cost more than the answers; only errors are logged
+    def log_request(self, code='-', size='-'):
+        if isinstance(code, int) and code >= 500:
+            super().log_request(code, size)
+
+
+def _top_k(value):
+    if value is None:
+        return DEFAULT_TOP_K
+
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise RequestError(400, f"k must be a positive integer, got {value!r}")
+    if k <= 0:
+        raise RequestError(400, f"k must be a positive integer, got {value!r}")
+
+    return k
+
+
+class RecommendationServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        self.service = service
+        super().__init__(address, RecommendationHandler)
+
+
+# Serve rules_path on host:port until interrupted, reloading the rules when
+# they are republished. Raises ValueError when the rules cannot be loaded.
+def serve(rules_path, host="127.0.0.1", port=DEFAULT_PORT, poll_interval_s=DEFAULT_POLL_INTERVAL_S, ready=None):
+    service = RecommendationService(rules_path, poll_interval_s)
+    server = RecommendationServer((host, port), service)
+    service.start_watching()
+
+    if ready is not None:
+        ready(server)
+
+    try:
+        server.serve_forever()
+    finally:
+        service.stop()
+        server.server_close()